@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agenda dos técnicos: índice de horários, conflitos e sugestão de técnico
+
+Cada O.S. em aberto com técnico e data de agendamento ocupa um intervalo
+[início, fim) na agenda do técnico:
+
+- início: agendamento_ts (coluna epoch indexada, datas.py); se a data veio
+  sem hora, vale o horario_previsto ("08:00", "14h30");
+- fim: início + tempo_estimado ("2h", "1h30", "90min", "1:30"; número sem
+  unidade é hora até BARE_HOURS_MAX e minuto acima), ou
+  DEFAULT_DURATION_S se o texto estiver vazio/ilegível, limitado a
+  MAX_DURATION_S.
+
+O índice (Agenda) guarda, por técnico, os intervalos ordenados pelo início.
+Como nenhum intervalo passa de MAX_DURATION_S, os que cruzam [a, b) começam
+entre a - MAX_DURATION_S e b: duas buscas binárias e só os candidatos dessa
+faixa são olhados (O(log n + k)). A Agenda carrega uma janela de datas sob
+demanda e é mantida em dia pelo mesmo apply_changes() das listagens
+(change_tracker.py).
+"""
+
+import bisect
+import re
+
+from datas import from_ts, parse, to_ts
+from db import get_pool
+
+CLOSED_STATUS = ("Concluída", "Cancelada")
+DAY_S = 86400
+DEFAULT_DURATION_S = 3600
+MAX_DURATION_S = 12 * 3600
+# número sem unidade: até isto são horas ("2", "1,5"); acima, minutos ("30", "90")
+BARE_HOURS_MAX = 12
+# dias carregados de uma vez a partir do primeiro dia pedido
+LOAD_DAYS = 35
+_ID_CHUNK = 500
+
+_SLOT_SQL = ("SELECT id, tecnico_id, agendamento_ts, horario_previsto, tempo_estimado FROM orders "
+             "WHERE tecnico_id IS NOT NULL AND agendamento_ts IS NOT NULL AND status NOT IN (?, ?)")
+
+
+def parse_duration(text):
+    """Segundos de um tempo estimado digitado ("2h", "1h30", "90min", "1:30", "1,5", "30"), ou None.
+
+    Número sem unidade vale horas até BARE_HOURS_MAX e minutos acima disso.
+    """
+    t = (text or "").strip().lower().replace(",", ".")
+    if not t:
+        return None
+    m = re.fullmatch(r"(\d+):(\d{1,2})", t)
+    if m:
+        return int(m[1]) * 3600 + int(m[2]) * 60
+    m = re.fullmatch(r"\d+(?:\.\d+)?", t)
+    if m:
+        value = float(t)
+        return int(value * 3600) if value <= BARE_HOURS_MAX else int(value * 60)
+    m = re.fullmatch(r"(?:(\d+(?:\.\d+)?)\s*h[a-z]*)?\s*(?:(\d+)\s*(?:m[a-z]*)?)?", t)
+    if m and (m[1] or m[2]):
+        return int(float(m[1] or 0) * 3600) + int(m[2] or 0) * 60
+    return None
+
+
+def parse_hour(text):
+    """Segundos desde a meia-noite de um horário ("08:00", "8h", "14h30", "08:00-10:00"), ou None."""
+    m = re.match(r"\s*(\d{1,2})\s*(?:[:h]\s*(\d{2})?)", text or "")
+    if not m or int(m[1]) > 23:
+        return None
+    return int(m[1]) * 3600 + int(m[2] or 0) * 60
+
+
+def make_slot(ts, horario=None, tempo=None):
+    """(início, fim) em epoch do agendamento, ou None sem data."""
+    if ts is None:
+        return None
+    start = ts
+    if ts % DAY_S == 0:
+        start += parse_hour(horario) or 0
+    duration = parse_duration(tempo) or DEFAULT_DURATION_S
+    return start, start + max(60, min(duration, MAX_DURATION_S))
+
+
+def slot_from_text(data, horario=None, tempo=None):
+    """make_slot() a partir dos textos do formulário."""
+    dt = parse(data)
+    return make_slot(to_ts(dt), horario, tempo) if dt else None
+
+
+class TechSchedule:
+    """Intervalos [início, fim) de um técnico, ordenados pelo início."""
+
+    def __init__(self):
+        self._starts = []
+        self._items = []      # (início, fim, oid), na mesma ordem de _starts
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start, end, oid):
+        i = bisect.bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._items.insert(i, (start, end, oid))
+
+    def remove(self, start, oid):
+        i = bisect.bisect_left(self._starts, start)
+        while i < len(self._items) and self._starts[i] == start:
+            if self._items[i][2] == oid:
+                del self._starts[i], self._items[i]
+                return True
+            i += 1
+        return False
+
+    def overlapping(self, start, end):
+        """Intervalos que cruzam [start, end)."""
+        lo = bisect.bisect_right(self._starts, start - MAX_DURATION_S)
+        hi = bisect.bisect_left(self._starts, end)
+        return [item for item in self._items[lo:hi] if item[1] > start]
+
+    def busy(self, start, end):
+        """Segundos ocupados dentro de [start, end)."""
+        return sum(min(e, end) - max(s, start) for s, e, _oid in self.overlapping(start, end))
+
+
+class Agenda:
+    """Índice dos agendamentos das O.S. em aberto, por técnico, em uma janela de datas."""
+
+    def __init__(self):
+        self.techs = {}
+        self._slots = {}      # oid -> (tecnico_id, início, fim)
+        self.window = None    # (início, fim) em epoch já carregados
+
+    def _add(self, oid, tecnico_id, ts, horario, tempo):
+        slot = make_slot(ts, horario, tempo)
+        if slot is None or not (self.window[0] <= slot[0] < self.window[1]):
+            return
+        self._slots[oid] = (tecnico_id, *slot)
+        self.techs.setdefault(tecnico_id, TechSchedule()).add(slot[0], slot[1], oid)
+
+    def _discard(self, oid):
+        old = self._slots.pop(oid, None)
+        if old is not None:
+            self.techs[old[0]].remove(old[1], oid)
+
+    def load(self, start, end):
+        """(Re)carrega os agendamentos que começam em [start, end)."""
+        self.techs.clear()
+        self._slots.clear()
+        self.window = (start, end)
+        # data sem hora + horario_previsto pode começar até um dia depois de agendamento_ts
+        for row in get_pool().fetch_all(f"{_SLOT_SQL} AND agendamento_ts >= ? AND agendamento_ts < ?",
+                                        (*CLOSED_STATUS, start - DAY_S, end)):
+            self._add(*row)
+
+    def ensure(self, start, end):
+        """Garante carregado [start - MAX_DURATION_S, end), em dias inteiros."""
+        start -= MAX_DURATION_S
+        if self.window and self.window[0] <= start and end <= self.window[1]:
+            return
+        lo, hi = (min(start, self.window[0]), max(end, self.window[1])) if self.window else (start, end)
+        lo -= lo % DAY_S
+        hi = max(hi + (-hi % DAY_S), lo + LOAD_DAYS * DAY_S)
+        self.load(lo, hi)
+
+    def reload(self):
+        if self.window:
+            self.load(*self.window)
+
+    def apply_changes(self, upserts, deletes):
+        """Reindexa só as O.S. alteradas (mesmo contrato de VirtualTree.apply_changes)."""
+        if not self.window:
+            return
+        for oid in set(upserts) | set(deletes):
+            self._discard(oid)
+        ids = list(upserts)
+        for i in range(0, len(ids), _ID_CHUNK):
+            part = ids[i:i + _ID_CHUNK]
+            for row in get_pool().fetch_all(f"{_SLOT_SQL} AND id IN ({','.join('?' * len(part))})",
+                                            (*CLOSED_STATUS, *part)):
+                self._add(*row)
+
+    # ---------------- Consultas ----------------
+    def conflicts(self, tecnico_id, start, end, ignore=None):
+        """O.S. do técnico que cruzam [start, end) (exceto `ignore`)."""
+        self.ensure(start, end)
+        sched = self.techs.get(int(tecnico_id))
+        return [oid for _s, _e, oid in sched.overlapping(start, end) if oid != ignore] if sched else []
+
+    def suggest(self, start, end, candidates=None):
+        """Técnico livre em [start, end) com menos horas agendadas no dia (None se nenhum estiver livre)."""
+        day = start - start % DAY_S
+        self.ensure(day, day + DAY_S)
+        if candidates is None:
+            candidates = [r[0] for r in get_pool().fetch_all("SELECT id FROM technicians ORDER BY id")]
+        best = None
+        for tecnico_id in candidates:
+            sched = self.techs.get(tecnico_id)
+            if sched is not None and sched.overlapping(start, end):
+                continue
+            load = sched.busy(day, day + DAY_S) if sched is not None else 0
+            if best is None or load < best[0]:
+                best = (load, tecnico_id)
+        return best[1] if best else None
+
+    def between(self, start, end):
+        """{tecnico_id: [(início, fim, oid, em_conflito)]} dos agendamentos que cruzam [start, end)."""
+        self.ensure(start, end)
+        result = {}
+        for tecnico_id, sched in self.techs.items():
+            items = sched.overlapping(start, end)
+            if items:
+                result[tecnico_id] = [(s, e, oid, len(sched.overlapping(s, e)) > 1) for s, e, oid in items]
+        return result
+
+
+def order_labels(oids):
+    """{oid: (cliente, título, status)} para mostrar na agenda."""
+    ids = list(oids)
+    labels = {}
+    for i in range(0, len(ids), _ID_CHUNK):
+        part = ids[i:i + _ID_CHUNK]
+        for oid, cliente, titulo, status in get_pool().fetch_all(
+                f"SELECT o.id, c.nome, o.titulo, o.status FROM orders o LEFT JOIN clients c ON o.cliente_id = c.id "
+                f"WHERE o.id IN ({','.join('?' * len(part))})", part):
+            labels[oid] = (cliente, titulo, status)
+    return labels
+
+
+WEEKDAYS = ("seg", "ter", "qua", "qui", "sex", "sáb", "dom")
+
+
+def fmt_hour(ts):
+    return from_ts(ts).strftime("%H:%M")
+
+
+def fmt_day(ts):
+    dt = from_ts(ts)
+    return f"{WEEKDAYS[dt.weekday()]} {dt.strftime('%d/%m')}"
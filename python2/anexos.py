@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Anexos das O.S. (fotos de campo, assinaturas) fora do banco
+
+Os arquivos ficam em uma pasta ao lado do banco, endereçados pelo SHA-256 do
+conteúdo e divididos em subpastas pelos primeiros caracteres do hash:
+
+    anexos/ab/cd/abcd...ef.jpg          original (a mesma foto é guardada uma vez só)
+    anexos/miniaturas/ab/abcd...ef.jpg  miniatura (MINIATURA_SIZE)
+
+A tabela attachments (migração 8) guarda só os metadados e liga cada arquivo
+a uma O.S.; o gestao.db não cresce com as fotos. Arquivos grandes são lidos
+por mmap (hash e decodificação sem copiar tudo para a memória). As
+miniaturas são geradas em segundo plano por make_thumbnails(), em um pool de
+processos, e usadas na tela e no PDF da O.S.
+
+Excluir uma O.S. apaga os metadados (ON DELETE CASCADE); os arquivos que
+ficaram sem referência saem com purge_unreferenced():
+
+    python anexos.py --miniaturas
+    python anexos.py --limpar
+"""
+
+import argparse
+import hashlib
+import io
+import mimetypes
+import mmap
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
+
+import db
+import diagnostico
+from datas import DATE_FMT
+from executor import Cancelled
+
+STORE_DIRNAME = "anexos"
+MINIATURA_SIZE = (256, 256)
+MINIATURA_QUALITY = 80
+# a partir deste tamanho os arquivos são lidos por mmap
+MMAP_MIN_BYTES = 1 << 20
+# abaixo disso as miniaturas são feitas neste processo
+INLINE_LIMIT = 8
+TIPOS = ("foto", "assinatura_cliente", "assinatura_tecnico")
+
+
+def store_dir(db_path=None):
+    """Pasta dos anexos: `anexos/` ao lado do banco."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path or db.DB_FILE)), STORE_DIRNAME)
+
+
+def blob_path(sha, ext, root=None):
+    return os.path.join(root or store_dir(), sha[:2], sha[2:4], sha + ext)
+
+
+def thumb_path(sha, root=None):
+    return os.path.join(root or store_dir(), "miniaturas", sha[:2], sha + ".jpg")
+
+
+@contextmanager
+def read_view(path):
+    """Conteúdo do arquivo como buffer: mmap para arquivos grandes, bytes para os pequenos."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def file_sha256(path):
+    with read_view(path) as data:
+        return hashlib.sha256(data).hexdigest()
+
+
+def _store(path, sha, ext, root):
+    """Copia `path` para o repositório (se ainda não estiver lá)."""
+    dest = blob_path(sha, ext, root)
+    if os.path.exists(dest):
+        return dest
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+def add_files(token, order_id, paths, tipo="foto"):
+    """Anexa arquivos a uma O.S. Retorna quantos anexos novos foram criados.
+
+    Arquivos repetidos (mesmo conteúdo) são guardados uma vez só; anexar o mesmo
+    arquivo duas vezes à mesma O.S. não cria outra linha. Feito para rodar no
+    BackgroundExecutor (cópia e hash fora da thread do Tk).
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de anexo inválido: {tipo}")
+    root = store_dir()
+    rows = []
+    for path in paths:
+        if token is not None:
+            token.check()
+        size = os.path.getsize(path)
+        if not size:
+            continue
+        sha = file_sha256(path)
+        ext = os.path.splitext(path)[1].lower()
+        _store(path, sha, ext, root)
+        rows.append((int(order_id), tipo, sha, ext, os.path.basename(path),
+                     mimetypes.guess_type(path)[0], size, datetime.now().strftime(DATE_FMT)))
+    if not rows:
+        return 0
+    with db.get_pool().writer() as conn:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO attachments (order_id, tipo, sha256, extensao, nome, mime, tamanho, criado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return conn.total_changes - before
+
+
+def list_attachments(order_id):
+    """[(id, tipo, nome, tamanho, largura, altura, sha256, extensao)] de uma O.S."""
+    return db.get_pool().fetch_all(
+        "SELECT id, tipo, nome, tamanho, largura, altura, sha256, extensao FROM attachments "
+        "WHERE order_id = ? ORDER BY tipo, id", (int(order_id),))
+
+
+def thumbnails_for(order_ids):
+    """{order_id: [(tipo, nome, caminho da miniatura)]} das O.S., só com miniaturas prontas."""
+    ids = sorted({int(i) for i in order_ids})
+    root = store_dir()
+    result = {}
+    pool = db.get_pool()
+    for start in range(0, len(ids), 500):
+        part = ids[start:start + 500]
+        marks = ",".join("?" * len(part))
+        for oid, tipo, nome, sha in pool.fetch_all(
+                f"SELECT order_id, tipo, nome, sha256 FROM attachments "
+                f"WHERE order_id IN ({marks}) AND miniatura = 1 ORDER BY order_id, tipo, id", part):
+            result.setdefault(oid, []).append((tipo, nome, thumb_path(sha, root)))
+    return result
+
+
+# ---------------------------------------------------------
+# Miniaturas
+# ---------------------------------------------------------
+def _make_thumb(src, dest, size=MINIATURA_SIZE):
+    """Gera a miniatura JPEG de `src`.
+
+    Retorna (largura, altura) do original, None se não for imagem, ou False
+    se falhou por outro motivo (disco, memória...): o erro vai para o
+    diagnóstico e o anexo é tentado de novo na próxima vez.
+    """
+    from PIL import Image, ImageOps
+    tmp = None
+    try:
+        with read_view(src) as data:
+            try:
+                opened = Image.open(data if isinstance(data, mmap.mmap) else io.BytesIO(data))
+            except (Image.UnidentifiedImageError, Image.DecompressionBombError, ValueError):
+                # ValueError: a identificação do formato passou do fim de um arquivo curto lido por mmap
+                return None
+            with opened as img:
+                original = img.size
+                img.draft("RGB", size)       # JPEG: decodifica já reduzido
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail(size)
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                tmp = f"{dest}.{os.getpid()}.tmp"
+                img.save(tmp, "JPEG", quality=MINIATURA_QUALITY, optimize=True)
+        os.replace(tmp, dest)
+        return original
+    except Exception as e:
+        diagnostico.error(f"Erro ao gerar miniatura de {src}", e)
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+def _init_worker(log_path=None):
+    if log_path:
+        # erros dos workers (diagnostico.error) no mesmo log da tela
+        diagnostico.enable(log_path)
+
+
+def make_thumbnails(token=None, workers=None):
+    """Gera as miniaturas pendentes (miniatura = 0). Retorna quantos arquivos foram processados.
+
+    Cada arquivo distinto é processado uma vez; os que não são imagem ficam
+    com miniatura = -1 e não são tentados de novo. Os que falharam por outro
+    motivo continuam com 0 (e não entram na contagem).
+    """
+    pool = db.get_pool()
+    root = store_dir()
+    pending = pool.fetch_all("SELECT sha256, MIN(extensao) FROM attachments WHERE miniatura = 0 GROUP BY sha256")
+    if not pending:
+        return 0
+    jobs = [(sha, blob_path(sha, ext, root), thumb_path(sha, root)) for sha, ext in pending]
+    done = []
+
+    def finish(sha, size):
+        if size is False:
+            return
+        done.append((1, size[0], size[1], sha) if size else (-1, None, None, sha))
+        if token is not None:
+            token.report(f"{len(done)}/{len(jobs)} miniaturas")
+
+    # o que já foi gerado é gravado mesmo se a tarefa for cancelada no meio
+    try:
+        if len(jobs) <= INLINE_LIMIT or workers == 1:
+            for sha, src, dest in jobs:
+                if token is not None:
+                    token.check()
+                finish(sha, _make_thumb(src, dest))
+        else:
+            workers = workers or max(1, (os.cpu_count() or 2) - 1)
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(diagnostico.TRACER.log_path,))
+            try:
+                futures = {executor.submit(_make_thumb, src, dest): sha for sha, src, dest in jobs}
+                for future in as_completed(futures):
+                    if token is not None and token.cancelled:
+                        raise Cancelled()
+                    finish(futures[future], future.result())
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if done:
+            with pool.writer() as conn:
+                conn.executemany("UPDATE attachments SET miniatura = ?, largura = ?, altura = ? WHERE sha256 = ?",
+                                 done)
+    return len(done)
+
+
+def purge_unreferenced():
+    """Apaga do repositório os arquivos (e miniaturas) que nenhum anexo referencia. Retorna quantos."""
+    pool = db.get_pool()
+    root = store_dir()
+    sql = "SELECT sha256 FROM attachments"
+    import arquivo   # O.S. arquivadas continuam com os anexos
+    if arquivo.attach(pool):
+        with pool.reader() as conn:
+            if conn.execute(f"SELECT 1 FROM {arquivo.ALIAS}.sqlite_master WHERE name = 'attachments'").fetchone():
+                sql += f" UNION SELECT sha256 FROM {arquivo.ALIAS}.attachments"
+    used = {r[0] for r in pool.fetch_all(sql)}
+    removed = 0
+    for folder, _dirs, files in os.walk(root):
+        for name in files:
+            sha = os.path.splitext(name)[0]
+            if len(sha) == 64 and sha not in used:
+                os.remove(os.path.join(folder, name))
+                if not folder.startswith(os.path.join(root, "miniaturas")):
+                    removed += 1
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anexos das O.S.")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--miniaturas", action="store_true", help="gera as miniaturas pendentes")
+    parser.add_argument("--limpar", action="store_true", help="apaga arquivos sem nenhum anexo")
+    args = parser.parse_args(argv)
+    import migrations
+    db.DB_FILE = args.db
+    try:
+        migrations.migrate(db.get_pool())
+        if args.miniaturas:
+            print(f"{make_thumbnails()} arquivos processados")
+        if args.limpar:
+            print(f"{purge_unreferenced()} arquivos sem referência removidos")
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
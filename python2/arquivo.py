@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arquivo morto: O.S. encerradas antigas em um segundo arquivo SQLite
+
+O.S. concluídas/canceladas há mais de ARCHIVE_AGE_DAYS (com o histórico e os
+metadados dos anexos) são copiadas para <banco>_arquivo.db e apagadas do
+banco principal, em lotes, com o arquivo anexado ao escritor (ATTACH ... AS
+arquivo). O banco do dia a dia fica pequeno;
+listagens, filtros e exportação continuam olhando só para ele. Os arquivos
+dos anexos (anexos.py) não mudam de lugar.
+
+- Os totais dos relatórios (reports.py) continuam valendo para todo o
+  período: o que os triggers subtraem no DELETE é somado de volta no mesmo
+  lote, e rebuild_aggregates() inclui o arquivo quando ele está anexado.
+- Consultas que precisam do arquivo pedem explicitamente
+  (client_history(..., include_archive=True), find_order()).
+- Com o banco principal em WAL, o SQLite não garante atomicidade entre os dois
+  arquivos. Por isso cada lote usa duas transações: a primeira só grava no
+  arquivo (INSERT OR REPLACE) e faz commit; a segunda só apaga do banco
+  principal as O.S. que já estão em arquivo.orders. Uma queda entre as duas
+  deixa a O.S. nos dois bancos (nunca em nenhum); a próxima execução regrava
+  as mesmas linhas e termina o lote.
+
+    python arquivo.py --dias 365 --vacuum
+"""
+
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import db
+from datas import TS_COLUMNS, TS_EXPR, to_ts
+from reports import ARCHIVE_SCHEMA, DURATION_SQL
+
+ALIAS = ARCHIVE_SCHEMA
+ARCHIVE_AGE_DAYS = 365
+ARCHIVE_BATCH = 1000
+CLOSED_STATUS = ("Concluída", "Cancelada")
+# tabelas copiadas para o arquivo; as filhas saem do banco principal por ON DELETE CASCADE
+ARCHIVED_TABLES = ("orders", "history", "attachments")
+
+_HISTORY_COLS = "o.id, o.tipo_os, o.data_abertura, o.data_encerramento, o.status, o.titulo"
+
+
+def archive_path(db_path=None):
+    """gestao.db -> gestao_arquivo.db, na mesma pasta."""
+    root, ext = os.path.splitext(os.path.abspath(db_path or db.DB_FILE))
+    return f"{root}_arquivo{ext or '.db'}"
+
+
+def attach(pool=None, create=False):
+    """Anexa o arquivo morto ao pool. Sem `create`, só se o arquivo já existir."""
+    pool = pool or db.get_pool()
+    path = archive_path(pool.path)
+    if not create and not os.path.exists(path):
+        return False
+    pool.attach(ALIAS, path)
+    return True
+
+
+def _archive_ddl(conn, table):
+    """CREATE TABLE do arquivo com as colunas atuais de `table` (sem chaves estrangeiras)."""
+    cols = [f"{name} {decl}".rstrip() for _cid, name, decl, *_rest in conn.execute(f"PRAGMA main.table_info({table})")
+            if name != "id"]
+    cols += [f"{ts} INTEGER GENERATED ALWAYS AS ({TS_EXPR.format(col=col)}) VIRTUAL"
+             for tbl, col, ts in TS_COLUMNS if tbl == table]
+    return f"CREATE TABLE IF NOT EXISTS {ALIAS}.{table} (\n    id INTEGER PRIMARY KEY,\n    " + \
+        ",\n    ".join(cols) + "\n)"
+
+
+def ensure_archive_schema(conn):
+    """Cria/atualiza as tabelas no arquivo (colunas novas do banco principal são acrescentadas)."""
+    for table in ARCHIVED_TABLES:
+        conn.execute(_archive_ddl(conn, table))
+        have = {r[1] for r in conn.execute(f"PRAGMA {ALIAS}.table_info({table})")}
+        for _cid, name, decl, *_rest in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+            if name not in have:
+                conn.execute(f"ALTER TABLE {ALIAS}.{table} ADD COLUMN {name} {decl}")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {ALIAS}.idx_orders_cliente ON orders(cliente_id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {ALIAS}.idx_orders_abertura_ts ON orders(abertura_ts)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {ALIAS}.idx_history_order ON history(order_id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {ALIAS}.idx_attachments_order ON attachments(order_id)")
+
+
+def _add_back_totals(conn):
+    """Devolve aos totais dos relatórios as O.S. do lote (os triggers de DELETE as subtraíram)."""
+    dur = DURATION_SQL.format(o="o")
+    batch = f"FROM {ALIAS}.orders o WHERE o.id IN (SELECT id FROM temp.arq_ids)"
+    conn.execute(f"""
+        INSERT INTO report_status_counts (status, total)
+        SELECT IFNULL(o.status, ''), COUNT(*) {batch} GROUP BY IFNULL(o.status, '')
+        ON CONFLICT(status) DO UPDATE SET total = total + excluded.total
+    """)
+    conn.execute(f"""
+        INSERT INTO report_tech_stats (tecnico_id, concluidas, horas_qtd, horas_soma)
+        SELECT o.tecnico_id, COUNT(*), COUNT({dur}), IFNULL(SUM({dur}), 0)
+        {batch} AND o.tecnico_id IS NOT NULL AND o.data_encerramento IS NOT NULL
+        GROUP BY o.tecnico_id
+        ON CONFLICT(tecnico_id) DO UPDATE SET
+            concluidas = concluidas + excluded.concluidas,
+            horas_qtd = horas_qtd + excluded.horas_qtd,
+            horas_soma = horas_soma + excluded.horas_soma
+    """)
+
+
+def archive_orders(token=None, days=ARCHIVE_AGE_DAYS, batch_size=ARCHIVE_BATCH, log=None):
+    """Move para o arquivo as O.S. encerradas há mais de `days` dias.
+
+    Retorna {"orders": n, "history": n}. Aceita o CancelToken do executor
+    (verificado entre lotes; lotes já gravados ficam arquivados).
+    """
+    pool = db.get_pool()
+    attach(pool, create=True)
+    cutoff = to_ts(datetime.now() - timedelta(days=days))
+    marks = ",".join("?" * len(CLOSED_STATUS))
+    counts = {"orders": 0, "history": 0}
+    with pool.writer() as conn:
+        ensure_archive_schema(conn)
+    order_cols = ", ".join(pool.columns("orders"))
+    history_cols = ", ".join(pool.columns("history"))
+    attachment_cols = ", ".join(pool.columns("attachments"))
+    while True:
+        if token is not None:
+            token.check()
+        with pool.writer() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS arq_ids (id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.arq_ids")
+            n = conn.execute(
+                f"INSERT INTO temp.arq_ids (id) SELECT id FROM main.orders "
+                f"WHERE status IN ({marks}) AND COALESCE(encerramento_ts, abertura_ts) < ? "
+                f"ORDER BY id LIMIT ?", (*CLOSED_STATUS, cutoff, batch_size)).rowcount
+            if not n:
+                break
+            # 1ª transação: só o arquivo (commit antes de mexer no banco principal)
+            conn.execute(f"INSERT OR REPLACE INTO {ALIAS}.orders ({order_cols}) SELECT {order_cols} "
+                         f"FROM main.orders WHERE id IN (SELECT id FROM temp.arq_ids)")
+            counts["history"] += conn.execute(
+                f"INSERT OR REPLACE INTO {ALIAS}.history ({history_cols}) SELECT {history_cols} "
+                f"FROM main.history WHERE order_id IN (SELECT id FROM temp.arq_ids)").rowcount
+            conn.execute(
+                f"INSERT OR REPLACE INTO {ALIAS}.attachments ({attachment_cols}) SELECT {attachment_cols} "
+                f"FROM main.attachments WHERE order_id IN (SELECT id FROM temp.arq_ids)")
+        with pool.writer() as conn:
+            # 2ª transação: só o banco principal, e só o que o arquivo confirma ter
+            conn.execute(f"DELETE FROM temp.arq_ids WHERE id NOT IN (SELECT id FROM {ALIAS}.orders)")
+            # histórico e anexos saem junto pela chave estrangeira (ON DELETE CASCADE)
+            counts["orders"] += conn.execute(
+                "DELETE FROM main.orders WHERE id IN (SELECT id FROM temp.arq_ids)").rowcount
+            _add_back_totals(conn)
+        if log:
+            log(f"{counts['orders']} O.S. arquivadas")
+    return counts
+
+
+def client_history(cid, include_archive=False):
+    """O.S. de um cliente (mais recentes primeiro); com include_archive, junta as do arquivo."""
+    pool = db.get_pool()
+    sql = f"SELECT {_HISTORY_COLS} FROM main.orders o WHERE o.cliente_id = ?"
+    params = [cid]
+    if include_archive and attach(pool):
+        sql += (f" UNION ALL SELECT {_HISTORY_COLS} FROM {ALIAS}.orders o WHERE o.cliente_id = ? "
+                f"AND o.id NOT IN (SELECT id FROM main.orders)")
+        params.append(cid)
+    return pool.fetch_all(sql + " ORDER BY 1 DESC", params)
+
+
+def find_order(oid):
+    """(linha de orders, histórico) de uma O.S. arquivada, ou (None, [])."""
+    pool = db.get_pool()
+    if not attach(pool):
+        return None, []
+    with pool.reader() as conn:
+        row = conn.execute(f"SELECT {', '.join(pool.columns('orders'))} FROM {ALIAS}.orders WHERE id = ?",
+                           (oid,)).fetchone()
+        hist = conn.execute(f"SELECT timestamp, evento, responsavel, detalhes FROM {ALIAS}.history "
+                            f"WHERE order_id = ? ORDER BY id", (oid,)).fetchall()
+    return row, hist
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move O.S. encerradas antigas para o arquivo morto")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--dias", type=int, default=ARCHIVE_AGE_DAYS, help="idade mínima (dias) da O.S. encerrada")
+    parser.add_argument("--lote", type=int, default=ARCHIVE_BATCH, help="O.S. por transação")
+    parser.add_argument("--vacuum", action="store_true", help="compacta o banco principal no final")
+    args = parser.parse_args(argv)
+    import migrations
+    db.DB_FILE = args.db
+    try:
+        migrations.migrate(db.get_pool())
+        counts = archive_orders(days=args.dias, batch_size=args.lote, log=print)
+    finally:
+        db.close_pool()
+    if args.vacuum:
+        conn = db.connect(args.db)
+        conn.execute("VACUUM")
+        conn.close()
+    print(f"{counts['orders']} O.S. e {counts['history']} registros de histórico movidos para "
+          f"{archive_path(args.db)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Autocompletar de clientes e técnicos no formulário de O.S.
+
+PrefixIndex guarda, em memória, as chaves de busca de cada cadastro numa
+lista ordenada (com o id em uma lista paralela):
+
+- o nome sem acentos/maiúsculas (texto.fold) a partir de cada palavra, para
+  "silva" achar "Maria da Silva";
+- documento e telefones só com dígitos (telefone também sem o DDD).
+
+Uma busca é uma busca binária pelo prefixo digitado e uma varredura curta a
+partir dali (até `limit` cadastros): O(log n + k), bem abaixo de 1 ms com
+200 mil clientes. O índice é montado em segundo plano na primeira vez que o
+campo recebe o foco e depois acompanha o banco pelo mesmo apply_changes()
+das listagens (change_tracker.py): cadastros e exclusões desta e de outras
+estações. AutoCombo é o ttk.Combobox que consulta o índice, com debounce
+entre as teclas.
+"""
+
+import bisect
+import re
+import tkinter as tk
+from tkinter import ttk
+
+import diagnostico
+from db import get_pool
+from texto import digits, fold
+
+# (id, nome, documento, telefones...): o 3º campo aparece no rótulo
+CLIENTS_SQL = "SELECT id, nome, documento, telefone_principal, telefone_secundario FROM clients"
+TECHS_SQL = "SELECT id, nome, cpf, telefone FROM technicians"
+
+SEARCH_LIMIT = 20
+DEBOUNCE_MS = 150
+MIN_DIGITS = 4
+# chaves de nome cortadas: um prefixo digitado maior que isso ainda acha o cadastro
+KEY_LEN = 40
+_ID_CHUNK = 500
+
+
+def record_keys(row):
+    """Chaves de busca de um cadastro (id, nome, documento/telefones...)."""
+    _id, nome, *numeros = row
+    words = fold(nome).split()
+    keys = {" ".join(words[i:])[:KEY_LEN] for i in range(len(words))}
+    for numero in numeros:
+        d = digits(numero)
+        if len(d) >= MIN_DIGITS:
+            keys.add(d)
+            if len(d) >= 10:
+                keys.add(d[2:])     # telefone sem o DDD
+    return keys
+
+
+def normalize_query(text):
+    """Texto digitado como chave: só dígitos se não houver letras, senão fold()."""
+    if not any(ch.isalpha() for ch in text or ""):
+        return digits(text)
+    return fold(text)[:KEY_LEN]
+
+
+def label(row):
+    """"12 - Maria da Silva (123.456.789-00)" para a lista do combobox."""
+    text = f"{row[0]} - {row[1] or ''}"
+    return f"{text} ({row[2]})" if row[2] else text
+
+
+def parse_id(text):
+    """Id no início do texto do campo ("12 - Maria..." ou só "12"), ou None."""
+    m = re.match(r"\s*(\d+)\s*(?:-|$)", text or "")
+    return int(m[1]) if m else None
+
+
+class PrefixIndex:
+    """Chaves normalizadas -> ids de uma tabela de cadastro, ordenadas para busca por prefixo.
+
+    Cada entrada é o texto "chave\\0id": uma lista só de strings, ordenada
+    pela chave (o \\0 vem antes de qualquer caractere). A lista grande (base)
+    não é alterada a cada cadastro: inclusões vão para uma lista pequena
+    (delta) e os ids alterados/excluídos passam a ser ignorados na base
+    (stale). Se o delta passar de MAX_DELTA entradas, o índice é montado de
+    novo em segundo plano.
+    """
+
+    MAX_DELTA = 20000
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.loading = False
+        self._pending = set()  # ids alterados enquanto o índice era montado
+        self.reset()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def build(self):
+        """Lê a tabela e monta a base (pode rodar fora da thread do Tk)."""
+        labels, entries = {}, []
+        for row in get_pool().fetch_all(self.sql):
+            labels[row[0]] = label(row)
+            entries += _entries(row)
+        entries.sort()
+        return entries, labels
+
+    def install(self, built):
+        """Passa a usar o que build() montou e reaplica o que mudou nesse meio tempo."""
+        self.reset()
+        self._base, self._labels = built
+        self.loaded, self.loading = True, False
+        pending, self._pending = self._pending, set()
+        if pending:
+            self.apply_changes(pending, ())
+
+    def load(self):
+        self.loading = True
+        self.install(self.build())
+
+    def load_async(self, executor, on_ready=None):
+        """Monta o índice no BackgroundExecutor (uma vez só)."""
+        if self.loaded or self.loading:
+            return
+        self.loading = True
+
+        def done(built):
+            self.install(built)
+            if on_ready:
+                on_ready()
+
+        def failed(exc):
+            self.loading = False
+            diagnostico.error("Falha ao montar o índice do autocompletar", exc)
+        executor.submit(lambda token: self.build(), label="Índice do autocompletar", on_done=done, on_error=failed)
+
+    def reset(self):
+        """Descarta o índice; a próxima vez que o campo for usado, ele é montado de novo."""
+        self._base, self._labels = [], {}
+        self._delta = []
+        self._stale = set()     # ids cujas entradas da base não valem mais
+        self.loaded = False
+
+    def apply_changes(self, upserts, deletes):
+        """Reindexa só os cadastros alterados (mesmo contrato de VirtualTree.apply_changes)."""
+        if not self.loaded:
+            if self.loading:
+                self._pending.update(upserts, deletes)
+            return
+        changed = set(upserts) | set(deletes)
+        for oid in changed:
+            self._labels.pop(oid, None)
+        self._stale |= changed
+        self._delta = [e for e in self._delta if _entry_id(e) not in changed]
+        ids = list(upserts)
+        for i in range(0, len(ids), _ID_CHUNK):
+            part = ids[i:i + _ID_CHUNK]
+            for row in get_pool().fetch_all(f"{self.sql} WHERE id IN ({','.join('?' * len(part))})", part):
+                self._labels[row[0]] = label(row)
+                for entry in _entries(row):
+                    bisect.insort(self._delta, entry)
+        if len(self._delta) > self.MAX_DELTA:
+            self.reset()
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """[(id, rótulo)] dos cadastros com alguma chave começando pelo texto digitado."""
+        query = normalize_query(text)
+        if not query or not self.loaded:
+            return []
+        found = {}
+        if query.isdigit() and int(query) in self._labels:
+            found[int(query)] = None        # id digitado direto vem primeiro
+        # cada cadastro tem poucas chaves: limit * 4 entradas bastam para `limit` ids distintos
+        hits = _scan(self._base, query, limit * 4, self._stale) + _scan(self._delta, query, limit * 4, ())
+        for entry in sorted(hits):
+            if len(found) >= limit:
+                break
+            found.setdefault(_entry_id(entry))
+        return [(oid, self._labels[oid]) for oid in found]
+
+    def label_for(self, oid):
+        return self._labels.get(oid, str(oid))
+
+
+def _entries(row):
+    return [f"{key}\0{row[0]}" for key in record_keys(row)]
+
+
+def _entry_id(entry):
+    return int(entry[entry.rindex("\0") + 1:])
+
+
+def _scan(entries, query, limit, skip):
+    found = []
+    i = bisect.bisect_left(entries, query)
+    while i < len(entries) and len(found) < limit and entries[i].startswith(query):
+        if not skip or _entry_id(entries[i]) not in skip:
+            found.append(entries[i])
+        i += 1
+    return found
+
+
+class AutoCombo(ttk.Combobox):
+    """Combobox que sugere cadastros do PrefixIndex enquanto se digita."""
+
+    def __init__(self, master, index, executor, delay_ms=DEBOUNCE_MS, **kw):
+        super().__init__(master, **kw)
+        self.index = index
+        self.executor = executor
+        self.delay_ms = delay_ms
+        self._after = None
+        self.bind("<FocusIn>", self._on_focus, add="+")
+        self.bind("<KeyRelease>", self._on_key, add="+")
+
+    def _on_focus(self, _event=None):
+        self.index.load_async(self.executor, on_ready=self._lookup)
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if self._after is not None:
+            self.after_cancel(self._after)
+        self._after = self.after(self.delay_ms, self._lookup)
+
+    def _lookup(self):
+        self._after = None
+        if not self.index.loaded:
+            self.index.load_async(self.executor, on_ready=self._lookup)
+        self["values"] = [text for _oid, text in self.index.search(self.get())]
+
+    def selected_id(self):
+        return parse_id(self.get())
+
+    def set_id(self, oid):
+        self.delete(0, tk.END)
+        self.insert(0, self.index.label_for(oid))
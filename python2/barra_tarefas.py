@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Barra de status das tarefas do BackgroundExecutor (executor.py)
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+
+class BusyBar(ttk.Frame):
+    """Barra de status: mostra o que está rodando e permite cancelar."""
+
+    def __init__(self, master, on_cancel, **kw):
+        super().__init__(master, padding=(8, 2), **kw)
+        self.label = ttk.Label(self, text="")
+        self.label.pack(side=tk.LEFT)
+        self.progress = ttk.Progressbar(self, mode='indeterminate', length=160)
+        self.btn_cancel = ttk.Button(self, text="Cancelar", command=on_cancel)
+        self._shown = False
+
+    def update_tasks(self, labels):
+        if labels:
+            self.label.config(text="Processando: " + ", ".join(l for l in labels if l))
+            if not self._shown:
+                self.btn_cancel.pack(side=tk.RIGHT)
+                self.progress.pack(side=tk.RIGHT, padx=8)
+                self.progress.start(15)
+                self._shown = True
+        else:
+            self.label.config(text="")
+            self.progress.stop()
+            self.progress.pack_forget()
+            self.btn_cancel.pack_forget()
+            self._shown = False
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerador de dados sintéticos e benchmark dos caminhos reais do sistema
+
+Gera um banco de rascunho com N O.S. (mais clientes, técnicos e histórico em
+proporções realistas) e mede, sem interface gráfica, as mesmas funções que a
+tela usa: primeira página e paginação da listagem de O.S., filtros por
+período, os relatórios, o histórico de um cliente, a exportação CSV, o PDF de
+uma O.S., a exclusão em massa e a inicialização. O resultado vai para um JSON
+e pode ser comparado com um baseline salvo.
+
+--importtime mede só a importação da tela (python -X importtime, mediana de
+várias execuções) e lista os módulos mais caros; não precisa de banco.
+
+Uso:
+    python benchmark.py --ordens 100000
+    python benchmark.py --ordens 100000 --salvar-baseline baseline.json
+    python benchmark.py --ordens 100000 --baseline baseline.json --saida atual.json
+    python benchmark.py --importtime
+
+O banco gerado é reaproveitado entre execuções com o mesmo --ordens (use
+--regerar para gerar de novo). A exclusão em massa roda dentro de uma
+transação desfeita no final, então o banco não muda entre repetições.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import arquivo
+import busca
+import db
+import exclusao
+import importar
+import migrations
+from datas import DATE_FMT, day_range
+from db import get_pool
+from executor import CancelToken
+from export import export_csv, order_filters
+from pdf_os import fetch_orders, render_os_pdf
+from reports import (OS_BY_STATUS_SQL, OS_BY_STATUS_RANGE_SQL, PERFORMANCE_BY_TECH_SQL,
+                     PERFORMANCE_BY_TECH_RANGE_SQL, rebuild_aggregates)
+from virtual_tree import KeysetPager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO = os.path.join(BASE_DIR, "WhatsApp Image 2025-10-16 at 10.13.19.jpeg")
+
+GEN_BATCH = 10000
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.10
+DELETE_COUNT = 500
+IMPORT_TOP = 20
+# período coberto pelas datas de abertura geradas
+START = datetime(2023, 1, 1)
+SPAN_DAYS = 730
+
+STATUS = [("Concluída", 55), ("Aberta", 15), ("Em andamento", 10), ("Pendente", 10), ("Cancelada", 10)]
+TIPOS = ["Instalação", "Manutenção preventiva", "Manutenção corretiva", "Visita técnica", "Orçamento"]
+PRIORIDADES = ["Baixa", "Média", "Alta", "Urgente"]
+CANAIS = ["Telefone", "WhatsApp", "E-mail", "Presencial"]
+CIDADES = [("Recife", "PE"), ("Olinda", "PE"), ("Jaboatão dos Guararapes", "PE"), ("Paulista", "PE"),
+           ("Caruaru", "PE"), ("João Pessoa", "PB")]
+BAIRROS = ["Boa Viagem", "Casa Forte", "Espinheiro", "Graças", "Pina", "Torre", "Madalena", "Centro"]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elaine", "Fábio", "Gabriela", "Heitor", "Isabela", "João",
+         "Karina", "Lucas", "Marina", "Nelson", "Olívia", "Paulo", "Renata", "Sérgio", "Tatiana", "Vítor"]
+SOBRENOMES = ["Silva", "Souza", "Lima", "Costa", "Oliveira", "Pereira", "Almeida", "Barbosa", "Rocha"]
+PALAVRAS = ("câmera alarme sensor central cabo fonte DVR interfone portão cerca elétrica bateria "
+            "teste troca ajuste configuração cliente relata falha intermitente verificar instalação "
+            "acesso remoto senha gravação noturna infravermelho disparo zona").split()
+
+
+# ---------------------------------------------------------
+# Geração
+# ---------------------------------------------------------
+def _texto(rng, minimo, maximo):
+    return " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(minimo, maximo)))
+
+
+def _nome(rng):
+    return f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+
+
+def _clients(rng, n):
+    for i in range(1, n + 1):
+        cidade, uf = rng.choice(CIDADES)
+        pj = rng.random() < 0.3
+        cadastro = START - timedelta(days=rng.randint(0, 1000))
+        yield (i, (f"Condomínio {rng.choice(SOBRENOMES)} {i}" if pj else _nome(rng)),
+               "Jurídica" if pj else "Física", f"{rng.randrange(10**13):014d}" if pj else f"{rng.randrange(10**10):011d}",
+               f"{rng.randint(50000, 56999):05d}-{rng.randint(0, 999):03d}", f"Rua {rng.choice(SOBRENOMES)}",
+               str(rng.randint(1, 3000)), rng.choice(BAIRROS), cidade, uf,
+               f"81 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}", cadastro.strftime(DATE_FMT),
+               "Ativo" if rng.random() < 0.9 else "Inativo")
+
+
+def _orders(rng, n, n_clients, n_techs):
+    weights = [w for _s, w in STATUS]
+    names = [s for s, _w in STATUS]
+    for i in range(1, n + 1):
+        abertura = START + timedelta(seconds=rng.randrange(SPAN_DAYS * 86400))
+        status = rng.choices(names, weights)[0]
+        tecnico = rng.randint(1, n_techs) if status == "Concluída" or rng.random() < 0.7 else None
+        encerramento = None
+        if status == "Concluída":
+            encerramento = (abertura + timedelta(minutes=rng.randint(30, 72 * 60))).strftime(DATE_FMT)
+        agenda = abertura + timedelta(days=rng.randint(0, 10), hours=rng.randint(0, 8))
+        # uma parte digitada no formato brasileiro, como acontece no formulário
+        agendamento = agenda.strftime("%d/%m/%Y %H:%M" if rng.random() < 0.05 else DATE_FMT)
+        yield (i, rng.randint(1, n_clients), rng.choice(TIPOS), abertura.strftime(DATE_FMT), agendamento,
+               f"{rng.randint(8, 17):02d}:00", f"Rua {rng.choice(SOBRENOMES)}, {rng.randint(1, 3000)}",
+               _texto(rng, 2, 6), _texto(rng, 8, 60), tecnico, rng.choice(PRIORIDADES), rng.choice(CANAIS),
+               _texto(rng, 1, 4), status, _texto(rng, 0, 12), f"{rng.randint(1, 8)}h", _texto(rng, 0, 6),
+               encerramento)
+
+
+def _history(rng, orders, per_order):
+    hid = 0
+    for oid, abertura, status in orders:
+        hid += 1
+        yield (hid, oid, abertura, "Abertura", "Sistema", "O.S. aberta")
+        for _ in range(rng.randint(0, 2 * per_order - 2)):
+            hid += 1
+            yield (hid, oid, abertura, rng.choice(["Status alterado para Em andamento", "Visita realizada",
+                                                    "Contato com cliente", f"Status alterado para {status}"]),
+                   "Operador", _texto(rng, 0, 10))
+
+
+def _insert(pool, sql, rows, log, label):
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= GEN_BATCH:
+            with pool.writer() as conn:
+                conn.executemany(sql, batch)
+            total += len(batch)
+            batch.clear()
+            if total % (GEN_BATCH * 50) == 0:
+                log(f"  {label}: {total}")
+    if batch:
+        with pool.writer() as conn:
+            conn.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def generate(path, orders, seed=42, history_per_order=3, log=print):
+    """Cria `path` com `orders` O.S. e dados relacionados. Retorna as contagens."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    n_clients = max(10, orders // 20)
+    n_techs = max(5, orders // 2000)
+    db.DB_FILE = path
+    pool = get_pool()
+    migrations.migrate(pool)
+
+    # carga inicial: índices e triggers recriados uma vez só no final
+    with pool.writer() as conn:
+        deferred = [sql for table in ("clients", "technicians", "orders", "history")
+                    for sql in importar.suspend_indexes(conn, table)]
+
+    start = time.monotonic()
+    _insert(pool, "INSERT INTO clients (id, nome, tipo_pessoa, documento, cep, rua, numero, bairro, cidade, "
+                  "estado, telefone_principal, data_cadastro, status) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            _clients(rng, n_clients), log, "clientes")
+    _insert(pool, "INSERT INTO technicians (id, nome, cpf, telefone, email) VALUES (?,?,?,?,?)",
+            ((i, _nome(rng), f"{rng.randrange(10**10):011d}", f"81 9{rng.randint(1000, 9999)}-0000",
+              f"tecnico{i}@tdg.com.br") for i in range(1, n_techs + 1)), log, "técnicos")
+
+    resumo = []
+
+    def orders_rows():
+        for row in _orders(rng, orders, n_clients, n_techs):
+            resumo.append((row[0], row[3], row[13]))
+            yield row
+
+    _insert(pool, "INSERT INTO orders (id, cliente_id, tipo_os, data_abertura, data_agendamento, horario_previsto, "
+                  "endereco_execucao, titulo, descricao, tecnico_id, prioridade, canal_origem, equipamentos, "
+                  "status, checklist, tempo_estimado, materiais, data_encerramento) "
+                  "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            orders_rows(), log, "O.S.")
+    n_history = _insert(pool, "INSERT INTO history (id, order_id, timestamp, evento, responsavel, detalhes) "
+                              "VALUES (?,?,?,?,?,?)",
+                        _history(rng, resumo, history_per_order), log, "histórico")
+    log("  recriando índices e totais...")
+    with pool.writer() as conn:
+        importar.restore_indexes(conn, deferred)
+        rebuild_aggregates(conn)
+        for table in busca.INDEXES:
+            busca.rebuild_index(conn, table)
+    pool.invalidate_schema()
+    log(f"  gerado em {time.monotonic() - start:.1f}s")
+    return {"orders": orders, "clients": n_clients, "technicians": n_techs, "history": n_history}
+
+
+# ---------------------------------------------------------
+# Casos medidos
+# ---------------------------------------------------------
+class _Rollback(Exception):
+    pass
+
+
+def _cases(tmp):
+    """(nome, função, aquece antes?) — cada função roda os caminhos reais do app."""
+    import gui_gestao_com_excluir as gui
+
+    pool = get_pool()
+    rng = random.Random(7)
+    max_id = pool.fetch_one("SELECT MAX(id) FROM orders")[0] or 0
+    max_client = pool.fetch_one("SELECT MAX(id) FROM clients")[0] or 0
+    pager = KeysetPager(gui.ORDERS_LIST_SQL, key="o.id")
+    week = day_range((START + timedelta(days=SPAN_DAYS // 2)).strftime("%Y-%m-%d"),
+                     (START + timedelta(days=SPAN_DAYS // 2 + 6)).strftime("%Y-%m-%d"))
+    month = day_range((START + timedelta(days=SPAN_DAYS // 2)).strftime("%Y-%m-%d"),
+                      (START + timedelta(days=SPAN_DAYS // 2 + 29)).strftime("%Y-%m-%d"))
+    week_pager = KeysetPager(gui.ORDERS_LIST_SQL, key="o.id")
+    week_pager.set_filters([("o.abertura_ts >= ?", [week[0]]), ("o.abertura_ts < ?", [week[1]])])
+
+    def client_history():
+        arquivo.client_history(rng.randint(1, max_client))
+
+    def pdf_os():
+        orders, cols = fetch_orders(ids=[rng.randint(1, max_id)])
+        if orders:
+            render_os_pdf(os.path.join(tmp, "os.pdf"), orders[0], cols, LOGO if os.path.exists(LOGO) else None)
+
+    def export_orders():
+        export_csv(CancelToken(), os.path.join(tmp, "os.csv"), "orders")
+
+    def rolled_back(fn, *args, **kwargs):
+        try:
+            with pool.writer():
+                fn(*args, **kwargs)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def bulk_delete():
+        rolled_back(exclusao.delete_orders, rng.sample(range(1, max_id + 1), min(DELETE_COUNT, max_id)))
+
+    purge = order_filters(date_from=(START + timedelta(days=SPAN_DAYS // 2)).strftime("%Y-%m-%d"),
+                          date_to=(START + timedelta(days=SPAN_DAYS // 2 + 29)).strftime("%Y-%m-%d"))
+
+    return [
+        ("listagem_os_primeira_pagina", pager.first, True),
+        ("listagem_os_pagina_meio", lambda: pager.older(max_id // 2), True),
+        ("listagem_os_filtro_semana", week_pager.first, True),
+        ("relatorio_status", lambda: pool.fetch_all(OS_BY_STATUS_SQL), True),
+        ("relatorio_desempenho", lambda: pool.fetch_all(PERFORMANCE_BY_TECH_SQL), True),
+        ("relatorio_status_periodo", lambda: pool.fetch_all(OS_BY_STATUS_RANGE_SQL, month), True),
+        ("relatorio_desempenho_periodo", lambda: pool.fetch_all(PERFORMANCE_BY_TECH_RANGE_SQL, month), True),
+        ("historico_cliente", client_history, True),
+        ("busca_os_texto", lambda: busca.search("orders", "falha camera noturna"), True),
+        ("busca_clientes", lambda: busca.search("clients", "marina silva boa vi"), True),
+        ("exportar_csv_os", export_orders, False),
+        ("pdf_os", pdf_os, True),
+        (f"excluir_{DELETE_COUNT}_os", bulk_delete, False),
+        ("excluir_os_de_um_mes", lambda: rolled_back(exclusao.delete_orders, clauses=purge[0], params=purge[1]),
+         False),
+        ("importacao_tela", lambda: _python("import gui_gestao_com_excluir"), False),
+        ("inicializacao", lambda: _python(_STARTUP_SCRIPT, pool.path), False),
+    ]
+
+
+# o mesmo que App.__init__ faz antes de a janela aparecer: só a primeira aba
+# (clientes) é montada; as outras são montadas quando abertas
+_STARTUP_SCRIPT = """
+import sys
+import db
+db.DB_FILE = sys.argv[1]
+import gui_gestao_com_excluir as gui
+from change_tracker import ChangeTracker
+from virtual_tree import KeysetPager
+gui.init_db()
+ChangeTracker(gui.get_pool().path).close()
+KeysetPager(gui.CLIENTS_LIST_SQL).first()
+db.close_pool()
+"""
+
+
+def _python(code, *args, flags=()):
+    return subprocess.run([sys.executable, *flags, "-c", code, *args], cwd=BASE_DIR, check=True,
+                          capture_output=True, text=True)
+
+
+def import_profile(module="gui_gestao_com_excluir", runs=5):
+    """Perfil de `python -X importtime -c "import module"`: mediana de `runs` execuções.
+
+    Retorna {"total_ms": ..., "modulos": [(nome, próprio_ms, acumulado_ms)]},
+    do mais caro (acumulado) para o mais barato. Uma execução inicial grava os
+    .pyc, para que todas as medidas sejam iguais à de uma inicialização normal.
+    """
+    _python(f"import {module}")
+    samples = {}
+    for _ in range(runs):
+        err = _python(f"import {module}", flags=("-X", "importtime")).stderr
+        for line in err.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            own, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            if not own.isdigit():
+                continue     # cabeçalho
+            samples.setdefault(name, []).append((int(own) / 1000, int(cumulative) / 1000))
+    modules = [(name, round(statistics.median(o for o, _c in s), 3), round(statistics.median(c for _o, c in s), 3))
+               for name, s in samples.items()]
+    modules.sort(key=lambda m: m[2], reverse=True)
+    total = next((m[2] for m in modules if m[0] == module), 0.0)
+    return {"total_ms": total, "modulos": modules}
+
+
+def measure(fn, repeat, warmup=True):
+    if warmup:
+        fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(runs), 3), "min_ms": round(min(runs), 3),
+            "max_ms": round(max(runs), 3), "runs": repeat}
+
+
+def run_suite(repeat=DEFAULT_REPEAT, only=None, log=print):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn, warmup in _cases(tmp):
+            if only and name not in only:
+                continue
+            results[name] = measure(fn, repeat, warmup)
+            log(f"  {name:32s} {results[name]['median_ms']:10.2f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Variação da mediana de cada caso em relação ao baseline."""
+    comparison = {}
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base["median_ms"]:
+            continue
+        ratio = res["median_ms"] / base["median_ms"]
+        comparison[name] = {
+            "baseline_ms": base["median_ms"],
+            "atual_ms": res["median_ms"],
+            "variacao": round(ratio - 1, 4),
+            "situacao": "pior" if ratio > 1 + tolerance else "melhor" if ratio < 1 - tolerance else "igual",
+        }
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark com dados sintéticos")
+    parser.add_argument("--ordens", type=int, default=10000, help="quantidade de O.S. geradas")
+    parser.add_argument("--historico", type=int, default=3, help="eventos de histórico por O.S. (média)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--db", help="banco de rascunho (padrão: bench_<ordens>.db na pasta temporária)")
+    parser.add_argument("--regerar", action="store_true", help="gera o banco mesmo se já existir")
+    parser.add_argument("--repeticoes", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--casos", nargs="*", help="mede só estes casos")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON com os resultados")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=DEFAULT_TOLERANCE,
+                        help="variação aceita antes de marcar piora (0.10 = 10%%)")
+    parser.add_argument("--salvar-baseline", metavar="ARQUIVO", help="grava o resultado também como baseline")
+    parser.add_argument("--importtime", action="store_true", help="só o perfil de importação da tela")
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        profile = import_profile(runs=args.repeticoes)
+        print(f"Importação da tela: {profile['total_ms']:.1f} ms (mediana de {args.repeticoes})")
+        for name, own, cumulative in profile["modulos"][:IMPORT_TOP]:
+            print(f"  {name:40s} {own:8.2f} {cumulative:10.2f} ms")
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"importacao": profile}, f, ensure_ascii=False, indent=2)
+        return 0
+
+    path = args.db or os.path.join(tempfile.gettempdir(), f"bench_{args.ordens}.db")
+    try:
+        dataset = None
+        if not args.regerar and os.path.exists(path):
+            db.DB_FILE = path
+            try:
+                count = get_pool().fetch_one("SELECT MAX(id) FROM orders")[0]
+            except sqlite3.Error:
+                count = None
+            if count == args.ordens:
+                print(f"Reaproveitando {path}")
+                migrations.migrate(get_pool())
+                dataset = {"orders": count}
+            else:
+                db.close_pool()
+        if dataset is None:
+            print(f"Gerando {args.ordens} O.S. em {path}...")
+            dataset = generate(path, args.ordens, seed=args.semente, history_per_order=args.historico)
+
+        print(f"Medindo ({args.repeticoes} repetições):")
+        results = run_suite(args.repeticoes, args.casos)
+    finally:
+        db.close_pool()
+
+    report = {
+        "meta": {
+            "data": datetime.now().strftime(DATE_FMT),
+            "ordens": args.ordens,
+            "dataset": dataset,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "repeticoes": args.repeticoes,
+        },
+        "results": results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(results, json.load(f), args.tolerancia)
+        print("\nComparação com o baseline:")
+        for name, c in report["comparison"].items():
+            print(f"  {name:32s} {c['baseline_ms']:10.2f} -> {c['atual_ms']:10.2f} ms "
+                  f"({c['variacao']:+.1%}) {c['situacao']}")
+            if c["situacao"] == "pior":
+                regressions.append(name)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.salvar_baseline:
+        with open(args.salvar_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados em {args.saida}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busca textual (SQLite FTS5) em O.S. e clientes
+
+Dois índices FTS5 de conteúdo externo (o texto não é duplicado; snippet()
+lê da própria tabela), criados na migração 11 e mantidos por triggers de
+INSERT/UPDATE/DELETE:
+
+- orders_fts: titulo, descricao, equipamentos, checklist, observacoes_finais
+- clients_fts: nome, documento, rua, bairro; o conteúdo vem da view
+  clients_fts_src, que acrescenta ao documento só os dígitos (assim
+  "12345678900" acha "123.456.789-00")
+
+O tokenizador ignora acentos e maiúsculas; a última palavra digitada vale
+como prefixo ("troca dvr-1234" acha "Troca do DVR-12345X"). A ordem é bm25 com pesos por
+coluna (gravados no índice, ORDER BY rank resolvido dentro do FTS5) entre
+as RANK_WINDOW ocorrências mais recentes, e o trecho encontrado vem
+destacado entre colchetes.
+
+A importação em massa (importar.py, benchmark.py) remove os triggers e
+chama rebuild_index() no final. Se o índice ficar fora de sincronia
+(edição manual do banco), reconstrua:
+
+    python busca.py --reconstruir --otimizar
+    python busca.py "dvr 1234" [--clientes]
+"""
+
+import argparse
+import re
+import sqlite3
+import time
+
+import db
+from texto import fold
+
+TOKENIZE = "unicode61 remove_diacritics 2"
+SEARCH_LIMIT = 200
+# só as RANK_WINDOW ocorrências mais recentes (maior id) entram no bm25: termos
+# que aparecem em quase tudo ("câmera") não obrigam a pontuar milhões de linhas
+RANK_WINDOW = 5000
+SNIPPET_TOKENS = 12
+
+
+class FtsSpec:
+    def __init__(self, fts, table, content, columns, weights, alias):
+        self.fts = fts
+        self.table = table
+        self.content = content      # tabela ou view lida pelo FTS5 (rebuild, snippet)
+        self.columns = columns
+        self.weights = weights
+        self.alias = alias          # alias da tabela nos filtros extras de search()
+
+
+def _doc_digits(ref):
+    """Documento seguido só dos dígitos (mesma expressão na view e nos triggers)."""
+    digits = f"IFNULL({ref}documento, '')"
+    for ch in ".-/() ":
+        digits = f"replace({digits}, '{ch}', '')"
+    return (f"CASE WHEN {digits} = IFNULL({ref}documento, '') THEN {digits} "
+            f"ELSE IFNULL({ref}documento, '') || ' ' || {digits} END")
+
+
+INDEXES = {
+    "orders": FtsSpec("orders_fts", "orders", "orders",
+                      ("titulo", "descricao", "equipamentos", "checklist", "observacoes_finais"),
+                      (10.0, 4.0, 8.0, 2.0, 3.0), "o"),
+    "clients": FtsSpec("clients_fts", "clients", "clients_fts_src",
+                       ("nome", "documento", "rua", "bairro"),
+                       (10.0, 8.0, 2.0, 3.0), "c"),
+}
+
+# colunas do índice calculadas a partir da linha (o resto é a coluna em si)
+_COMPUTED = {("clients", "documento"): _doc_digits}
+
+
+def _values(spec, ref):
+    """Expressões indexadas da linha `ref` ("new." / "old." / "") na ordem de spec.columns."""
+    return [_COMPUTED[(spec.table, c)](ref) if (spec.table, c) in _COMPUTED else f"{ref}{c}" for c in spec.columns]
+
+
+def create_index(conn, table):
+    """Índice FTS5, view de conteúdo (se houver) e triggers de `table`; indexa o que já existe."""
+    spec = INDEXES[table]
+    cols = ", ".join(spec.columns)
+    if spec.content != spec.table:
+        # o FTS5 lê o conteúdo pelos nomes das colunas
+        named = ", ".join(f"{expr} AS {c}" for expr, c in zip(_values(spec, ''), spec.columns))
+        conn.execute(f"CREATE VIEW IF NOT EXISTS {spec.content} AS SELECT id, {named} FROM {spec.table}")
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {spec.fts} USING fts5({cols}, content='{spec.content}', "
+                 f"content_rowid='id', tokenize='{TOKENIZE}', prefix='2 3')")
+    conn.execute(f"INSERT INTO {spec.fts}({spec.fts}, rank) VALUES "
+                 f"('rank', 'bm25({', '.join(map(str, spec.weights))})')")
+    insert = f"INSERT INTO {spec.fts}(rowid, {cols}) VALUES (new.id, {', '.join(_values(spec, 'new.'))});"
+    delete = (f"INSERT INTO {spec.fts}({spec.fts}, rowid, {cols}) "
+              f"VALUES ('delete', old.id, {', '.join(_values(spec, 'old.'))});")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_i AFTER INSERT ON {table} BEGIN {insert} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_d AFTER DELETE ON {table} BEGIN {delete} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_u AFTER UPDATE OF {cols} ON {table} "
+                 f"BEGIN {delete} {insert} END")
+    rebuild_index(conn, table)
+
+
+def rebuild_index(conn, table):
+    """Reindexa `table` inteira a partir do conteúdo (depois de carga sem triggers)."""
+    fts = INDEXES[table].fts
+    conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def match_query(text):
+    """Consulta FTS5 segura a partir do texto digitado ('troca dvr-12' -> '"troca" AND "dvr 12"*').
+
+    Só a última palavra (a que ainda está sendo digitada) e números
+    (documentos, seriais) viram prefixo: um termo exato lê uma lista só do
+    índice, um prefixo junta as de todos os termos que começam com ele.
+    Prefixo de uma letra não é expandido.
+    """
+    phrases = [tokens for tokens in (re.findall(r"[^\W_]+", fold(w)) for w in (text or "").split()) if tokens]
+    terms = []
+    for n, tokens in enumerate(phrases, 1):
+        numeric = all(t.isdigit() for t in tokens)
+        star = "*" if (n == len(phrases) or numeric) and len(tokens[-1]) > 1 else ""
+        term = f'"{" ".join(tokens)}"{star}'
+        if len(tokens) > 1 and numeric:
+            # "123.456-7": como foi digitado ou só os dígitos (documento em clients_fts)
+            term = f'({term} OR "{"".join(tokens)}"{star})'
+        terms.append(term)
+    return " AND ".join(terms)
+
+
+def search(table, text, limit=SEARCH_LIMIT, filters=()):
+    """[(id, trecho destacado)] por relevância. `filters`: [(SQL com o alias da tabela, parâmetros)]."""
+    query = match_query(text)
+    if not query:
+        return []
+    spec = INDEXES[table]
+    source = f"FROM {spec.fts} JOIN {spec.table} {spec.alias} ON {spec.alias}.id = {spec.fts}.rowid"
+    clauses = [f"{spec.fts} MATCH ?"] + [sql for sql, _ in filters]
+    params = [query] + [p for _, ps in filters for p in ps]
+    with db.get_pool().reader() as conn:
+        # percorrer em ordem de rowid é barato (sem pontuar): acha o piso da janela
+        floor = conn.execute(f"SELECT {spec.fts}.rowid {source} WHERE {' AND '.join(clauses)} "
+                             f"ORDER BY {spec.fts}.rowid DESC LIMIT 1 OFFSET ?", params + [RANK_WINDOW - 1]).fetchone()
+        if floor:
+            clauses.append(f"{spec.fts}.rowid >= ?")
+            params.append(floor[0])
+        return conn.execute(
+            f"SELECT {spec.alias}.id, snippet({spec.fts}, -1, '[', ']', '...', {SNIPPET_TOKENS}) {source} "
+            f"WHERE {' AND '.join(clauses)} ORDER BY rank LIMIT ?", params + [limit]).fetchall()
+
+
+def match_filter(table, text, column=None):
+    """Filtro (SQL, parâmetros) "registro casa com a busca" para KeysetPager.set_filters().
+
+    `column`: id da tabela na consulta da listagem (padrão: alias.id).
+    """
+    spec = INDEXES[table]
+    column = column or f"{spec.alias}.id"
+    return (f"{column} IN (SELECT rowid FROM {spec.fts} WHERE {spec.fts} MATCH ?)", [match_query(text)])
+
+
+# ---------------- Manutenção ----------------
+def rebuild(token=None):
+    """Reconstrói os dois índices (aceita o CancelToken do executor)."""
+    with db.get_pool().writer() as conn:
+        for table in INDEXES:
+            rebuild_index(conn, table)
+
+
+def optimize(token=None):
+    """Funde os segmentos de cada índice em um só (buscas mais rápidas depois de muitas gravações)."""
+    with db.get_pool().writer() as conn:
+        for spec in INDEXES.values():
+            conn.execute(f"INSERT INTO {spec.fts}({spec.fts}) VALUES ('optimize')")
+
+
+def check():
+    """Nomes dos índices fora de sincronia com as tabelas (lista vazia = tudo certo)."""
+    bad = []
+    with db.get_pool().writer() as conn:
+        for spec in INDEXES.values():
+            try:
+                conn.execute(f"INSERT INTO {spec.fts}({spec.fts}, rank) VALUES ('integrity-check', 1)")
+            except sqlite3.DatabaseError:
+                bad.append(spec.fts)
+    return bad
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca textual em O.S. e clientes (FTS5)")
+    parser.add_argument("texto", nargs="?")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--clientes", action="store_true", help="busca em clientes (padrão: O.S.)")
+    parser.add_argument("--limite", type=int, default=20)
+    parser.add_argument("--reconstruir", action="store_true", help="reindexa tudo a partir das tabelas")
+    parser.add_argument("--otimizar", action="store_true", help="funde os segmentos dos índices")
+    parser.add_argument("--verificar", action="store_true", help="confere os índices contra as tabelas")
+    args = parser.parse_args(argv)
+    import migrations  # aqui dentro: migrations importa este módulo
+    db.DB_FILE = args.db
+    try:
+        migrations.migrate(db.get_pool())
+        for flag, fn, name in ((args.reconstruir, rebuild, "reconstruídos"), (args.otimizar, optimize, "otimizados")):
+            if flag:
+                start = time.perf_counter()
+                fn()
+                print(f"Índices {name} em {time.perf_counter() - start:.1f}s")
+        if args.verificar:
+            bad = check()
+            print("Índices fora de sincronia: " + ", ".join(bad) if bad else "Índices em ordem.")
+        if args.texto:
+            start = time.perf_counter()
+            rows = search("clients" if args.clientes else "orders", args.texto, args.limite)
+            elapsed = (time.perf_counter() - start) * 1000
+            for oid, trecho in rows:
+                print(f"{oid:8d}  {trecho}")
+            print(f"{len(rows)} resultado(s) em {elapsed:.1f} ms")
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache em disco das imagens redimensionadas (logo, fundos, splash)
+
+Cada variante (arquivo de origem + tamanho + formato) é gerada uma vez com o
+Pillow e gravada em CACHE_DIR; as aberturas seguintes só leem o arquivo
+pronto. A chave inclui caminho, mtime e tamanho do arquivo de origem, então
+trocar a imagem gera uma variante nova (e apaga a antiga).
+
+- Tela: PNG, carregado direto pelo tk.PhotoImage (sem importar o Pillow).
+- PDF: JPEG compacto no tamanho em que a logo é impressa, em vez da foto
+  original em resolução cheia embutida em cada arquivo.
+
+Sem o Pillow, variant() devolve None e quem chama usa a imagem original.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import diagnostico
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache_imagens")
+
+# logo impressa em 110x90 pt: 2x para ficar nítida na impressão
+PDF_LOGO_SIZE = (220, 180)
+PDF_JPEG_QUALITY = 85
+
+
+def cache_dir():
+    """CACHE_DIR, ou uma pasta temporária se ela não puder ser criada (ex.: pasta do EXE)."""
+    for path in (CACHE_DIR, os.path.join(tempfile.gettempdir(), "tdg_cache_imagens")):
+        try:
+            os.makedirs(path, exist_ok=True)
+            if os.access(path, os.W_OK):
+                return path
+        except OSError:
+            continue
+    return None
+
+
+def _target_size(img_size, size, fit):
+    """Tamanho final: "resize" estica para `size`; "cover" cobre `size` mantendo a proporção;
+    "contain" cabe em `size` mantendo a proporção."""
+    w, h = size
+    if fit == "resize":
+        return w, h
+    ratio = img_size[0] / img_size[1]
+    wider = ratio > w / h
+    if (fit == "cover") == wider:
+        return max(1, int(h * ratio)), h
+    return w, max(1, int(w / ratio))
+
+
+def variant(path, size, fit="resize", fmt="PNG", quality=PDF_JPEG_QUALITY):
+    """Caminho da variante de `path` no tamanho/formato pedidos (gerada se preciso), ou None."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    folder = cache_dir()
+    if folder is None:
+        return None
+    source = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")[:40]
+    # o prefixo identifica a variante (origem, tamanho, formato); o hash final, a versão da origem
+    variant_id = f"{fit}_{fmt.lower()}" + (f"{quality}" if fmt == "JPEG" else "")
+    prefix = f"{stem}_{size[0]}x{size[1]}_{variant_id}_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}_"
+    key = f"{source}|{st.st_mtime_ns}|{st.st_size}"
+    name = prefix + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12] + (".png" if fmt == "PNG" else ".jpg")
+    out = os.path.join(folder, name)
+    if os.path.exists(out):
+        return out
+    try:
+        from PIL import Image
+    except Exception:
+        return None
+    try:
+        with Image.open(path) as img:
+            img = img.resize(_target_size(img.size, size, fit), Image.LANCZOS)
+            if fmt == "JPEG" and img.mode != "RGB":
+                img = img.convert("RGB")
+            tmp = f"{out}.{os.getpid()}.tmp"
+            img.save(tmp, fmt, **({"quality": quality, "optimize": True} if fmt == "JPEG" else {}))
+        os.replace(tmp, out)
+    except Exception as e:
+        diagnostico.error(f"Erro ao gerar variante da imagem {path}", e)
+        return None
+    # versões antigas desta mesma variante (origem alterada)
+    for old in os.listdir(folder):
+        if old.startswith(prefix) and old != name and not old.endswith(".tmp"):
+            try:
+                os.remove(os.path.join(folder, old))
+            except OSError:
+                pass
+    return out
+
+
+def photo(path, size, fit="resize", master=None):
+    """tk.PhotoImage da variante PNG de `path` (None se a imagem não puder ser carregada)."""
+    cached = variant(path, size, fit)
+    if cached is None:
+        return None
+    import tkinter as tk  # aqui: os workers de PDF e o benchmark usam este módulo sem Tk
+    return tk.PhotoImage(file=cached, master=master)
+
+
+def pdf_logo(path):
+    """Logo em JPEG compacto para os PDFs; cai no arquivo original se não der para gerar."""
+    if not path:
+        return path
+    return variant(path, PDF_LOGO_SIZE, fit="contain", fmt="JPEG") or path
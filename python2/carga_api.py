@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de carga da API (servidor.py): leitores e escritores simultâneos
+
+Cada thread abre uma conexão HTTP/1.1 (keep-alive) e repete, até o fim do
+tempo, o que um cliente faria:
+
+- leitor: lista O.S. (primeira e segunda página), abre uma O.S. e o histórico;
+  guarda os ETags e manda If-None-Match (respostas 304 são contadas à parte)
+- escritor: muda o status de uma O.S. aleatória (POST /os/<id>/status)
+
+Mostra requisições/s e p50/p95 por tipo. Sem --url, sobe o servidor neste
+processo sobre um banco sintético (benchmark.generate), reaproveitado entre
+execuções com o mesmo --ordens.
+
+    python carga_api.py --leitores 8 --escritores 2 --segundos 10
+    python carga_api.py --url http://192.168.0.10:8080 --token segredo
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import benchmark
+import db
+import migrations
+import ordens
+import servidor
+
+DEFAULT_READERS = 8
+DEFAULT_WRITERS = 2
+DEFAULT_SECONDS = 10
+
+
+def _pct(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Client:
+    """Conexão keep-alive com cache de ETags por URL."""
+
+    def __init__(self, host, port, token=None):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.token = token
+        self.etags = {}
+
+    def request(self, method, path, body=None):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        if method == "GET" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        if body is not None:
+            body = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        self.conn.request(method, path, body=body, headers=headers)
+        resp = self.conn.getresponse()
+        data = resp.read()
+        if resp.getheader("ETag"):
+            self.etags[path] = resp.getheader("ETag")
+        return resp.status, json.loads(data) if data else None
+
+    def close(self):
+        self.conn.close()
+
+
+def _reader(client, rng, max_id, record):
+    status, page = record("listar", client.request, "GET", "/os?limite=50")
+    if status == 200 and page["proximo"]:
+        record("listar", client.request, "GET", f"/os?limite=50&antes={page['proximo']}")
+    oid = rng.randint(1, max_id)
+    record("detalhe", client.request, "GET", f"/os/{oid}")
+    record("historico", client.request, "GET", f"/os/{oid}/historico")
+
+
+def _writer(client, rng, max_id, record):
+    body = {"status": rng.choice(ordens.STATUS), "responsavel": "carga", "detalhes": ""}
+    record("status", client.request, "POST", f"/os/{rng.randint(1, max_id)}/status", body)
+
+
+def run_load(host, port, max_id, readers=DEFAULT_READERS, writers=DEFAULT_WRITERS, seconds=DEFAULT_SECONDS,
+             token=None, seed=42):
+    """Roda a carga e devolve o resumo {"total": {...}, "tipos": {tipo: {...}}}."""
+    lock = threading.Lock()
+    times = {}
+    counts = {"erros": 0, "nao_modificado": 0}
+    deadline = time.monotonic() + seconds
+
+    def worker(step, n):
+        rng = random.Random(seed + n)
+        client = _Client(host, port, token)
+
+        def record(kind, fn, *args):
+            start = time.perf_counter()
+            try:
+                status, payload = fn(*args)
+            except (OSError, http.client.HTTPException, ValueError):
+                status, payload = 0, None
+                client.close()
+            ms = (time.perf_counter() - start) * 1000
+            with lock:
+                times.setdefault(kind, []).append(ms)
+                if status == 304:
+                    counts["nao_modificado"] += 1
+                elif status not in (200, 404):
+                    counts["erros"] += 1
+            return status, payload
+
+        try:
+            while time.monotonic() < deadline:
+                step(client, rng, max_id, record)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(_reader, i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=(_writer, readers + i)) for i in range(writers)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    kinds = {}
+    for kind, values in sorted(times.items()):
+        values.sort()
+        kinds[kind] = {"n": len(values), "req_s": round(len(values) / elapsed, 1),
+                       "p50_ms": round(_pct(values, 50), 2), "p95_ms": round(_pct(values, 95), 2)}
+    total = sum(k["n"] for k in kinds.values())
+    return {"total": {"n": total, "req_s": round(total / elapsed, 1), "segundos": round(elapsed, 2),
+                      "leitores": readers, "escritores": writers, **counts},
+            "tipos": kinds}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API das O.S.")
+    parser.add_argument("--url", help="servidor já em execução (padrão: sobe um neste processo)")
+    parser.add_argument("--token")
+    parser.add_argument("--ordens", type=int, default=10000, help="O.S. do banco sintético")
+    parser.add_argument("--db", help="banco usado pelo servidor local (padrão: bench_<ordens>.db)")
+    parser.add_argument("--leitores", type=int, default=DEFAULT_READERS)
+    parser.add_argument("--escritores", type=int, default=DEFAULT_WRITERS)
+    parser.add_argument("--segundos", type=float, default=DEFAULT_SECONDS)
+    parser.add_argument("--saida", help="grava o resumo em JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        max_id = args.ordens
+    else:
+        path = args.db or os.path.join(tempfile.gettempdir(), f"bench_{args.ordens}.db")
+        if os.path.exists(path):
+            db.DB_FILE = path
+            migrations.migrate(db.get_pool())
+        else:
+            print(f"Gerando {args.ordens} O.S. em {path}...")
+            benchmark.generate(path, args.ordens)
+        max_id = db.get_pool().fetch_one("SELECT MAX(id) FROM orders")[0] or 1
+        server = servidor.make_server(port=0, token=args.token)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+    print(f"Carga em {host}:{port}: {args.leitores} leitores, {args.escritores} escritores, {args.segundos:g}s")
+    try:
+        result = run_load(host, port, max_id, args.leitores, args.escritores, args.segundos, args.token)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            db.close_pool()
+
+    total = result["total"]
+    print(f"  total {total['n']} requisições, {total['req_s']} req/s "
+          f"({total['nao_modificado']} respostas 304, {total['erros']} erros)")
+    for kind, res in result["tipos"].items():
+        print(f"  {kind:10s} {res['n']:8d} {res['req_s']:9.1f} req/s   p50 {res['p50_ms']:7.2f} ms"
+              f"   p95 {res['p95_ms']:7.2f} ms")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 1 if total["erros"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
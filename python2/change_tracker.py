@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detecção de alterações para atualizar as listagens de forma incremental
+
+Triggers em clients/technicians/orders gravam cada INSERT/UPDATE/DELETE na
+tabela change_log (migração 3). O ChangeTracker guarda o último `seq` já
+aplicado e, a cada poll(), devolve apenas os ids alterados desde então.
+PRAGMA data_version (em uma conexão própria) evita até a leitura do log
+quando nenhuma outra conexão gravou nada, então o poll periódico é barato.
+"""
+
+from db import connect
+
+# Quantas entradas do log são mantidas ao podar (ver prune_change_log)
+CHANGE_LOG_KEEP = 10000
+
+
+class ChangeTracker:
+    def __init__(self, path):
+        self._conn = connect(path, readonly=True)
+        self._data_version = self._read_data_version()
+        self.last_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self):
+        """Alterações desde a última chamada.
+
+        Retorna {tabela: (ids_inseridos_ou_alterados, ids_excluidos)}, um dict
+        vazio se nada mudou, ou None se o log foi podado além do ponto em que
+        paramos (nesse caso quem chama deve recarregar tudo).
+        """
+        version = self._read_data_version()
+        if version == self._data_version:
+            return {}
+        self._data_version = version
+
+        rows = self._conn.execute(
+            "SELECT seq, tbl, row_id, op FROM change_log WHERE seq > ? ORDER BY seq",
+            (self.last_seq,)).fetchall()
+        if not rows:
+            return {}
+        pruned_gap = self.last_seq and rows[0][0] > self.last_seq + 1
+        self.last_seq = rows[-1][0]
+        if pruned_gap:
+            return None
+
+        # a última operação de cada registro é a que vale
+        latest = {}
+        for _seq, table, row_id, op in rows:
+            latest[(table, row_id)] = op
+        changes = {}
+        for (table, row_id), op in latest.items():
+            upserts, deletes = changes.setdefault(table, (set(), set()))
+            (deletes if op == 'D' else upserts).add(row_id)
+        return changes
+
+    def close(self):
+        self._conn.close()
+
+
+def log_bulk_load(conn, table):
+    """Registra no log uma carga feita sem os triggers (importar.py --carga-inicial).
+
+    Pula um número de sequência: para os ChangeTrackers é o mesmo que log
+    podado (recarregam tudo), e MAX(seq), parte da versão dos dados do
+    servidor (ETag), muda.
+    """
+    conn.execute("INSERT INTO change_log (seq, tbl, row_id, op) "
+                 "SELECT IFNULL(MAX(seq), 0) + 2, ?, 0, 'U' FROM change_log", (table,))
+
+
+def prune_change_log(pool, keep=CHANGE_LOG_KEEP):
+    """Remove entradas antigas do log, mantendo as `keep` mais recentes."""
+    low, high = pool.fetch_one("SELECT MIN(seq), MAX(seq) FROM change_log")
+    if low is None or high - low < 2 * keep:
+        return 0
+    with pool.writer() as conn:
+        return conn.execute(
+            "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?",
+            (keep,)).rowcount
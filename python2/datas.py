@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Datas como texto (DATE_FMT) e como epoch indexado
+
+As datas continuam gravadas como texto "YYYY-MM-DD HH:MM:SS", mas cada uma
+tem uma coluna gerada com o epoch inteiro (migração 6), indexada:
+
+    orders.abertura_ts, orders.encerramento_ts, orders.agendamento_ts, history.ts
+
+Filtros de período e durações usam essas colunas (busca por faixa no índice,
+sem julianday() linha a linha). O epoch trata o texto como hora "ingênua"
+(sem fuso), igual a strftime('%s', ...) do SQLite.
+
+data_agendamento é digitada livremente; backfill() reescreve no DATE_FMT os
+valores que estão em outro formato conhecido (ex.: 25/12/2025 14:00) para que
+a coluna gerada deixe de ser NULL:
+
+    python datas.py --db gestao.db
+"""
+
+import argparse
+import calendar
+from datetime import datetime, timedelta
+
+import db
+
+DATE_FMT = "%Y-%m-%d %H:%M:%S"
+DAY_FMT = "%Y-%m-%d"
+BACKFILL_BATCH = 2000
+
+# formatos aceitos na digitação, do mais para o menos comum
+INPUT_FORMATS = (
+    DATE_FMT, "%Y-%m-%d %H:%M", DAY_FMT,
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%d/%m/%y %H:%M", "%d/%m/%y",
+)
+
+# (tabela, coluna texto, coluna epoch gerada)
+TS_COLUMNS = (
+    ("orders", "data_abertura", "abertura_ts"),
+    ("orders", "data_encerramento", "encerramento_ts"),
+    ("orders", "data_agendamento", "agendamento_ts"),
+    ("history", "timestamp", "ts"),
+)
+
+TS_EXPR = "CAST(strftime('%s', {col}) AS INTEGER)"
+
+
+def parse(text):
+    """datetime de um texto em qualquer formato de INPUT_FORMATS, ou None."""
+    text = (text or "").strip()
+    for fmt in INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def normalize(text):
+    """Texto no DATE_FMT; devolve o próprio texto se não for uma data reconhecida."""
+    dt = parse(text)
+    return dt.strftime(DATE_FMT) if dt else text
+
+
+def to_ts(dt):
+    return calendar.timegm(dt.timetuple())
+
+
+def from_ts(ts):
+    """Inverso de to_ts(): datetime "ingênuo" do epoch."""
+    return datetime(1970, 1, 1) + timedelta(seconds=ts)
+
+
+def day_range(date_from=None, date_to=None):
+    """(início, fim) em epoch para dias YYYY-MM-DD; date_to é inclusiva, None = aberto."""
+    start = to_ts(datetime.strptime(date_from, DAY_FMT)) if date_from else None
+    end = to_ts(datetime.strptime(date_to, DAY_FMT) + timedelta(days=1)) if date_to else None
+    return start, end
+
+
+def week_bounds(today=None):
+    """Segunda e domingo (YYYY-MM-DD) da semana de `today`."""
+    today = today or datetime.now()
+    monday = today - timedelta(days=today.weekday())
+    return monday.strftime(DAY_FMT), (monday + timedelta(days=6)).strftime(DAY_FMT)
+
+
+def range_clauses(column, date_from=None, date_to=None):
+    """Cláusulas/parâmetros de faixa sobre uma coluna epoch (usa o índice)."""
+    start, end = day_range(date_from, date_to)
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append(f"{column} < ?")
+        params.append(end)
+    return clauses, params
+
+
+def backfill(token=None, batch_size=BACKFILL_BATCH):
+    """Normaliza textos de data fora do DATE_FMT. Retorna (corrigidos, não reconhecidos).
+
+    Só visita linhas com texto preenchido e epoch NULL (busca pelo índice da
+    coluna gerada), em lotes por id, uma transação por lote.
+    """
+    pool = db.get_pool()
+    fixed = unknown = 0
+    for table, col, ts in TS_COLUMNS:
+        last = 0
+        while True:
+            if token is not None:
+                token.check()
+            rows = pool.fetch_all(
+                f"SELECT id, {col} FROM {table} WHERE {ts} IS NULL AND id > ? "
+                f"AND {col} IS NOT NULL AND {col} != '' ORDER BY id LIMIT ?",
+                (last, batch_size))
+            if not rows:
+                break
+            last = rows[-1][0]
+            updates = []
+            for row_id, text in rows:
+                value = normalize(text)
+                if value != text:
+                    updates.append((value, row_id))
+                else:
+                    unknown += 1
+            if updates:
+                with pool.writer() as conn:
+                    conn.executemany(f"UPDATE {table} SET {col} = ? WHERE id = ?", updates)
+                fixed += len(updates)
+    return fixed, unknown
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normaliza datas digitadas fora do padrão")
+    parser.add_argument("--db", default=db.DB_FILE)
+    args = parser.parse_args(argv)
+    import migrations
+    db.DB_FILE = args.db
+    try:
+        migrations.migrate(db.get_pool())
+        fixed, unknown = backfill()
+    finally:
+        db.close_pool()
+    print(f"{fixed} datas normalizadas, {unknown} não reconhecidas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Camada de acesso ao banco de dados (SQLite, arquivo: gestao.db)
+
+Mantém conexões de longa duração em vez de abrir/fechar uma a cada chamada:
+- um único escritor (serializado por lock, transações BEGIN IMMEDIATE)
+- N leitores reaproveitados, em modo WAL (leitores não bloqueiam o escritor)
+- busy_timeout em todas as conexões; BEGIN IMMEDIATE ainda é repetido
+  algumas vezes, com espera crescente, se o banco continuar ocupado (várias
+  estações gravando no mesmo arquivo pela rede)
+- cache de statements preparados (cached_statements do sqlite3)
+- cache do esquema (colunas de cada tabela), sem PRAGMA table_info repetido
+- statements medidos por diagnostico.TracedConnection (quando ligado)
+- PRAGMA foreign_keys ligado (ON DELETE CASCADE / SET NULL valem)
+"""
+
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from diagnostico import TracedConnection
+
+DB_FILE = "gestao.db"
+
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+DEFAULT_READERS = 4
+# novas tentativas de BEGIN IMMEDIATE depois do busy_timeout, com espera base em segundos
+BEGIN_RETRIES = 3
+BEGIN_BACKOFF_S = 0.05
+
+
+def connect(path=None, readonly=False):
+    """Abre uma conexão já configurada (busy_timeout, cache de statements)."""
+    conn = sqlite3.connect(
+        path or DB_FILE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=TracedConnection,
+    )
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    if readonly:
+        conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def is_busy(exc):
+    """True para "database is locked"/"database is busy" (outra conexão com o lock)."""
+    text = str(exc).lower()
+    return "locked" in text or "busy" in text
+
+
+def get_conn():
+    """Conexão avulsa (fora do pool). Quem chama é responsável por fechá-la."""
+    return connect()
+
+
+class ConnectionPool:
+    """Pool com um escritor e até `readers` leitores sobre o mesmo arquivo."""
+
+    def __init__(self, path, readers=DEFAULT_READERS):
+        self.path = path
+        self.max_readers = max(1, readers)
+        self._write_lock = threading.RLock()
+        self._readers = queue.LifoQueue()
+        self._all_readers = []
+        self._readers_lock = threading.Lock()
+        self._columns = {}
+        self._attached = {}
+        self._closed = False
+
+        # O escritor é criado primeiro: é ele quem coloca o arquivo em WAL.
+        self._writer = connect(path)
+        self._writer.execute("PRAGMA journal_mode = WAL")
+
+    # ---------------- Leitura ----------------
+    def _acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if len(self._all_readers) < self.max_readers:
+                conn = connect(self.path, readonly=True)
+                self._all_readers.append(conn)
+                return conn
+        return self._readers.get(timeout=BUSY_TIMEOUT_MS / 1000)
+
+    @contextmanager
+    def reader(self):
+        """Empresta uma conexão de leitura do pool."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Pool de conexões já foi fechado.")
+        conn = self._acquire_reader()
+        try:
+            self._apply_attached(conn)
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def fetch_all(self, sql, params=()):
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def fetch_one(self, sql, params=()):
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    # ---------------- Escrita ----------------
+    @contextmanager
+    def writer(self, foreign_keys=True):
+        """Transação de escrita: commit ao sair, rollback em caso de erro.
+
+        Chamadas aninhadas na mesma thread participam da transação externa.
+        foreign_keys=False desliga as chaves estrangeiras durante a transação
+        (para recriar tabelas nas migrações); o PRAGMA só pode mudar fora de
+        uma transação, então não vale para chamadas aninhadas.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Pool de conexões já foi fechado.")
+        with self._write_lock:
+            conn = self._writer
+            if conn.in_transaction:
+                yield conn
+                return
+            self._apply_attached(conn)
+            if not foreign_keys:
+                conn.execute("PRAGMA foreign_keys = OFF")
+            try:
+                self._begin(conn)
+                try:
+                    yield conn
+                except BaseException:
+                    conn.rollback()
+                    raise
+                else:
+                    conn.commit()
+            finally:
+                if not foreign_keys:
+                    conn.execute("PRAGMA foreign_keys = ON")
+
+    @staticmethod
+    def _begin(conn):
+        """BEGIN IMMEDIATE com até BEGIN_RETRIES novas tentativas se o banco estiver travado."""
+        for attempt in range(BEGIN_RETRIES + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if attempt == BEGIN_RETRIES or not is_busy(e):
+                    raise
+            # espera exponencial com variação, para as estações não tentarem juntas
+            time.sleep(BEGIN_BACKOFF_S * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def execute(self, sql, params=()):
+        """Executa um único comando de escrita e devolve o cursor."""
+        with self.writer() as conn:
+            return conn.execute(sql, params)
+
+    # ---------------- Bancos anexados ----------------
+    def attach(self, alias, path):
+        """Anexa outro arquivo (ATTACH ... AS alias) a todas as conexões do pool.
+
+        ATTACH não pode rodar dentro de uma transação, então cada conexão é
+        anexada na próxima vez que for emprestada (reader()/writer()).
+        """
+        with self._write_lock:
+            self._attached = dict(self._attached, **{alias: os.path.abspath(path)})
+
+    def attached(self, alias):
+        return alias in self._attached
+
+    def _apply_attached(self, conn):
+        wanted = self._attached
+        done = getattr(conn, "attached", None)
+        if done is None:
+            done = conn.attached = {}
+        if done == wanted or conn.in_transaction:
+            return
+        for alias, path in wanted.items():
+            if done.get(alias) != path:
+                if alias in done:
+                    conn.execute(f"DETACH DATABASE {alias}")
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+                done[alias] = path
+
+    # ---------------- Esquema ----------------
+    def columns(self, table):
+        """Nomes das colunas de `table`, em ordem (consulta feita uma só vez)."""
+        cols = self._columns.get(table)
+        if cols is None:
+            with self.reader() as conn:
+                cols = tuple(r[1] for r in conn.execute(f"PRAGMA table_info({table})"))
+            self._columns[table] = cols
+        return cols
+
+    def invalidate_schema(self):
+        """Descarta o cache de esquema (chamar após alterar tabelas)."""
+        self._columns.clear()
+
+    def close(self):
+        self._closed = True
+        with self._readers_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+        with self._write_lock:
+            self._writer.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool compartilhado do processo para o DB_FILE atual."""
+    global _pool
+    path = os.path.abspath(DB_FILE)
+    with _pool_lock:
+        if _pool is None or _pool.path != path:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(path)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentação: tempo de cada comando SQL, log de consultas lentas e latência da tela
+
+- O rastreamento é opcional: começa desligado, a não ser que a variável de
+  ambiente GESTAO_DIAGNOSTICO=1 esteja definida, e pode ser ligado/desligado
+  na janela de diagnóstico. Os erros de error() ficam em memória sempre;
+  no arquivo, só com o rastreamento ligado.
+- Todas as conexões de db.connect() usam TracedConnection. Com o rastreamento
+  ligado, cada statement tem registrados a duração (execute + fetch) e as linhas
+  lidas/afetadas. O tempo só é contado dentro das chamadas ao sqlite3, não
+  enquanto o Python processa as linhas.
+- Consultas acima de SLOW_QUERY_MS vão para um log rotativo em arquivo
+  (consultas_lentas.log), junto com os erros registrados por error().
+- timed()/instrument() medem handlers da tela (botões, refresh_*, report_*).
+  O BackgroundExecutor registra o tempo das tarefas em segundo plano.
+- A janela de diagnóstico (janela_diagnostico.py, Ctrl+Shift+D na tela
+  principal) mostra p50/p95 por operação e as últimas consultas lentas, e
+  salva um trace em JSON para enviar ao suporte.
+
+Este módulo não depende do Tk: db.py o importa, e o servidor e as
+ferramentas de linha de comando rodam sem interface gráfica.
+
+Desligado, o custo é uma verificação de flag por statement.
+"""
+
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import platform
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+SLOW_QUERY_MS = 100
+SAMPLES_PER_OP = 1000
+RECENT_STATEMENTS = 500
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUPS = 3
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "consultas_lentas.log")
+# rastreamento ligado desde a abertura da tela (GESTAO_DIAGNOSTICO=1); senão, pela janela de diagnóstico
+ENV_FLAG = "GESTAO_DIAGNOSTICO"
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[k]
+
+
+def _short_sql(sql):
+    return " ".join(sql.split())
+
+
+class Tracer:
+    """Amostras de duração por operação (thread-safe)."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, keep=SAMPLES_PER_OP):
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._recent = deque(maxlen=RECENT_STATEMENTS)
+        self._slow = deque(maxlen=RECENT_STATEMENTS)
+        self._errors = deque(maxlen=RECENT_STATEMENTS)
+        self.log = logging.getLogger("gestao.diagnostico")
+        self.log.propagate = False
+        self._handler = None
+
+    def enable(self, log_path=DEFAULT_LOG, slow_ms=None):
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        if log_path and self._handler is None:
+            self._handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True)
+            self._handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            self.log.addHandler(self._handler)
+            self.log.setLevel(logging.INFO)
+        self.enabled = True
+
+    @property
+    def log_path(self):
+        """Arquivo do log em uso (None se desligado), para os processos filhos gravarem no mesmo."""
+        return self._handler.baseFilename if self._handler is not None else None
+
+    def disable(self):
+        self.enabled = False
+        if self._handler is not None:
+            self.log.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._recent.clear()
+            self._slow.clear()
+            self._errors.clear()
+
+    # ---------------- Registro ----------------
+    def record(self, name, ms):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.keep)
+            samples.append(ms)
+
+    def record_sql(self, sql, ms, rows):
+        sql = _short_sql(sql)
+        entry = (datetime.now().strftime("%H:%M:%S"), round(ms, 3), rows, sql)
+        with self._lock:
+            self._recent.append(entry)
+            if ms >= self.slow_ms:
+                self._slow.append(entry)
+        self.record("sql: " + sql[:80], ms)
+        if ms >= self.slow_ms:
+            self.log.warning("consulta lenta %.1f ms, %s linhas: %s", ms, rows, sql)
+
+    def error(self, message, exc=None):
+        text = f"{message}: {exc}" if exc is not None else message
+        print(text)
+        with self._lock:
+            self._errors.append((datetime.now().strftime("%H:%M:%S"), text))
+        self.log.error(text)
+
+    # ---------------- Consulta ----------------
+    def stats(self):
+        """[(operação, n, p50, p95, máx)] em ms, da mais lenta (p95) para a mais rápida."""
+        with self._lock:
+            items = [(name, list(samples)) for name, samples in self._samples.items()]
+        rows = [(name, len(s), _percentile(s, 50), _percentile(s, 95), max(s)) for name, s in items if s]
+        rows.sort(key=lambda r: r[3], reverse=True)
+        return rows
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)
+
+    def recent(self):
+        with self._lock:
+            return list(self._recent)
+
+    def errors(self):
+        with self._lock:
+            return list(self._errors)
+
+    def dump(self, path):
+        """Grava um trace (estatísticas, consultas recentes e lentas, erros) em JSON."""
+        data = {
+            "gerado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "limite_lenta_ms": self.slow_ms,
+            "operacoes": [dict(zip(("nome", "n", "p50_ms", "p95_ms", "max_ms"), r)) for r in self.stats()],
+            "consultas_lentas": [dict(zip(("hora", "ms", "linhas", "sql"), r)) for r in self.slow_queries()],
+            "consultas_recentes": [dict(zip(("hora", "ms", "linhas", "sql"), r)) for r in self.recent()],
+            "erros": [dict(zip(("hora", "mensagem"), r)) for r in self.errors()],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+TRACER = Tracer()
+enable = TRACER.enable
+disable = TRACER.disable
+error = TRACER.error
+
+
+def enable_from_env():
+    """Liga o rastreamento se GESTAO_DIAGNOSTICO estiver definida (e não for "0")."""
+    if os.environ.get(ENV_FLAG, "0") not in ("", "0"):
+        enable()
+
+
+# ---------------------------------------------------------
+# Conexão/cursor rastreados (usados por db.connect)
+# ---------------------------------------------------------
+class TracedCursor(sqlite3.Cursor):
+    _pending = None
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            sql, ms, rows = pending
+            TRACER.record_sql(sql, ms, rows)
+
+    def _run(self, method, sql, args):
+        self._finish()
+        if not TRACER.enabled:
+            return method(sql, *args)
+        start = time.perf_counter()
+        cur = method(sql, *args)
+        ms = (time.perf_counter() - start) * 1000
+        if self.description is None:
+            TRACER.record_sql(sql, ms, max(self.rowcount, 0))
+        else:
+            self._pending = (sql, ms, 0)
+        return cur
+
+    def execute(self, sql, *args):
+        return self._run(super().execute, sql, args)
+
+    def executemany(self, sql, *args):
+        return self._run(super().executemany, sql, args)
+
+    def _fetch(self, method, *args):
+        if self._pending is None:
+            return method(*args)
+        start = time.perf_counter()
+        result = method(*args)
+        sql, ms, rows = self._pending
+        got = len(result) if isinstance(result, list) else (result is not None)
+        self._pending = (sql, ms + (time.perf_counter() - start) * 1000, rows + got)
+        return result
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch(super().fetchmany, *args)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._fetch(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+
+# ---------------------------------------------------------
+# Handlers da tela
+# ---------------------------------------------------------
+def timed(name, fn):
+    """Envolve `fn` registrando a duração de cada chamada como `name`."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not TRACER.enabled:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            TRACER.record(name, (time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def instrument(obj, prefixes):
+    """Troca os métodos da classe de `obj` cujo nome começa com um dos prefixos por versões medidas.
+
+    Deve ser chamada antes de criar os widgets, para que command=self.metodo
+    já pegue a versão medida.
+    """
+    for name, attr in vars(type(obj)).items():
+        if name.startswith(prefixes) and callable(attr):
+            setattr(obj, name, timed(f"tela: {name}", getattr(obj, name)))
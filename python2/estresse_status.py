@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de estresse: várias estações mudando o status das mesmas O.S.
+
+Cada processo faz o papel de uma estação com o próprio pool de conexões
+sobre o mesmo arquivo. Todos repetem leitura -> decisão -> gravação sobre
+poucas O.S. (muita disputa): leem (status, versao), escolhem o próximo
+status do ciclo a partir do que leram e gravam com ordens.update_status(...,
+versao=...). Em conflito, releem e tentam de novo.
+
+No final, verify() confere que nenhuma atualização se perdeu: o histórico
+de cada O.S. é exatamente o ciclo de status, sem passos repetidos ou
+pulados, e a versão da O.S. é igual ao número de mudanças gravadas.
+
+    python estresse_status.py --processos 4 --atualizacoes 200 --ordens 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import db
+import migrations
+import ordens
+
+DEFAULT_PROCESSES = 4
+DEFAULT_UPDATES = 200
+DEFAULT_ORDERS = 5
+BARRIER_TIMEOUT_S = 60
+
+_barrier = None
+
+
+def next_status(status):
+    return ordens.STATUS[(ordens.STATUS.index(status) + 1) % len(ordens.STATUS)]
+
+
+def prepare(path, orders=DEFAULT_ORDERS):
+    """Banco novo em `path` com `orders` O.S. abertas."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db.DB_FILE = path
+    pool = db.get_pool()
+    migrations.migrate(pool)
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('Estresse', 'Física', '0')")
+        conn.executemany("INSERT INTO orders (cliente_id, status) VALUES (1, ?)", [(ordens.STATUS[0],)] * orders)
+    db.close_pool()
+
+
+def _init_worker(path, barrier):
+    global _barrier
+    db.DB_FILE = path
+    _barrier = barrier
+
+
+def _station(n, orders, updates, seed):
+    """Uma estação: `updates` mudanças de status bem-sucedidas (ou erro de banco)."""
+    rng = random.Random(seed + n)
+    counts = {"gravadas": 0, "conflitos": 0, "erros": 0}
+    _barrier.wait(BARRIER_TIMEOUT_S)
+    start = time.perf_counter()
+    try:
+        for _ in range(updates):
+            oid = rng.randint(1, orders)
+            while True:
+                status, versao = ordens.current(oid)
+                try:
+                    ordens.update_status(oid, next_status(status), f"estação {n}", versao=versao)
+                except ordens.ConflitoVersao:
+                    counts["conflitos"] += 1
+                    continue
+                except sqlite3.OperationalError:
+                    counts["erros"] += 1
+                    break
+                counts["gravadas"] += 1
+                break
+    finally:
+        counts["segundos"] = time.perf_counter() - start
+        db.close_pool()
+    return counts
+
+
+def verify():
+    """Lista de problemas encontrados (vazia = nenhuma atualização perdida)."""
+    pool = db.get_pool()
+    problems = []
+    for oid, status, versao in pool.fetch_all("SELECT id, status, versao FROM orders ORDER BY id"):
+        eventos = [r[0] for r in pool.fetch_all("SELECT evento FROM history WHERE order_id = ? ORDER BY id", (oid,))]
+        atual = ordens.STATUS[0]
+        for i, evento in enumerate(eventos):
+            atual = next_status(atual)
+            if evento != f"Status alterado para {atual}":
+                problems.append(f"O.S. {oid}: evento {i + 1} é '{evento}', esperado '{atual}'")
+                break
+        if len(eventos) != versao:
+            problems.append(f"O.S. {oid}: versão {versao}, mas {len(eventos)} mudanças no histórico")
+        if eventos and status != atual:
+            problems.append(f"O.S. {oid}: status '{status}', mas o histórico termina em '{atual}'")
+    return problems
+
+
+def run(path, processes=DEFAULT_PROCESSES, updates=DEFAULT_UPDATES, orders=DEFAULT_ORDERS, seed=42):
+    """Prepara o banco, roda as estações e confere o resultado."""
+    prepare(path, orders)
+    ctx = multiprocessing.get_context("spawn")   # cada estação com conexões próprias, como em outro PC
+    barrier = ctx.Barrier(processes)
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                             initializer=_init_worker, initargs=(path, barrier)) as executor:
+        results = list(executor.map(_station, range(processes), [orders] * processes,
+                                    [updates] * processes, [seed] * processes))
+    db.DB_FILE = path
+    try:
+        problems = verify()
+        total_versions = db.get_pool().fetch_one("SELECT SUM(versao) FROM orders")[0]
+    finally:
+        db.close_pool()
+    totals = {k: sum(r[k] for r in results) for k in ("gravadas", "conflitos", "erros")}
+    elapsed = max(r["segundos"] for r in results)
+    if total_versions != totals["gravadas"]:
+        problems.append(f"{totals['gravadas']} gravações confirmadas, mas {total_versions} versões no banco")
+    return {**totals, "segundos": round(elapsed, 3),
+            "gravacoes_s": round(totals["gravadas"] / elapsed, 1) if elapsed else 0.0,
+            "processos": processes, "problemas": problems}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estresse de mudanças de status entre processos")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "estresse_status.db"))
+    parser.add_argument("--processos", type=int, default=DEFAULT_PROCESSES)
+    parser.add_argument("--atualizacoes", type=int, default=DEFAULT_UPDATES, help="por processo")
+    parser.add_argument("--ordens", type=int, default=DEFAULT_ORDERS, help="O.S. disputadas")
+    args = parser.parse_args(argv)
+    result = run(args.db, args.processos, args.atualizacoes, args.ordens)
+    print(f"{result['processos']} processos: {result['gravadas']} mudanças gravadas em {result['segundos']}s "
+          f"({result['gravacoes_s']}/s), {result['conflitos']} conflitos detectados, {result['erros']} erros")
+    for problem in result["problemas"]:
+        print("  " + problem)
+    if not result["problemas"]:
+        print("Nenhuma atualização perdida.")
+    return 1 if result["problemas"] or result["erros"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exclusão em massa por conjunto de ids, em uma única transação
+
+Os ids vão para uma tabela temporária e cada tabela recebe um único
+DELETE ... WHERE id IN (SELECT id FROM temp), em vez de um ou dois DELETE por
+id. As dependências saem pelas chaves estrangeiras (migração 7):
+
+    cliente  -> O.S. (CASCADE) -> histórico (CASCADE)
+    técnico  -> O.S. ficam sem técnico (SET NULL)
+
+As contagens são feitas na mesma transação, antes do DELETE, então são exatas.
+
+    python exclusao.py os --status Cancelada --ate 2024-12-31
+    python exclusao.py clientes --ids 10 11 12
+    python exclusao.py os --orfas
+"""
+
+import argparse
+
+import db
+from db import get_pool
+from export import order_filters
+
+ID_BATCH = 5000
+
+
+def _load_ids(conn, ids=None, select=None, params=()):
+    """Preenche temp.del_ids com `ids` ou com o resultado de `select`."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS del_ids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.del_ids")
+    if select is not None:
+        conn.execute(f"INSERT OR IGNORE INTO temp.del_ids (id) {select}", list(params))
+        return
+    ids = [(int(i),) for i in ids]
+    for start in range(0, len(ids), ID_BATCH):
+        conn.executemany("INSERT OR IGNORE INTO temp.del_ids (id) VALUES (?)", ids[start:start + ID_BATCH])
+
+
+def _count(conn, sql):
+    return conn.execute(sql).fetchone()[0]
+
+
+def _delete_orders_loaded(conn):
+    counts = {
+        "history": _count(conn, "SELECT COUNT(*) FROM history WHERE order_id IN (SELECT id FROM temp.del_ids)"),
+    }
+    counts["orders"] = conn.execute("DELETE FROM orders WHERE id IN (SELECT id FROM temp.del_ids)").rowcount
+    return counts
+
+
+def delete_orders(ids=None, clauses=None, params=()):
+    """Exclui O.S. (e o histórico delas) por lista de ids ou por filtros de order_filters().
+
+    Retorna {"orders": n, "history": n}.
+    """
+    with get_pool().writer() as conn:
+        if clauses is not None:
+            where = " AND ".join(clauses) or "1"
+            _load_ids(conn, select=f"SELECT id FROM orders WHERE {where}", params=params)
+        else:
+            _load_ids(conn, ids)
+        return _delete_orders_loaded(conn)
+
+
+def delete_orphan_orders():
+    """Exclui O.S. cujo cliente não existe mais (deixadas pela exclusão antiga de clientes)."""
+    with get_pool().writer() as conn:
+        _load_ids(conn, select="SELECT o.id FROM orders o LEFT JOIN clients c ON c.id = o.cliente_id "
+                               "WHERE c.id IS NULL")
+        return _delete_orders_loaded(conn)
+
+
+def delete_clients(ids):
+    """Exclui clientes com as O.S. e o histórico deles. Retorna as contagens por tabela."""
+    with get_pool().writer() as conn:
+        _load_ids(conn, ids)
+        counts = {
+            "orders": _count(conn, "SELECT COUNT(*) FROM orders WHERE cliente_id IN (SELECT id FROM temp.del_ids)"),
+            "history": _count(conn, "SELECT COUNT(*) FROM history WHERE order_id IN "
+                                    "(SELECT id FROM orders WHERE cliente_id IN (SELECT id FROM temp.del_ids))"),
+        }
+        counts["clients"] = conn.execute("DELETE FROM clients WHERE id IN (SELECT id FROM temp.del_ids)").rowcount
+        return counts
+
+
+def delete_technicians(ids):
+    """Exclui técnicos; as O.S. deles ficam sem técnico. Retorna as contagens."""
+    with get_pool().writer() as conn:
+        _load_ids(conn, ids)
+        counts = {
+            "orders_unassigned": _count(conn, "SELECT COUNT(*) FROM orders WHERE tecnico_id IN "
+                                              "(SELECT id FROM temp.del_ids)"),
+        }
+        counts["technicians"] = conn.execute(
+            "DELETE FROM technicians WHERE id IN (SELECT id FROM temp.del_ids)").rowcount
+        return counts
+
+
+def client_dependents(ids):
+    """(O.S., histórico) que seriam excluídos junto com os clientes (para a confirmação).
+
+    Usa o escritor só pela tabela temporária (os leitores são query_only); nada é gravado.
+    """
+    with get_pool().writer() as conn:
+        _load_ids(conn, ids)
+        return (_count(conn, "SELECT COUNT(*) FROM orders WHERE cliente_id IN (SELECT id FROM temp.del_ids)"),
+                _count(conn, "SELECT COUNT(*) FROM history WHERE order_id IN "
+                             "(SELECT id FROM orders WHERE cliente_id IN (SELECT id FROM temp.del_ids))"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exclusão em massa")
+    parser.add_argument("tabela", choices=["os", "clientes", "tecnicos"])
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--ids", nargs="*", type=int, help="ids a excluir")
+    parser.add_argument("--status", help="(os) somente com este status")
+    parser.add_argument("--de", help="(os) abertas a partir de YYYY-MM-DD")
+    parser.add_argument("--ate", help="(os) abertas até YYYY-MM-DD")
+    parser.add_argument("--tecnico", help="(os) somente deste técnico")
+    parser.add_argument("--orfas", action="store_true", help="(os) O.S. de clientes que não existem mais")
+    args = parser.parse_args(argv)
+
+    import migrations  # aplica a migração das chaves estrangeiras antes de excluir
+    db.DB_FILE = args.db
+    try:
+        migrations.migrate(get_pool())
+        if args.tabela == "clientes":
+            counts = delete_clients(args.ids or [])
+        elif args.tabela == "tecnicos":
+            counts = delete_technicians(args.ids or [])
+        elif args.orfas:
+            counts = delete_orphan_orders()
+        elif args.ids:
+            counts = delete_orders(args.ids)
+        else:
+            clauses, params = order_filters(args.status, args.de, args.ate, args.tecnico)
+            if not clauses:
+                parser.error("informe --ids, --orfas ou ao menos um filtro")
+            counts = delete_orders(clauses=clauses, params=params)
+    finally:
+        db.close_pool()
+    print(", ".join(f"{table}: {n}" for table, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
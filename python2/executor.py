@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Execução em segundo plano para não travar o mainloop do Tkinter
+
+Consultas pesadas, exportações e geração de PDF rodam em um pool de threads.
+O Tk não pode ser tocado fora da thread principal, então o resultado de cada
+tarefa volta por uma fila que a thread do Tk esvazia com after(); só então
+on_done/on_error são chamados. Cada tarefa recebe um CancelToken como primeiro
+argumento; interruptible() liga esse token a uma conexão SQLite para abortar
+até uma consulta que já está rodando.
+
+O módulo não importa o Tk (export.py e o servidor usam Cancelled e
+interruptible()); a barra de tarefas da tela fica em barra_tarefas.py.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import diagnostico
+from db import get_pool
+
+DEFAULT_WORKERS = 3
+POLL_MS = 50
+# a cada quantas instruções da VM do SQLite o token de cancelamento é checado
+PROGRESS_STEPS = 1000
+
+
+class Cancelled(Exception):
+    """Levantada dentro de uma tarefa quando ela foi cancelada."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._on_report = None
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def report(self, status):
+        """Publica um texto de progresso (pode ser chamado da thread de trabalho)."""
+        if self._on_report is not None:
+            self._on_report(status)
+
+
+@contextmanager
+def interruptible(conn, token, steps=PROGRESS_STEPS):
+    """Aborta consultas de `conn` assim que `token` for cancelado."""
+    conn.set_progress_handler(lambda: 1 if token.cancelled else 0, steps)
+    try:
+        yield conn
+    finally:
+        conn.set_progress_handler(None, steps)
+
+
+def query_all(token, sql, params=()):
+    """fetchall() em um leitor do pool, cancelável pelo token (para submit())."""
+    with get_pool().reader() as conn, interruptible(conn, token):
+        return conn.execute(sql, params).fetchall()
+
+
+class Task:
+    def __init__(self, future, token, label):
+        self.future = future
+        self.token = token
+        self.label = label
+        self.status = ""
+        self.started = time.perf_counter()
+
+    def cancel(self):
+        self.token.cancel()
+        self.future.cancel()
+
+    def done(self):
+        return self.future.done()
+
+
+class BackgroundExecutor:
+    """Pool de threads cujos resultados são entregues na thread do Tk."""
+
+    def __init__(self, root, workers=DEFAULT_WORKERS, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gestao-bg")
+        self._results = queue.Queue()
+        self._active = []
+        self._polling = False
+
+    def submit(self, fn, *args, label="", on_done=None, on_error=None, **kwargs):
+        """Agenda fn(token, *args, **kwargs). Deve ser chamado da thread do Tk."""
+        token = CancelToken()
+        task = Task(None, token, label)
+        token._on_report = lambda status: self._results.put(("progress", task, status))
+        task.future = self._threads.submit(fn, token, *args, **kwargs)
+        self._active.append(task)
+        task.future.add_done_callback(lambda _f: self._results.put(("done", task, (on_done, on_error))))
+        self._notify()
+        self._schedule()
+        return task
+
+    @property
+    def active(self):
+        return list(self._active)
+
+    def cancel_all(self):
+        for task in self._active:
+            task.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        self.drain()
+        if self._active:
+            self._schedule()
+
+    def drain(self):
+        """Entrega os resultados prontos (thread do Tk)."""
+        delivered = False
+        while True:
+            try:
+                kind, task, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            delivered = True
+            if kind == "progress":
+                task.status = payload
+                continue
+            on_done, on_error = payload
+            if task in self._active:
+                self._active.remove(task)
+            if diagnostico.TRACER.enabled:
+                diagnostico.TRACER.record(f"tarefa: {task.label or 'sem nome'}",
+                                          (time.perf_counter() - task.started) * 1000)
+            if task.token.cancelled or task.future.cancelled():
+                continue
+            exc = task.future.exception()
+            if isinstance(exc, Cancelled):
+                continue
+            if exc is not None:
+                if on_error:
+                    on_error(exc)
+                else:
+                    from tkinter import messagebox  # aqui: export/servidor importam este módulo sem Tk
+                    messagebox.showerror("Erro", f"{task.label or 'Tarefa'} falhou:\n{exc}")
+            elif on_done:
+                on_done(task.future.result())
+        if delivered:
+            self._notify()
+
+    def _notify(self):
+        if self.on_busy:
+            self.on_busy([f"{t.label} ({t.status})" if t.status else t.label for t in self._active])
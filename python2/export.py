@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportação de CSV em fluxo (memória constante)
+
+As linhas são lidas com fetchmany() em lotes fixos e escritas logo em seguida,
+em vez de fetchall() da tabela inteira. Roda dentro do BackgroundExecutor:
+recebe o CancelToken, publica progresso (linhas e linhas/s) e pode ser
+cancelada no meio; nesse caso o arquivo parcial é removido. Saída opcional
+em gzip (.csv.gz).
+"""
+
+import csv
+import gzip
+import os
+import sqlite3
+import time
+
+from datas import range_clauses
+from db import get_pool
+from executor import Cancelled, interruptible
+
+BATCH_SIZE = 2000
+WRITE_BUFFER = 1 << 16
+PROGRESS_INTERVAL_S = 0.5
+
+
+def order_filters(status=None, date_from=None, date_to=None, tecnico_id=None, alias=""):
+    """Filtros de O.S. como (cláusulas SQL, parâmetros).
+
+    Datas no formato YYYY-MM-DD; date_to é inclusiva. O período usa a coluna
+    epoch indexada abertura_ts. `alias` prefixa as colunas (ex.: "o.").
+    """
+    clauses, params = [], []
+    if status:
+        clauses.append(f"{alias}status = ?")
+        params.append(status)
+    clauses_range, params_range = range_clauses(f"{alias}abertura_ts", date_from or None, date_to or None)
+    clauses += clauses_range
+    params += params_range
+    if tecnico_id:
+        clauses.append(f"{alias}tecnico_id = ?")
+        params.append(int(tecnico_id))
+    return clauses, params
+
+
+def open_output(path, compress=False):
+    if compress:
+        return gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=6)
+    return open(path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER)
+
+
+def export_csv(token, path, table, clauses=(), params=(), compress=False, batch_size=BATCH_SIZE):
+    """Exporta `table` (com filtros opcionais) para `path`. Retorna o nº de linhas."""
+    pool = get_pool()
+    headers = pool.columns(table)
+    sql = f"SELECT {', '.join(headers)} FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY id"
+
+    count = 0
+    start = last_report = time.monotonic()
+    try:
+        with pool.reader() as conn, interruptible(conn, token), open_output(path, compress) as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            cur = conn.execute(sql, list(params))
+            while True:
+                token.check()
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                count += len(rows)
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL_S:
+                    token.report(f"{count} linhas, {count / (now - start):.0f}/s")
+                    last_report = now
+    except (Cancelled, sqlite3.OperationalError):
+        if not token.cancelled:
+            raise
+        if os.path.exists(path):
+            os.remove(path)
+        raise Cancelled()
+    return count
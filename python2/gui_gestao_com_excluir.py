@@ -11,110 +11,62 @@ Esta versão:
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import sqlite3
-from datetime import datetime
-import csv
+from datetime import datetime, timedelta
 import os
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+import db
+import migrations
+from db import DB_FILE, get_conn, get_pool
+from virtual_tree import KeysetPager, VirtualTree
+from change_tracker import ChangeTracker, prune_change_log
+from executor import BackgroundExecutor, query_all
+from barra_tarefas import BusyBar
+from janela_diagnostico import DiagnosticsWindow
+from export import export_csv, order_filters
+import agenda
+import anexos
+import autocompletar
+import busca
+import arquivo
+import cache_imagens
+import datas
+import diagnostico
+import exclusao
+import ordens
+import reports
+import rotas
+from reports import (OS_BY_STATUS_SQL, OS_BY_STATUS_RANGE_SQL, PERFORMANCE_BY_TECH_SQL,
+                     PERFORMANCE_BY_TECH_RANGE_SQL)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Tentativa de carregar Pillow (opcional, se não existir a logo será ignorada)
-try:
-    from PIL import Image, ImageTk
-except Exception:
-    Image = None
-    ImageTk = None
+# reportlab (pdf_os) é importado só quando usado: a janela aparece sem pagar
+# o custo dele (ver benchmark.py --importtime). A logo vem do cache de
+# imagens redimensionadas (cache_imagens.py).
 
-DB_FILE = "gestao.db"
 DATE_FMT = "%Y-%m-%d %H:%M:%S"
 
+LOGO_PATH = os.path.join(BASE_DIR, "WhatsApp Image 2025-10-16 at 10.13.19.jpeg")
+LOGO_SIZE = (120, 80)
 
-def get_conn():
-    return sqlite3.connect(DB_FILE)
+# Intervalo (ms) para buscar alterações feitas por outras estações
+CHANGE_POLL_MS = 2000
+
+# Métodos da tela medidos pelo diagnóstico (Ctrl+Shift+D abre a janela)
+TIMED_HANDLERS = ("gui_", "refresh_", "report_", "filter_", "clear_", "rebuild_", "gerar_", "show_",
+                  "on_", "sync_views")
+
+# Consultas das listagens (paginadas por id, ver virtual_tree.py)
+CLIENTS_LIST_SQL = "SELECT id, nome, documento, cidade, status FROM clients"
+TECHS_LIST_SQL = "SELECT id, nome, cpf, telefone FROM technicians"
+ORDERS_LIST_SQL = ("SELECT o.id, c.nome, o.tipo_os, o.data_abertura, o.prioridade, o.status "
+                   "FROM orders o LEFT JOIN clients c ON o.cliente_id = c.id")
 
 
 def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS clients (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL,
-        tipo_pessoa TEXT NOT NULL,
-        documento TEXT NOT NULL,
-        cep TEXT,
-        rua TEXT,
-        numero TEXT,
-        bairro TEXT,
-        cidade TEXT,
-        estado TEXT,
-        ponto_referencia TEXT,
-        email TEXT,
-        telefone_principal TEXT,
-        telefone_secundario TEXT,
-        nome_responsavel TEXT,
-        cpf_responsavel TEXT,
-        tel_responsavel TEXT,
-        tel_zelador TEXT,
-        observacoes TEXT,
-        data_cadastro TEXT,
-        status TEXT,
-        modalidade_atendimento TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS technicians (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL,
-        cpf TEXT,
-        rg TEXT,
-        telefone TEXT,
-        email TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS orders (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        cliente_id INTEGER NOT NULL,
-        tipo_os TEXT,
-        data_abertura TEXT,
-        data_agendamento TEXT,
-        horario_previsto TEXT,
-        endereco_execucao TEXT,
-        titulo TEXT,
-        descricao TEXT,
-        tecnico_id INTEGER,
-        prioridade TEXT,
-        canal_origem TEXT,
-        equipamentos TEXT,
-        status TEXT,
-        checklist TEXT,
-        tempo_estimado TEXT,
-        materiais TEXT,
-        fotos TEXT,
-        assinatura_cliente TEXT,
-        assinatura_tecnico TEXT,
-        observacoes_finais TEXT,
-        data_encerramento TEXT,
-        FOREIGN KEY(cliente_id) REFERENCES clients(id),
-        FOREIGN KEY(tecnico_id) REFERENCES technicians(id)
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        order_id INTEGER,
-        timestamp TEXT,
-        evento TEXT,
-        responsavel TEXT,
-        detalhes TEXT,
-        FOREIGN KEY(order_id) REFERENCES orders(id)
-    )
-    """)
-    conn.commit()
-    conn.close()
+    """Aplica as migrações pendentes (nada é executado se o esquema já está atual)."""
+    return migrations.migrate(get_pool())
+
 
 class App(tk.Tk):
     def __init__(self):
@@ -122,12 +74,31 @@ class App(tk.Tk):
         self.title("TDG Monitoramento Eletrônico - Sistema de Gestão")
         self.geometry("1000x650")
 
-        init_db()
+        # rastreamento opcional (GESTAO_DIAGNOSTICO=1 ou botão na janela de diagnóstico);
+        # desligado, os handlers embrulhados custam só a checagem da flag
+        diagnostico.enable_from_env()
+        diagnostico.instrument(self, TIMED_HANDLERS)
+        self.bind_all("<Control-Shift-D>", lambda _e: DiagnosticsWindow(self))
+        self.bind_all("<Control-Shift-d>", lambda _e: DiagnosticsWindow(self))
 
-        # Caminho da logo
-        self._logo_path = os.path.join(BASE_DIR, "WhatsApp Image 2025-10-16 at 10.13.19.jpeg")
+        init_db()
+        self.changes = ChangeTracker(get_pool().path)
+        # índice da agenda dos técnicos (carregado na primeira consulta)
+        self.agenda = agenda.Agenda()
+        # autocompletar de cliente/técnico no formulário de O.S. (montado no primeiro uso)
+        self.search_indexes = {"clients": autocompletar.PrefixIndex(autocompletar.CLIENTS_SQL),
+                               "technicians": autocompletar.PrefixIndex(autocompletar.TECHS_SQL)}
+
+        # Caminho da logo (carregada depois que a janela aparece)
+        self._logo_path = LOGO_PATH
         self.logo_img = None
-        self._load_logo_if_available()
+        self._logo_loaded = False
+
+        # Tarefas em segundo plano + barra de status (antes do notebook para ficar visível)
+        self.busy_bar = BusyBar(self, on_cancel=lambda: self.executor.cancel_all())
+        self.busy_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.executor = BackgroundExecutor(self, on_busy=self.busy_bar.update_tasks)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Notebook
         self.notebook = ttk.Notebook(self)
@@ -136,152 +107,110 @@ class App(tk.Tk):
         self.frame_clients = ttk.Frame(self.notebook)
         self.frame_techs = ttk.Frame(self.notebook)
         self.frame_orders = ttk.Frame(self.notebook)
+        self.frame_agenda = ttk.Frame(self.notebook)
         self.frame_reports = ttk.Frame(self.notebook)
 
         self.notebook.add(self.frame_clients, text="Clientes")
         self.notebook.add(self.frame_techs, text="Técnicos")
         self.notebook.add(self.frame_orders, text="Ordens de Serviço")
+        self.notebook.add(self.frame_agenda, text="Agenda")
         self.notebook.add(self.frame_reports, text="Relatórios")
 
-        # Monta abas
-        self.build_clients_tab()
-        self.build_techs_tab()
-        self.build_orders_tab()
-        self.build_reports_tab()
+        # Cada aba é montada (e consultada) na primeira vez que é aberta
+        self._tab_builders = {
+            str(self.frame_clients): self.build_clients_tab,
+            str(self.frame_techs): self.build_techs_tab,
+            str(self.frame_orders): self.build_orders_tab,
+            str(self.frame_agenda): self.build_agenda_tab,
+            str(self.frame_reports): self.build_reports_tab,
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.on_tab_changed()
+
+        self.after(CHANGE_POLL_MS, self._poll_changes)
+
+        # manutenção em segundo plano: log de alterações antigo e datas fora do padrão (datas.py)
+        self.executor.submit(lambda token: prune_change_log(get_pool()), label="Limpando log de alterações")
+        self.executor.submit(datas.backfill, label="Normalizando datas")
+        self.executor.submit(anexos.make_thumbnails, label="Gerando miniaturas")
+
+    def on_tab_changed(self, _event=None):
+        builder = self._tab_builders.pop(self.notebook.select(), None)
+        if builder is not None:
+            builder()
+
+    # ---------------------------------------------------------
+    # Atualização incremental das listagens
+    # ---------------------------------------------------------
+    def _built_views(self):
+        """Listagens das abas já montadas (as outras leem tudo quando forem abertas)."""
+        names = {"clients": "clients_view", "technicians": "techs_view", "orders": "orders_view"}
+        return {table: getattr(self, attr) for table, attr in names.items() if hasattr(self, attr)}
+
+    def sync_views(self):
+        """Aplica nas listagens apenas os registros que mudaram no banco."""
+        changes = self.changes.poll()
+        views = self._built_views()
+        if changes is None:
+            for view in views.values():
+                view.reload()
+            self.agenda.reload()
+            for index in self.search_indexes.values():
+                index.reset()
+        else:
+            for table, (upserts, deletes) in changes.items():
+                if table in views:
+                    views[table].apply_changes(upserts, deletes)
+                if table in self.search_indexes:
+                    self.search_indexes[table].apply_changes(upserts, deletes)
+            if "orders" in changes:
+                self.agenda.apply_changes(*changes["orders"])
+        if hasattr(self, "tree_agenda") and (changes is None or {"orders", "technicians"} & set(changes)):
+            self.refresh_agenda(quiet=True)
+
+    def _poll_changes(self):
+        self.sync_views()
+        self.after(CHANGE_POLL_MS, self._poll_changes)
+
+    def on_close(self):
+        self.executor.shutdown()
+        self.destroy()
 
         # ---------------------------------------------------------
     # Função que gera o PDF da Ordem de Serviço
     # ---------------------------------------------------------
     def gerar_pdf_os(self, oid):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM orders WHERE id = ?", (oid,))
-        order = cur.fetchone()
-
-        if not order:
-            messagebox.showerror("Erro", "Ordem de Serviço não encontrada.")
-            return
-
-        # Nome do arquivo
-        path = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF files", "*.pdf")],
-            title="Salvar O.S. como..."
-        )
-        if not path:
-            return
-
-        # PÁGINA
-        c = canvas.Canvas(path, pagesize=A4)
-        width, height = A4
-
-        # MARGENS
-        left = 40
-        right = width - 40
-        y = height - 50
-
-        # ----------------------------------------------------
-        #  INSERIR LOGO NO TOPO DIREITO
-        # ----------------------------------------------------
-        try:
-            if os.path.exists(self._logo_path):
-                c.drawImage(
-                    self._logo_path,
-                    width - 150,     # posição X
-                    height - 150,    # posição Y
-                    width=110,       # largura
-                    height=90,       # altura
-                    preserveAspectRatio=True,
-                    mask='auto'
-                )
-        except Exception as e:
-            print("Erro ao carregar a logo no PDF:", e)
-
-        # --------------------------
-        #  CABEÇALHO BONITO
-        # --------------------------
-        c.setFont("Helvetica-Bold", 20)
-        c.drawString(left, y, "ORDEM DE SERVIÇO")
-        y -= 10
-
-        c.line(left, y, right, y)
-        y -= 30
-
-        cur.execute("PRAGMA table_info(orders)")
-        cols = [col[1] for col in cur.fetchall()]
-
-        c.setFont("Helvetica", 12)
-
-        # --------------------------
-        #  FUNÇÃO PARA QUEBRA DE PÁGINA
-        # --------------------------
-        def check_page():
-            nonlocal y
-            if y < 50:
-                c.showPage()
-                c.setFont("Helvetica", 12)
-                y = height - 50
-
-        # --------------------------
-        #  IMPRESSÃO DOS CAMPOS
-        # --------------------------
-        grupos = [
-            ("INFORMAÇÕES GERAIS", [
-                "id", "cliente_id", "tecnico_id", "status", "prioridade", "canal_origem"
-            ]),
-            ("DATAS", [
-                "data_abertura", "data_agendamento", "horario_previsto", "data_encerramento"
-            ]),
-            ("DETALHES", [
-                "tipo_os", "titulo", "descricao", "equipamentos", "checklist",
-                "endereco_execucao", "tempo_estimado", "materiais",
-                "observacoes_finais"
-            ]),
-            ("ASSINATURAS", [
-                "assinatura_cliente", "assinatura_tecnico"
-            ])
-        ]
-
-        for titulo, campos in grupos:
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(left, y, titulo)
-            y -= 20
-            c.setFont("Helvetica", 12)
-
-            for col in campos:
-                idx = cols.index(col)
-                valor = str(order[idx]) if order[idx] else ""
-
-                check_page()
-
-                c.setFont("Helvetica-Bold", 11)
-                c.drawString(left, y, f"{col.replace('_',' ').title()}:")
-                c.setFont("Helvetica", 11)
-
-                max_width = 500
-                palavras = valor.split()
-                linha = ""
-
-                for palavra in palavras:
-                    if c.stringWidth(linha + palavra + " ", "Helvetica", 11) < max_width:
-                        linha += palavra + " "
-                    else:
-                        c.drawString(left + 120, y, linha)
-                        y -= 15
-                        linha = palavra + " "
-                        check_page()
+        def load(token):
+            pool = get_pool()
+            order = pool.fetch_one("SELECT * FROM orders WHERE id = ?", (oid,))
+            photos = anexos.thumbnails_for([order[0]]).get(order[0]) if order else None
+            return order, pool.columns("orders"), photos
+
+        def ask_path(result):
+            order, cols, photos = result
+            if not order:
+                messagebox.showerror("Erro", "Ordem de Serviço não encontrada.")
+                return
 
-                c.drawString(left + 120, y, linha)
-                y -= 18
+            # Nome do arquivo
+            path = filedialog.asksaveasfilename(
+                defaultextension=".pdf",
+                filetypes=[("PDF files", "*.pdf")],
+                title="Salvar O.S. como..."
+            )
+            if not path:
+                return
 
-            y -= 10
-            c.line(left, y, right, y)
-            y -= 25
+            def render(token):
+                from pdf_os import render_os_pdf
+                return render_os_pdf(path, order, cols, self._logo_path, photos)
 
-        c.save()
-        conn.close()
+            self.executor.submit(
+                render,
+                label=f"PDF da O.S. {oid}",
+                on_done=lambda _r: messagebox.showinfo("PDF Gerado", f"PDF salvo em:\n{path}"))
 
-        messagebox.showinfo("PDF Gerado", f"PDF salvo em:\n{path}")
+        self.executor.submit(load, label=f"PDF da O.S. {oid}", on_done=ask_path)
 
     # ---------------------------------------------------------
     # Popup para digitar número da OS
@@ -306,6 +235,70 @@ class App(tk.Tk):
 
         ttk.Button(win, text="Gerar PDF", command=gerar).pack(pady=10)
 
+    # ---------------------------------------------------------
+    # PDFs em lote (seleção da lista ou O.S. agendadas em um dia)
+    # ---------------------------------------------------------
+    def gui_pdf_lote_prompt(self):
+        selected = [int(iid) for iid in self.tree_orders.selection()]
+
+        def gerar():
+            if modo.get() == 'selecao':
+                if not selected:
+                    messagebox.showwarning("Atenção", "Selecione as O.S. na lista.")
+                    return
+                criterio = {'ids': selected}
+            else:
+                dia = entry_dia.get().strip()
+                try:
+                    datetime.strptime(dia, "%Y-%m-%d")
+                except ValueError:
+                    messagebox.showwarning("Atenção", "Informe a data no formato YYYY-MM-DD.")
+                    return
+                criterio = {'scheduled_on': dia}
+            # variáveis do Tk lidas aqui, na thread do Tk: job() roda no executor
+            por_rota = rota.get() and modo.get() == 'dia'
+            merged = unico.get()
+            if merged:
+                out = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")],
+                                                   title="Salvar PDF único como...")
+            else:
+                out = filedialog.askdirectory(title="Pasta para os PDFs")
+            if not out:
+                return
+            win.destroy()
+
+            def job(token):
+                from pdf_os import fetch_orders, render_batch
+                orders, cols = fetch_orders(**criterio)
+                routes = None
+                if por_rota:
+                    routes = rotas.plan_day(criterio['scheduled_on'])
+                    orders = rotas.sort_by_route(orders, routes)
+                photos = anexos.thumbnails_for([o[0] for o in orders])
+                return render_batch(token, orders, cols, out, self._logo_path, merged=merged, photos=photos,
+                                    routes=routes)
+
+            self.executor.submit(
+                job, label="PDFs em lote",
+                on_done=lambda n: messagebox.showinfo("PDFs Gerados", f"{n} O.S. geradas em:\n{out}"))
+
+        win = tk.Toplevel(self)
+        win.title("Gerar PDFs em lote")
+        modo = tk.StringVar(value='selecao' if selected else 'dia')
+        ttk.Radiobutton(win, text=f"O.S. selecionadas na lista ({len(selected)})", variable=modo,
+                        value='selecao').pack(anchor=tk.W, padx=8, pady=4)
+        ttk.Radiobutton(win, text="O.S. agendadas no dia (YYYY-MM-DD)", variable=modo,
+                        value='dia').pack(anchor=tk.W, padx=8)
+        entry_dia = ttk.Entry(win)
+        entry_dia.insert(0, (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"))
+        entry_dia.pack(fill=tk.X, padx=8)
+        unico = tk.BooleanVar(value=False)
+        ttk.Checkbutton(win, text="Um único PDF com todas", variable=unico).pack(anchor=tk.W, padx=8, pady=4)
+        rota = tk.BooleanVar(value=False)
+        ttk.Checkbutton(win, text="Dia: ordenar por rota do técnico e imprimir a folha de rota",
+                        variable=rota).pack(anchor=tk.W, padx=8)
+        ttk.Button(win, text="Gerar", command=gerar).pack(pady=8)
+
     # ---------------------------------------------------------
     # ORDENS DE SERVIÇO — AGORA CORRETAMENTE DENTRO DA CLASSE
     # ---------------------------------------------------------
@@ -320,13 +313,14 @@ class App(tk.Tk):
 
         self.order_fields = {}
         labels = [
-            ("Cliente ID", "cliente_id"),
+            ("Cliente (nome, documento, telefone ou ID)", "cliente_id"),
             ("Tipo O.S.", "tipo_os"),
             ("Data Agendamento (YYYY-MM-DD HH:MM)", "data_agendamento"),
             ("Horário previsto", "horario_previsto"),
+            ("Tempo estimado (ex.: 2h, 90min)", "tempo_estimado"),
             ("Título/Relato", "titulo"),
             ("Descrição", "descricao"),
-            ("Técnico ID", "tecnico_id"),
+            ("Técnico (nome, CPF, telefone ou ID)", "tecnico_id"),
             ("Prioridade", "prioridade"),
             ("Canal de Origem", "canal_origem"),
             ("Equipamentos (seriais)", "equipamentos"),
@@ -338,6 +332,10 @@ class App(tk.Tk):
             if key == 'descricao':
                 e = tk.Text(left, height=4)
                 e.grid(row=i, column=1, sticky=tk.EW, padx=4, pady=2)
+            elif key in ('cliente_id', 'tecnico_id'):
+                table = 'clients' if key == 'cliente_id' else 'technicians'
+                e = autocompletar.AutoCombo(left, self.search_indexes[table], self.executor)
+                e.grid(row=i, column=1, sticky=tk.EW, padx=4, pady=2)
             else:
                 e = ttk.Entry(left)
                 e.grid(row=i, column=1, sticky=tk.EW, padx=4, pady=2)
@@ -346,29 +344,53 @@ class App(tk.Tk):
         left.columnconfigure(1, weight=1)
 
         ttk.Button(right, text="Abrir O.S.", command=self.gui_abrir_os).pack(fill=tk.X, pady=4)
+        ttk.Button(right, text="Sugerir técnico livre", command=self.gui_sugerir_tecnico).pack(fill=tk.X, pady=4)
         ttk.Button(right, text="Atualizar status O.S.", command=self.gui_atualizar_status_prompt).pack(fill=tk.X, pady=4)
         ttk.Button(right, text="Exportar O.S. (CSV)", command=self.gui_export_orders).pack(fill=tk.X, pady=4)
         ttk.Button(right, text="Excluir O.S. selecionada(s)", command=self.gui_excluir_os).pack(fill=tk.X, pady=4)
 
         # Botão novo
         ttk.Button(right, text="Gerar PDF da O.S.", command=self.gui_pdf_prompt).pack(fill=tk.X, pady=4)
+        ttk.Button(right, text="Gerar PDFs em lote", command=self.gui_pdf_lote_prompt).pack(fill=tk.X, pady=4)
+        ttk.Button(right, text="Anexar fotos/assinaturas", command=self.gui_anexar_prompt).pack(fill=tk.X, pady=4)
+
+        filtro = ttk.Frame(self.frame_orders, padding=(8, 0))
+        filtro.pack(fill=tk.X)
+        ttk.Label(filtro, text="Abertas de (YYYY-MM-DD)").pack(side=tk.LEFT)
+        self.orders_from = ttk.Entry(filtro, width=12)
+        self.orders_from.pack(side=tk.LEFT, padx=4)
+        ttk.Label(filtro, text="até").pack(side=tk.LEFT)
+        self.orders_to = ttk.Entry(filtro, width=12)
+        self.orders_to.pack(side=tk.LEFT, padx=4)
+        ttk.Button(filtro, text="Filtrar", command=self.filter_orders).pack(side=tk.LEFT, padx=2)
+        ttk.Button(filtro, text="Esta semana", command=self.filter_orders_this_week).pack(side=tk.LEFT, padx=2)
+        ttk.Button(filtro, text="Limpar", command=self.clear_orders_filter).pack(side=tk.LEFT, padx=2)
+        ttk.Label(filtro, text="Buscar (título, descrição, equipamentos...)").pack(side=tk.LEFT, padx=(16, 0))
+        self.orders_search = ttk.Entry(filtro, width=30)
+        self.orders_search.pack(side=tk.LEFT, padx=4)
+        self.orders_search.bind("<Return>", lambda _e: self.filter_orders())
+        ttk.Button(filtro, text="Buscar", command=self.filter_orders).pack(side=tk.LEFT, padx=2)
 
         bottom = ttk.Frame(self.frame_orders, padding=8)
         bottom.pack(fill=tk.BOTH, expand=True)
 
         cols = ("id", "cliente", "tipo", "data_abertura", "prioridade", "status")
-        self.tree_orders = ttk.Treeview(bottom, columns=cols, show="headings", selectmode='extended')
+        # "trecho" só aparece com uma busca ativa (_show_search)
+        self.tree_orders = ttk.Treeview(bottom, columns=cols + ("trecho",), displaycolumns=cols, show="headings",
+                                        selectmode='extended')
 
         for c in cols:
             self.tree_orders.heading(c, text=c.title())
             self.tree_orders.column(c, width=140)
+        self.tree_orders.heading("trecho", text="Trecho encontrado")
+        self.tree_orders.column("trecho", width=360)
 
         self.tree_orders.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
         self.tree_orders.bind('<Double-1>', self.on_order_double)
 
         scrollbar = ttk.Scrollbar(bottom, orient=tk.VERTICAL, command=self.tree_orders.yview)
-        self.tree_orders.configure(yscroll=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.orders_view = VirtualTree(self.tree_orders, scrollbar, KeysetPager(ORDERS_LIST_SQL, key="o.id"))
 
         self.refresh_orders()
 
@@ -383,23 +405,29 @@ class App(tk.Tk):
 
     # ---------------- Logo helpers ----------------
     def _load_logo_if_available(self):
-        """Tenta carregar logo caso Pillow esteja instalado e arquivo exista."""
-        if Image is None or ImageTk is None:
-            print("Pillow não instalado — logomarca será ignorada. (pip install pillow)")
-            return
+        """Carrega a logo do cache de imagens (gera a variante na primeira vez)."""
+        self._logo_loaded = True
         if not os.path.exists(self._logo_path):
-            print(f"Logomarca não encontrada ({self._logo_path}) — ignorando.")
+            diagnostico.error(f"Logomarca não encontrada ({self._logo_path}) — ignorando.")
             return
         try:
-            img = Image.open(self._logo_path)
-            img = img.resize((120, 80), Image.LANCZOS)
-            self.logo_img = ImageTk.PhotoImage(img)
+            self.logo_img = cache_imagens.photo(self._logo_path, LOGO_SIZE, master=self)
         except Exception as e:
-            print("Erro ao carregar logomarca:", e)
+            diagnostico.error("Erro ao carregar logomarca", e)
             self.logo_img = None
+        if self.logo_img is None:
+            diagnostico.error("Logomarca não carregada (Pillow instalado? pip install pillow)")
 
     def add_logo_to_frame(self, frame, x_offset=-10, y_offset=-10):
-        """Coloca a logo no canto inferior direito do frame fornecido (se disponível)."""
+        """Coloca a logo no canto inferior direito do frame fornecido (se disponível).
+
+        Fica para depois de a janela ser desenhada (after_idle).
+        """
+        self.after_idle(self._place_logo, frame, x_offset, y_offset)
+
+    def _place_logo(self, frame, x_offset, y_offset):
+        if not self._logo_loaded:
+            self._load_logo_if_available()
         if not self.logo_img:
             return
         logo_label = tk.Label(frame, image=self.logo_img, bd=0)
@@ -459,20 +487,33 @@ class App(tk.Tk):
         ttk.Button(side, text="Exportar clientes (CSV)", command=self.gui_export_clients).pack(fill=tk.X, pady=4)
         ttk.Button(side, text="Excluir Cliente(s) selecionado(s)", command=self.gui_excluir_cliente).pack(fill=tk.X, pady=4)
 
+        busca_frame = ttk.Frame(self.frame_clients, padding=(8, 0))
+        busca_frame.pack(fill=tk.X)
+        ttk.Label(busca_frame, text="Buscar (nome, documento, rua, bairro)").pack(side=tk.LEFT)
+        self.clients_search = ttk.Entry(busca_frame, width=40)
+        self.clients_search.pack(side=tk.LEFT, padx=4)
+        self.clients_search.bind("<Return>", lambda _e: self.search_clients())
+        ttk.Button(busca_frame, text="Buscar", command=self.search_clients).pack(side=tk.LEFT, padx=2)
+        ttk.Button(busca_frame, text="Limpar", command=self.clear_clients_search).pack(side=tk.LEFT, padx=2)
+
         # Treeview
         bottom = ttk.Frame(self.frame_clients, padding=8)
         bottom.pack(fill=tk.BOTH, expand=True)
         cols = ("id", "nome", "documento", "cidade", "status")
-        self.tree_clients = ttk.Treeview(bottom, columns=cols, show="headings", selectmode='extended')
+        # "trecho" só aparece com uma busca ativa (_show_search)
+        self.tree_clients = ttk.Treeview(bottom, columns=cols + ("trecho",), displaycolumns=cols, show="headings",
+                                         selectmode='extended')
         for c in cols:
             self.tree_clients.heading(c, text=c.title())
             self.tree_clients.column(c, width=120)
+        self.tree_clients.heading("trecho", text="Trecho encontrado")
+        self.tree_clients.column("trecho", width=300)
         self.tree_clients.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
         self.tree_clients.bind('<Double-1>', self.on_client_double)
 
         scrollbar = ttk.Scrollbar(bottom, orient=tk.VERTICAL, command=self.tree_clients.yview)
-        self.tree_clients.configure(yscroll=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.clients_view = VirtualTree(self.tree_clients, scrollbar, KeysetPager(CLIENTS_LIST_SQL))
 
         self.refresh_clients()
 
@@ -485,10 +526,8 @@ class App(tk.Tk):
         if not data['nome'] or not data['tipo_pessoa'] or not data['documento']:
             messagebox.showwarning("Atenção", "Preencha Nome, Tipo e Documento (obrigatórios).")
             return
-        conn = get_conn()
-        cur = conn.cursor()
         data_cad = datetime.now().strftime(DATE_FMT)
-        cur.execute(
+        get_pool().execute(
             """INSERT INTO clients (
                 nome, tipo_pessoa, documento, cep, rua, numero, bairro, cidade, estado,
                 ponto_referencia, email, telefone_principal, telefone_secundario,
@@ -503,10 +542,8 @@ class App(tk.Tk):
                 data_cad, data['status'], data['modalidade_atendimento']
             )
         )
-        conn.commit()
-        conn.close()
         messagebox.showinfo("Sucesso", "Cliente cadastrado com sucesso.")
-        self.refresh_clients()
+        self.sync_views()
         self.gui_limpar_form_cliente()
 
     def gui_limpar_form_cliente(self):
@@ -515,14 +552,18 @@ class App(tk.Tk):
         self.client_status.current(0)
 
     def refresh_clients(self):
-        for r in self.tree_clients.get_children():
-            self.tree_clients.delete(r)
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, nome, documento, cidade, status FROM clients ORDER BY id DESC LIMIT 200")
-        for row in cur.fetchall():
-            self.tree_clients.insert('', tk.END, values=row)
-        conn.close()
+        self.clients_view.reload()
+
+    def search_clients(self):
+        texto = self.clients_search.get().strip()
+        if busca.match_query(texto):
+            self._show_search(self.clients_view, "clients", texto, [], column="id")
+        else:
+            self.clear_clients_search()
+
+    def clear_clients_search(self):
+        self.clients_search.delete(0, tk.END)
+        self._hide_search(self.clients_view, [])
 
     def on_client_double(self, event):
         sel = self.tree_clients.selection()
@@ -533,16 +574,13 @@ class App(tk.Tk):
         self.show_client_detail(cid)
 
     def show_client_detail(self, cid):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM clients WHERE id = ?", (cid,))
-        row = cur.fetchone()
-        conn.close()
+        pool = get_pool()
+        row = pool.fetch_one("SELECT * FROM clients WHERE id = ?", (cid,))
         if not row:
             messagebox.showerror("Erro", "Cliente não encontrado.")
             return
-        cols = [d[0] for d in get_conn().cursor().execute("PRAGMA table_info(clients)").fetchall()]
-        text = "\n".join([f"{cols[i]}: {row[i]}" for i in range(len(row))])
+        cols = pool.columns("clients")
+        text = "\n".join([f"{c}: {v}" for c, v in zip(cols, row)])
         detail_win = tk.Toplevel(self)
         detail_win.title(f"Cliente {cid}")
         txt = tk.Text(detail_win, wrap=tk.WORD)
@@ -554,17 +592,9 @@ class App(tk.Tk):
         path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV files','*.csv')], title='Salvar clientes como')
         if not path:
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM clients")
-        rows = cur.fetchall()
-        headers = [d[0] for d in cur.execute("PRAGMA table_info(clients)").fetchall()]
-        conn.close()
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
-            writer.writerows(rows)
-        messagebox.showinfo("Exportado", f"{len(rows)} clientes exportados para:\n{path}")
+        self.executor.submit(
+            export_csv, path, "clients", label="Exportação de clientes",
+            on_done=lambda n: messagebox.showinfo("Exportado", f"{n} clientes exportados para:\n{path}"))
 
     def gui_excluir_cliente(self):
         sels = self.tree_clients.selection()
@@ -572,23 +602,21 @@ class App(tk.Tk):
             messagebox.showwarning("Atenção", "Selecione um cliente para excluir.")
             return
         ids = [self.tree_clients.item(s)['values'][0] for s in sels]
-        if not messagebox.askyesno("Confirmar exclusão", f"Tem certeza que deseja excluir {len(ids)} cliente(s)?"):
+        n_os, n_hist = exclusao.client_dependents(ids)
+        aviso = f"Tem certeza que deseja excluir {len(ids)} cliente(s)?"
+        if n_os:
+            aviso += f" Isso removerá também {n_os} O.S. e {n_hist} registro(s) de histórico."
+        if not messagebox.askyesno("Confirmar exclusão", aviso):
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        for cid in ids:
-            try:
-                # excluir cliente
-                cur.execute("DELETE FROM clients WHERE id = ?", (cid,))
-                # se quiser excluir ordens vinculadas automaticamente, descomente:
-                # cur.execute("DELETE FROM orders WHERE cliente_id = ?", (cid,))
-                # cur.execute("DELETE FROM history WHERE order_id IN (SELECT id FROM orders WHERE cliente_id = ?)", (cid,))
-            except Exception as e:
-                print("Erro ao excluir cliente:", e)
-        conn.commit()
-        conn.close()
-        self.refresh_clients()
-        messagebox.showinfo("Excluído", f"{len(ids)} cliente(s) excluído(s).")
+        try:
+            counts = exclusao.delete_clients(ids)
+        except sqlite3.Error as e:
+            diagnostico.error("Erro ao excluir cliente", e)
+            messagebox.showerror("Erro", f"Erro ao excluir cliente(s):\n{e}")
+            return
+        self.sync_views()
+        messagebox.showinfo("Excluído", f"{counts['clients']} cliente(s), {counts['orders']} O.S. e "
+                                        f"{counts['history']} registro(s) de histórico excluído(s).")
 
     # ------------------ Técnicos ------------------
     def build_techs_tab(self):
@@ -617,8 +645,8 @@ class App(tk.Tk):
             self.tree_techs.column(c, width=150)
         self.tree_techs.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
         scrollbar = ttk.Scrollbar(bottom, orient=tk.VERTICAL, command=self.tree_techs.yview)
-        self.tree_techs.configure(yscroll=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.techs_view = VirtualTree(self.tree_techs, scrollbar, KeysetPager(TECHS_LIST_SQL))
         self.refresh_techs()
 
         # logo
@@ -629,29 +657,18 @@ class App(tk.Tk):
         if not data['nome']:
             messagebox.showwarning("Atenção", "Nome é obrigatório.")
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO technicians (nome, cpf, rg, telefone, email) VALUES (?,?,?,?,?)",
-                    (data['nome'], data['cpf'], data['rg'], data['telefone'], data['email']))
-        conn.commit()
-        conn.close()
+        get_pool().execute("INSERT INTO technicians (nome, cpf, rg, telefone, email) VALUES (?,?,?,?,?)",
+                           (data['nome'], data['cpf'], data['rg'], data['telefone'], data['email']))
         messagebox.showinfo("Sucesso", "Técnico cadastrado.")
         self.gui_limpar_form_tech()
-        self.refresh_techs()
+        self.sync_views()
 
     def gui_limpar_form_tech(self):
         for e in self.tech_fields.values():
             e.delete(0, tk.END)
 
     def refresh_techs(self):
-        for r in self.tree_techs.get_children():
-            self.tree_techs.delete(r)
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, nome, cpf, telefone FROM technicians ORDER BY id DESC")
-        for row in cur.fetchall():
-            self.tree_techs.insert('', tk.END, values=row)
-        conn.close()
+        self.techs_view.reload()
 
     def gui_excluir_tecnico(self):
         sels = self.tree_techs.selection()
@@ -661,38 +678,59 @@ class App(tk.Tk):
         ids = [self.tree_techs.item(s)['values'][0] for s in sels]
         if not messagebox.askyesno("Confirmar exclusão", f"Tem certeza que deseja excluir {len(ids)} técnico(s)?"):
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        for tid in ids:
-            try:
-                cur.execute("DELETE FROM technicians WHERE id = ?", (tid,))
-                # se preferir desvincular ordens ao invés de excluir:
-                # cur.execute("UPDATE orders SET tecnico_id = NULL WHERE tecnico_id = ?", (tid,))
-            except Exception as e:
-                print("Erro ao excluir técnico:", e)
-        conn.commit()
-        conn.close()
-        self.refresh_techs()
-        messagebox.showinfo("Excluído", f"{len(ids)} técnico(s) excluído(s).")
+        try:
+            counts = exclusao.delete_technicians(ids)
+        except sqlite3.Error as e:
+            diagnostico.error("Erro ao excluir técnico", e)
+            messagebox.showerror("Erro", f"Erro ao excluir técnico(s):\n{e}")
+            return
+        self.sync_views()
+        messagebox.showinfo("Excluído", f"{counts['technicians']} técnico(s) excluído(s); "
+                                        f"{counts['orders_unassigned']} O.S. ficaram sem técnico.")
+
+
 
 
+    def _order_field(self, key):
+        w = self.order_fields[key]
+        if isinstance(w, tk.Text):
+            return w.get('1.0', tk.END).strip()
+        if isinstance(w, autocompletar.AutoCombo):
+            oid = w.selected_id()
+            return str(oid) if oid is not None else ''
+        return w.get().strip()
 
+    def _form_slot(self):
+        """(início, fim) do agendamento digitado no formulário, ou None."""
+        return agenda.slot_from_text(self._order_field('data_agendamento'), self._order_field('horario_previsto'),
+                                     self._order_field('tempo_estimado'))
+
+    def gui_sugerir_tecnico(self):
+        slot = self._form_slot()
+        if slot is None:
+            messagebox.showwarning("Atenção", "Informe a data de agendamento (YYYY-MM-DD HH:MM).")
+            return
+        tecnico_id = self.agenda.suggest(*slot)
+        if tecnico_id is None:
+            messagebox.showinfo("Agenda", "Nenhum técnico livre nesse horário.")
+            return
+        self.order_fields['tecnico_id'].set_id(tecnico_id)
+        nome = get_pool().fetch_one("SELECT nome FROM technicians WHERE id = ?", (tecnico_id,))
+        messagebox.showinfo("Agenda", f"Técnico sugerido: {tecnico_id} - {nome[0] if nome else ''}\n"
+                                      f"{agenda.fmt_hour(slot[0])} às {agenda.fmt_hour(slot[1])}, "
+                                      f"menos horas agendadas no dia.")
 
     def gui_abrir_os(self):
-        def get_val(key):
-            w = self.order_fields[key]
-            if isinstance(w, tk.Text):
-                return w.get('1.0', tk.END).strip()
-            return w.get().strip()
+        get_val = self._order_field
 
         cliente_id = get_val('cliente_id')
         tipo_os = get_val('tipo_os')
         titulo = get_val('titulo')
         descricao = get_val('descricao')
         if not cliente_id or not tipo_os or not titulo:
-            messagebox.showwarning("Atenção", "Preencha Cliente ID, Tipo O.S. e Título (obrigatório).")
+            messagebox.showwarning("Atenção", "Escolha o Cliente na lista e preencha Tipo O.S. e Título (obrigatório).")
             return
-        data_ag = get_val('data_agendamento')
+        data_ag = datas.normalize(get_val('data_agendamento'))
         horario_prev = get_val('horario_previsto')
         endereco_exec = self.get_endereco_cliente(cliente_id)
         tecnico_id = get_val('tecnico_id')
@@ -700,25 +738,41 @@ class App(tk.Tk):
         canal = get_val('canal_origem') or 'Telefone'
         equipamentos = get_val('equipamentos')
         checklist = get_val('checklist')
+        tempo_estimado = get_val('tempo_estimado')
+
+        slot = self._form_slot()
+        if tecnico_id and slot is not None and tecnico_id.isdigit():
+            conflitos = self.agenda.conflicts(int(tecnico_id), *slot)
+            if conflitos and not messagebox.askyesno(
+                    "Conflito de agenda",
+                    f"O técnico {tecnico_id} já tem a(s) O.S. {', '.join(map(str, conflitos))} "
+                    f"entre {agenda.fmt_hour(slot[0])} e {agenda.fmt_hour(slot[1])}.\n"
+                    f"Abrir a O.S. mesmo assim?"):
+                return
 
-        conn = get_conn()
-        cur = conn.cursor()
         data_ab = datetime.now().strftime(DATE_FMT)
-        cur.execute(
-            """INSERT INTO orders (
-                cliente_id, tipo_os, data_abertura, data_agendamento, horario_previsto, endereco_execucao,
-                titulo, descricao, tecnico_id, prioridade, canal_origem, equipamentos, status, checklist
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-            (cliente_id, tipo_os, data_ab, data_ag, horario_prev, endereco_exec, titulo, descricao,
-             tecnico_id if tecnico_id else None, prioridade, canal, equipamentos, 'Aberta', checklist)
-        )
-        os_id = cur.lastrowid
-        cur.execute("INSERT INTO history (order_id, timestamp, evento, responsavel, detalhes) VALUES (?,?,?,?,?)",
-                    (os_id, datetime.now().strftime(DATE_FMT), 'Abertura', 'Sistema', f'O.S. aberta: {titulo}'))
-        conn.commit()
-        conn.close()
+        try:
+            with get_pool().writer() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    """INSERT INTO orders (
+                        cliente_id, tipo_os, data_abertura, data_agendamento, horario_previsto, endereco_execucao,
+                        titulo, descricao, tecnico_id, prioridade, canal_origem, equipamentos, status, checklist,
+                        tempo_estimado
+                    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                    (cliente_id, tipo_os, data_ab, data_ag, horario_prev, endereco_exec, titulo, descricao,
+                     tecnico_id if tecnico_id else None, prioridade, canal, equipamentos, 'Aberta', checklist,
+                     tempo_estimado)
+                )
+                os_id = cur.lastrowid
+                cur.execute("INSERT INTO history (order_id, timestamp, evento, responsavel, detalhes) VALUES (?,?,?,?,?)",
+                            (os_id, datetime.now().strftime(DATE_FMT), 'Abertura', 'Sistema', f'O.S. aberta: {titulo}'))
+        except sqlite3.IntegrityError:
+            # chaves estrangeiras ligadas (db.py): cliente/técnico precisam existir
+            messagebox.showerror("Erro", "Cliente ou técnico informado não existe.")
+            return
         messagebox.showinfo("Sucesso", f"O.S. criada com número: {os_id}")
-        self.refresh_orders()
+        self.sync_views()
         for w in self.order_fields.values():
             if isinstance(w, tk.Text):
                 w.delete('1.0', tk.END)
@@ -730,24 +784,63 @@ class App(tk.Tk):
             cid = int(cliente_id)
         except Exception:
             return ''
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT rua, numero, bairro, cidade, estado FROM clients WHERE id = ?", (cid,))
-        r = cur.fetchone()
-        conn.close()
+        r = get_pool().fetch_one("SELECT rua, numero, bairro, cidade, estado FROM clients WHERE id = ?", (cid,))
         if r:
             return ", ".join([p for p in r if p])
         return ''
 
     def refresh_orders(self):
-        for r in self.tree_orders.get_children():
-            self.tree_orders.delete(r)
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT o.id, c.nome, o.tipo_os, o.data_abertura, o.prioridade, o.status FROM orders o LEFT JOIN clients c ON o.cliente_id = c.id ORDER BY o.id DESC LIMIT 300")
-        for row in cur.fetchall():
-            self.tree_orders.insert('', tk.END, values=row)
-        conn.close()
+        self.orders_view.reload()
+
+    def filter_orders(self):
+        """Filtra a listagem pelo período de abertura (faixa no índice de abertura_ts) e pela busca textual."""
+        try:
+            clauses, params = order_filters(date_from=self.orders_from.get().strip(),
+                                            date_to=self.orders_to.get().strip(), alias="o.")
+        except ValueError:
+            messagebox.showwarning("Atenção", "Datas no formato YYYY-MM-DD.")
+            return
+        filters = [(c, [p]) for c, p in zip(clauses, params)]
+        texto = self.orders_search.get().strip()
+        if busca.match_query(texto):
+            self._show_search(self.orders_view, "orders", texto, filters)
+        else:
+            self._hide_search(self.orders_view, filters)
+
+    def _show_search(self, view, table, texto, filters, column=None):
+        """Resultado da busca textual na listagem: por relevância, com o trecho encontrado destacado.
+
+        O filtro da busca fica no pager, então apply_changes() só mexe em
+        registros que continuam casando com ela.
+        """
+        try:
+            hits = busca.search(table, texto, filters=filters)
+        except sqlite3.Error as e:
+            diagnostico.error("Erro na busca", e)
+            messagebox.showerror("Erro", f"Erro na busca:\n{e}")
+            return
+        view.pager.set_filters(filters + [busca.match_filter(table, texto, column)])
+        rows = {row[0]: row for row in view.pager.by_keys([oid for oid, _ in hits])}
+        view.show([tuple(rows[oid]) + (trecho,) for oid, trecho in hits if oid in rows])
+        view.tree.configure(displaycolumns=view.tree["columns"])
+
+    def _hide_search(self, view, filters):
+        view.pager.set_filters(filters)
+        view.tree.configure(displaycolumns=view.tree["columns"][:-1])
+        view.reload()
+
+    def filter_orders_this_week(self):
+        inicio, fim = datas.week_bounds()
+        for entry, value in ((self.orders_from, inicio), (self.orders_to, fim)):
+            entry.delete(0, tk.END)
+            entry.insert(0, value)
+        self.filter_orders()
+
+    def clear_orders_filter(self):
+        self.orders_from.delete(0, tk.END)
+        self.orders_to.delete(0, tk.END)
+        self.orders_search.delete(0, tk.END)
+        self.filter_orders()
 
     def on_order_double(self, event):
         sel = self.tree_orders.selection()
@@ -758,18 +851,25 @@ class App(tk.Tk):
         self.show_order_detail(oid)
 
     def show_order_detail(self, oid):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM orders WHERE id = ?", (oid,))
-        row = cur.fetchone()
-        cur.execute("SELECT timestamp, evento, responsavel, detalhes FROM history WHERE order_id = ? ORDER BY id", (oid,))
-        hist = cur.fetchall()
-        conn.close()
-        cols = [d[0] for d in get_conn().cursor().execute("PRAGMA table_info(orders)").fetchall()]
-        text = "\n".join([f"{cols[i]}: {row[i]}" for i in range(len(row))])
+        pool = get_pool()
+        with pool.reader() as conn:
+            row = conn.execute("SELECT * FROM orders WHERE id = ?", (oid,)).fetchone()
+            hist = conn.execute("SELECT timestamp, evento, responsavel, detalhes FROM history WHERE order_id = ? ORDER BY id", (oid,)).fetchall()
+        if row is None:
+            row, hist = arquivo.find_order(oid)
+            if row is None:
+                messagebox.showwarning("Atenção", f"O.S. {oid} não encontrada.")
+                return
+        cols = pool.columns("orders")
+        text = "\n".join([f"{c}: {v}" for c, v in zip(cols, row)])
         if hist:
             text += "\n\n--- Histórico ---\n"
             text += "\n".join([f"{h[0]} | {h[1]} | {h[2]} | {h[3]}" for h in hist])
+        anexados = anexos.list_attachments(oid)
+        if anexados:
+            text += "\n\n--- Anexos ---\n"
+            text += "\n".join([f"{a[1]} | {a[2]} | {a[3] // 1024} KB" + (f" | {a[4]}x{a[5]}" if a[4] else "")
+                               for a in anexados])
         detail_win = tk.Toplevel(self)
         detail_win.title(f"O.S. {oid}")
         txt = tk.Text(detail_win, wrap=tk.WORD)
@@ -777,6 +877,37 @@ class App(tk.Tk):
         txt.config(state=tk.DISABLED)
         txt.pack(fill=tk.BOTH, expand=True)
 
+    def gui_anexar_prompt(self):
+        sels = self.tree_orders.selection()
+        if len(sels) != 1:
+            messagebox.showwarning("Atenção", "Selecione uma O.S. para anexar arquivos.")
+            return
+        oid = self.tree_orders.item(sels[0])['values'][0]
+
+        def escolher():
+            paths = filedialog.askopenfilenames(
+                parent=win, title=f"Anexar à O.S. {oid}",
+                filetypes=[("Imagens", "*.jpg *.jpeg *.png *.bmp *.gif *.webp"), ("Todos os arquivos", "*.*")])
+            if not paths:
+                return
+            tipo = combo.get()
+            win.destroy()
+
+            def done(n):
+                # miniaturas em segundo plano; o PDF passa a incluí-las quando ficarem prontas
+                self.executor.submit(anexos.make_thumbnails, label="Gerando miniaturas")
+                messagebox.showinfo("Anexos", f"{n} arquivo(s) anexado(s) à O.S. {oid}.")
+            self.executor.submit(anexos.add_files, oid, list(paths), tipo, label=f"Anexando à O.S. {oid}",
+                                 on_done=done)
+
+        win = tk.Toplevel(self)
+        win.title(f"Anexos da O.S. {oid}")
+        ttk.Label(win, text="Tipo do anexo").pack(padx=8, pady=4)
+        combo = ttk.Combobox(win, values=anexos.TIPOS, state='readonly')
+        combo.current(0)
+        combo.pack(fill=tk.X, padx=8)
+        ttk.Button(win, text="Escolher arquivos...", command=escolher).pack(padx=8, pady=8)
+
     def gui_excluir_os(self):
         sels = self.tree_orders.selection()
         if not sels:
@@ -785,70 +916,189 @@ class App(tk.Tk):
         ids = [self.tree_orders.item(s)['values'][0] for s in sels]
         if not messagebox.askyesno("Confirmar exclusão", f"Tem certeza que deseja excluir {len(ids)} O.S.(s)? Isso removerá também o histórico relacionado."):
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        for oid in ids:
-            try:
-                cur.execute("DELETE FROM history WHERE order_id = ?", (oid,))
-                cur.execute("DELETE FROM orders WHERE id = ?", (oid,))
-            except Exception as e:
-                print("Erro ao excluir O.S.:", e)
-        conn.commit()
-        conn.close()
-        self.refresh_orders()
-        messagebox.showinfo("Excluído", f"{len(ids)} O.S.(s) excluída(s).")
+        try:
+            counts = exclusao.delete_orders(ids)
+        except sqlite3.Error as e:
+            diagnostico.error("Erro ao excluir O.S.", e)
+            messagebox.showerror("Erro", f"Erro ao excluir O.S.:\n{e}")
+            return
+        self.sync_views()
+        messagebox.showinfo("Excluído", f"{counts['orders']} O.S.(s) e {counts['history']} registro(s) "
+                                        f"de histórico excluído(s).")
 
     # Este método estava gerando erro antes — está implementado corretamente aqui.
     def gui_atualizar_status_prompt(self):
+        # versão lida de cada O.S.: a gravação só vale se ninguém mudou a O.S. depois
+        lida = {}
+
+        def load_current(event=None):
+            oid = entry_oid.get().strip()
+            atual = ordens.current(oid) if oid.isdigit() else None
+            if atual is None:
+                lbl_atual.config(text="")
+                return None
+            lida[oid] = atual[1]
+            lbl_atual.config(text=f"Status atual: {atual[0]}")
+            return atual
+
         def do_update():
             oid = entry_oid.get().strip()
             novo = combo.get().strip()
             if not oid or not novo:
                 messagebox.showwarning("Atenção", "Preencha número da O.S. e novo status.")
                 return
-            conn = get_conn()
-            cur = conn.cursor()
-            cur.execute("SELECT id FROM orders WHERE id = ?", (oid,))
-            if not cur.fetchone():
+            if oid not in lida and load_current() is None:
+                messagebox.showerror("Erro", "O.S. não encontrada.")
+                return
+            try:
+                versao = ordens.update_status(oid, novo, versao=lida[oid])
+            except ordens.ConflitoVersao as e:
+                lida[oid] = e.versao
+                lbl_atual.config(text=f"Status atual: {e.status}")
+                if not messagebox.askyesno(
+                        "Conflito", f"A O.S. {oid} foi alterada em outra estação depois que você a abriu.\n"
+                                    f"Status atual: {e.status}\n\nAlterar para '{novo}' mesmo assim?", parent=win):
+                    return
+                do_update()
+                return
+            except sqlite3.Error as e:
+                diagnostico.error("Erro ao atualizar status", e)
+                messagebox.showerror("Erro", f"Banco ocupado ou indisponível, tente de novo:\n{e}", parent=win)
+                return
+            if versao is None:
                 messagebox.showerror("Erro", "O.S. não encontrada.")
-                conn.close()
                 return
-            cur.execute("UPDATE orders SET status = ? WHERE id = ?", (novo, oid))
-            cur.execute("INSERT INTO history (order_id, timestamp, evento, responsavel, detalhes) VALUES (?,?,?,?,?)",
-                        (oid, datetime.now().strftime(DATE_FMT), f"Status alterado para {novo}", 'Operador', ''))
-            if novo == 'Concluída':
-                cur.execute("UPDATE orders SET data_encerramento = ? WHERE id = ?", (datetime.now().strftime(DATE_FMT), oid))
-            conn.commit()
-            conn.close()
             messagebox.showinfo("Sucesso", "Status atualizado.")
             win.destroy()
-            self.refresh_orders()
+            self.sync_views()
 
         win = tk.Toplevel(self)
         win.title("Atualizar status O.S.")
         ttk.Label(win, text="Número da O.S.").pack(padx=8, pady=4)
         entry_oid = ttk.Entry(win)
         entry_oid.pack(fill=tk.X, padx=8)
+        entry_oid.bind("<FocusOut>", load_current)
+        entry_oid.bind("<Return>", load_current)
+        lbl_atual = ttk.Label(win, text="")
+        lbl_atual.pack(padx=8)
         ttk.Label(win, text="Novo status").pack(padx=8, pady=4)
-        combo = ttk.Combobox(win, values=["Aberta", "Em andamento", "Pendente", "Concluída", "Cancelada"], state='readonly')
+        combo = ttk.Combobox(win, values=ordens.STATUS, state='readonly')
         combo.pack(fill=tk.X, padx=8)
         ttk.Button(win, text="Atualizar", command=do_update).pack(padx=8, pady=8)
 
     def gui_export_orders(self):
-        path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV files','*.csv')], title='Salvar O.S. como')
-        if not path:
+        def do_export():
+            try:
+                clauses, params = order_filters(
+                    status=combo_status.get().strip(),
+                    date_from=entry_from.get().strip(),
+                    date_to=entry_to.get().strip(),
+                    tecnico_id=entry_tec.get().strip(),
+                )
+            except ValueError:
+                messagebox.showwarning("Atenção", "Datas no formato YYYY-MM-DD e Técnico ID numérico.")
+                return
+            compress = gzip_var.get()
+            ext = '.csv.gz' if compress else '.csv'
+            path = filedialog.asksaveasfilename(defaultextension=ext, filetypes=[('CSV files', '*' + ext)], title='Salvar O.S. como')
+            if not path:
+                return
+            win.destroy()
+            self.executor.submit(
+                export_csv, path, "orders", clauses, params, compress=compress, label="Exportação de O.S.",
+                on_done=lambda n: messagebox.showinfo("Exportado", f"{n} O.S. exportadas para:\n{path}"))
+
+        win = tk.Toplevel(self)
+        win.title("Exportar O.S. (CSV)")
+        ttk.Label(win, text="Status (vazio = todos)").pack(padx=8, pady=4)
+        combo_status = ttk.Combobox(win, values=["", "Aberta", "Em andamento", "Pendente", "Concluída", "Cancelada"], state='readonly')
+        combo_status.pack(fill=tk.X, padx=8)
+        ttk.Label(win, text="Abertas de (YYYY-MM-DD)").pack(padx=8, pady=4)
+        entry_from = ttk.Entry(win)
+        entry_from.pack(fill=tk.X, padx=8)
+        ttk.Label(win, text="Abertas até (YYYY-MM-DD)").pack(padx=8, pady=4)
+        entry_to = ttk.Entry(win)
+        entry_to.pack(fill=tk.X, padx=8)
+        ttk.Label(win, text="Técnico ID").pack(padx=8, pady=4)
+        entry_tec = ttk.Entry(win)
+        entry_tec.pack(fill=tk.X, padx=8)
+        gzip_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(win, text="Compactar (gzip)", variable=gzip_var).pack(padx=8, pady=4, anchor=tk.W)
+        ttk.Button(win, text="Exportar", command=do_export).pack(padx=8, pady=8)
+
+    # ------------------ Agenda ------------------
+    def build_agenda_tab(self):
+        top = ttk.Frame(self.frame_agenda, padding=8)
+        top.pack(fill=tk.X)
+        ttk.Label(top, text="Dia (YYYY-MM-DD)").pack(side=tk.LEFT)
+        self.agenda_day = ttk.Entry(top, width=12)
+        self.agenda_day.insert(0, datetime.now().strftime(datas.DAY_FMT))
+        self.agenda_day.pack(side=tk.LEFT, padx=4)
+        self.agenda_week = tk.BooleanVar(value=False)
+        ttk.Radiobutton(top, text="Dia", variable=self.agenda_week, value=False,
+                        command=self.refresh_agenda).pack(side=tk.LEFT)
+        ttk.Radiobutton(top, text="Semana", variable=self.agenda_week, value=True,
+                        command=self.refresh_agenda).pack(side=tk.LEFT)
+        ttk.Button(top, text="<", width=3, command=lambda: self.shift_agenda(-1)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(top, text="Hoje", command=lambda: self.shift_agenda(0)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(top, text=">", width=3, command=lambda: self.shift_agenda(1)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(top, text="Mostrar", command=self.refresh_agenda).pack(side=tk.LEFT, padx=2)
+
+        bottom = ttk.Frame(self.frame_agenda, padding=8)
+        bottom.pack(fill=tk.BOTH, expand=True)
+        cols = ("horario", "os", "cliente", "titulo", "status")
+        self.tree_agenda = ttk.Treeview(bottom, columns=cols, show="tree headings")
+        self.tree_agenda.heading("#0", text="Técnico")
+        self.tree_agenda.column("#0", width=220)
+        for c, text, width in zip(cols, ("Horário", "O.S.", "Cliente", "Título", "Status"), (150, 60, 180, 240, 100)):
+            self.tree_agenda.heading(c, text=text)
+            self.tree_agenda.column(c, width=width)
+        self.tree_agenda.tag_configure("conflito", background="#f8d0d0")
+        self.tree_agenda.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+        self.tree_agenda.bind('<Double-1>', self.on_agenda_double)
+        scrollbar = ttk.Scrollbar(bottom, orient=tk.VERTICAL, command=self.tree_agenda.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree_agenda.configure(yscrollcommand=scrollbar.set)
+        self.refresh_agenda()
+
+    def shift_agenda(self, step):
+        """Avança/volta um dia (ou uma semana); step 0 volta para hoje."""
+        dia = datas.parse(self.agenda_day.get()) if step else None
+        dia = (dia or datetime.now()) + timedelta(days=step * (7 if self.agenda_week.get() else 1))
+        self.agenda_day.delete(0, tk.END)
+        self.agenda_day.insert(0, dia.strftime(datas.DAY_FMT))
+        self.refresh_agenda()
+
+    def refresh_agenda(self, quiet=False):
+        dia = datas.parse(self.agenda_day.get())
+        if dia is None:
+            if not quiet:
+                messagebox.showwarning("Atenção", "Dia no formato YYYY-MM-DD.")
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM orders")
-        rows = cur.fetchall()
-        headers = [d[0] for d in cur.execute("PRAGMA table_info(orders)").fetchall()]
-        conn.close()
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
-            writer.writerows(rows)
-        messagebox.showinfo("Exportado", f"{len(rows)} O.S. exportadas para:\n{path}")
+        week = self.agenda_week.get()
+        if week:
+            dia -= timedelta(days=dia.weekday())
+        start = datas.to_ts(dia.replace(hour=0, minute=0, second=0))
+        end = start + (7 if week else 1) * agenda.DAY_S
+        by_tech = self.agenda.between(start, end)
+        labels = agenda.order_labels(oid for items in by_tech.values() for _s, _e, oid, _c in items)
+        names = dict(get_pool().fetch_all("SELECT id, nome FROM technicians"))
+        self.tree_agenda.delete(*self.tree_agenda.get_children())
+        for tecnico_id in sorted(by_tech, key=lambda t: (names.get(t) or "", t)):
+            items = by_tech[tecnico_id]
+            horas = sum(min(e, end) - max(s, start) for s, e, _oid, _c in items) / 3600
+            parent = self.tree_agenda.insert("", tk.END, open=True,
+                                             text=f"{names.get(tecnico_id, tecnico_id)} ({horas:.1f} h)")
+            for s, e, oid, conflito in items:
+                cliente, titulo, status = labels.get(oid, ("", "", ""))
+                horario = f"{agenda.fmt_day(s) + ' ' if week else ''}{agenda.fmt_hour(s)}-{agenda.fmt_hour(e)}"
+                self.tree_agenda.insert(parent, tk.END, iid=f"os{oid}", values=(horario, oid, cliente or "",
+                                        titulo or "", status or ""), tags=("conflito",) if conflito else ())
+
+    def on_agenda_double(self, event):
+        item = self.tree_agenda.identify_row(event.y)
+        if item.startswith("os"):
+            self.show_order_detail(int(item[2:]))
 
     # ------------------ Relatórios ------------------
     def build_reports_tab(self):
@@ -857,6 +1107,25 @@ class App(tk.Tk):
         ttk.Button(f, text="Relatório: quantidade de O.S. por status", command=self.report_os_by_status).pack(fill=tk.X, pady=4)
         ttk.Button(f, text="Relatório: desempenho por técnico", command=self.report_performance_by_tech).pack(fill=tk.X, pady=4)
         ttk.Button(f, text="Histórico de um cliente (por ID)", command=self.gui_historico_cliente_prompt).pack(fill=tk.X, pady=4)
+        ttk.Button(f, text="Recalcular totais dos relatórios", command=self.rebuild_report_totals).pack(fill=tk.X, pady=4)
+        ttk.Button(f, text="Arquivar O.S. encerradas antigas", command=self.gui_arquivar_os).pack(fill=tk.X, pady=4)
+        ttk.Button(f, text="Carregar tabela de CEPs (rotas)", command=self.gui_carregar_ceps).pack(fill=tk.X, pady=4)
+        ttk.Button(f, text="Reconstruir e otimizar índice de busca", command=self.rebuild_search_index).pack(fill=tk.X, pady=4)
+
+        periodo = ttk.Frame(f)
+        periodo.pack(fill=tk.X, pady=4)
+        ttk.Label(periodo, text="Período de (YYYY-MM-DD)").pack(side=tk.LEFT)
+        self.report_from = ttk.Entry(periodo, width=12)
+        self.report_from.pack(side=tk.LEFT, padx=4)
+        ttk.Label(periodo, text="até").pack(side=tk.LEFT)
+        self.report_to = ttk.Entry(periodo, width=12)
+        self.report_to.pack(side=tk.LEFT, padx=4)
+        inicio, fim = datas.week_bounds()
+        self.report_from.insert(0, inicio)
+        self.report_to.insert(0, fim)
+        ttk.Button(periodo, text="O.S. abertas por status", command=self.report_os_by_status_range).pack(side=tk.LEFT, padx=2)
+        ttk.Button(periodo, text="Desempenho (concluídas no período)", command=self.report_performance_range).pack(side=tk.LEFT, padx=2)
+        ttk.Button(periodo, text="Rotas do dia (data inicial)", command=self.report_routes).pack(side=tk.LEFT, padx=2)
 
         self.report_box = tk.Text(f, height=20)
         self.report_box.pack(fill=tk.BOTH, expand=True, pady=8)
@@ -865,11 +1134,8 @@ class App(tk.Tk):
         self.add_logo_to_frame(self.frame_reports)
 
     def report_os_by_status(self):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT status, COUNT(*) FROM orders GROUP BY status")
-        rows = cur.fetchall()
-        conn.close()
+        # totais mantidos por triggers (reports.py): uma linha por status
+        rows = get_pool().fetch_all(OS_BY_STATUS_SQL)
         text = "Relatório - O.S. por status:\n\n"
         for s, c in rows:
             text += f"{s}: {c}\n"
@@ -877,19 +1143,10 @@ class App(tk.Tk):
         self.report_box.insert(tk.END, text)
 
     def report_performance_by_tech(self):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT t.id, t.nome,
-              COUNT(o.id) as total_os,
-              AVG((julianday(o.data_encerramento) - julianday(o.data_abertura)) * 24) as horas_medias
-            FROM technicians t
-            LEFT JOIN orders o ON o.tecnico_id = t.id AND o.data_encerramento IS NOT NULL
-            GROUP BY t.id
-            ORDER BY total_os DESC
-        """)
-        rows = cur.fetchall()
-        conn.close()
+        self.executor.submit(query_all, PERFORMANCE_BY_TECH_SQL, label="Desempenho por técnico",
+                             on_done=self._show_performance_by_tech)
+
+    def _show_performance_by_tech(self, rows):
         text = "Relatório - desempenho por técnico:\n\n"
         text += "ID | Nome | Total O.S. concluídas | Horas médias (aprox)\n"
         for r in rows:
@@ -897,17 +1154,102 @@ class App(tk.Tk):
         self.report_box.delete('1.0', tk.END)
         self.report_box.insert(tk.END, text)
 
+    def _report_period(self):
+        try:
+            inicio, fim = datas.day_range(self.report_from.get().strip(), self.report_to.get().strip())
+        except ValueError:
+            inicio = fim = None
+        if inicio is None or fim is None:
+            messagebox.showwarning("Atenção", "Informe o período no formato YYYY-MM-DD.")
+            return None
+        return inicio, fim
+
+    def report_os_by_status_range(self):
+        periodo = self._report_period()
+        if periodo is None:
+            return
+        titulo = f"Relatório - O.S. abertas de {self.report_from.get()} a {self.report_to.get()}, por status:\n\n"
+
+        def show(rows):
+            text = titulo + "".join(f"{s}: {c}\n" for s, c in rows)
+            self.report_box.delete('1.0', tk.END)
+            self.report_box.insert(tk.END, text)
+        self.executor.submit(query_all, OS_BY_STATUS_RANGE_SQL, periodo, label="O.S. por status no período",
+                             on_done=show)
+
+    def report_performance_range(self):
+        periodo = self._report_period()
+        if periodo is None:
+            return
+        self.executor.submit(query_all, PERFORMANCE_BY_TECH_RANGE_SQL, periodo, label="Desempenho no período",
+                             on_done=self._show_performance_by_tech)
+
+    def report_routes(self):
+        dia = self.report_from.get().strip()
+        try:
+            datetime.strptime(dia, "%Y-%m-%d")
+        except ValueError:
+            messagebox.showwarning("Atenção", "Informe a data no formato YYYY-MM-DD.")
+            return
+
+        def show(routes):
+            text = f"Rotas do dia {dia}:\n\n"
+            if not routes:
+                text += "Nenhuma O.S. agendada com técnico.\n"
+            for route in routes:
+                text += (f"{route['tecnico']}: {len(route['paradas'])} O.S., {route['km']:.1f} km "
+                         f"({' > '.join(route['setores'])})\n")
+                for n, stop in enumerate(route['paradas'], 1):
+                    km = "sem coordenada" if stop['km'] is None else f"{stop['km']:.1f} km"
+                    text += f"  {n}. O.S. {stop['oid']} {stop['horario']} {stop['cliente']} - {stop['bairro']} ({km})\n"
+                text += "\n"
+            self.report_box.delete('1.0', tk.END)
+            self.report_box.insert(tk.END, text)
+        self.executor.submit(lambda token: rotas.plan_day(dia), label="Planejando rotas", on_done=show)
+
+    def gui_carregar_ceps(self):
+        path = filedialog.askopenfilename(title="Tabela de CEPs (cep, lat, lon, bairro, cidade)",
+                                          filetypes=[("CSV", "*.csv"), ("Todos", "*.*")])
+        if not path:
+            return
+        try:
+            ok, bad = rotas.load_ceps(path)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            diagnostico.error("Falha ao carregar CEPs", e)
+            messagebox.showerror("Erro", f"Falha ao carregar CEPs: {e}")
+            return
+        messagebox.showinfo("CEPs", f"{ok} CEPs carregados, {bad} linhas rejeitadas.")
+
+    def rebuild_search_index(self):
+        def job(token):
+            busca.rebuild(token)
+            busca.optimize(token)
+        self.executor.submit(job, label="Reconstruindo índice de busca",
+                             on_done=lambda _r: messagebox.showinfo("Busca", "Índice de busca reconstruído."))
+
+    def rebuild_report_totals(self):
+        self.executor.submit(reports.rebuild, label="Recalculando totais",
+                             on_done=lambda _r: messagebox.showinfo("Relatórios", "Totais recalculados."))
+
+    def gui_arquivar_os(self):
+        dias = simpledialog.askinteger("Arquivo morto", "Arquivar O.S. concluídas/canceladas há mais de quantos dias?",
+                                       initialvalue=arquivo.ARCHIVE_AGE_DAYS, minvalue=0, parent=self)
+        if dias is None:
+            return
+
+        def done(counts):
+            self.sync_views()
+            messagebox.showinfo("Arquivo morto", f"{counts['orders']} O.S. e {counts['history']} registro(s) de "
+                                                 f"histórico movidos para o arquivo morto.")
+        self.executor.submit(arquivo.archive_orders, days=dias, label="Arquivando O.S.", on_done=done)
+
     def gui_historico_cliente_prompt(self):
         def do_show():
             cid = entry.get().strip()
             if not cid:
                 messagebox.showwarning("Atenção", "Informe ID do cliente.")
                 return
-            conn = get_conn()
-            cur = conn.cursor()
-            cur.execute("SELECT o.id, o.tipo_os, o.data_abertura, o.data_encerramento, o.status, o.titulo FROM orders o WHERE o.cliente_id = ? ORDER BY o.id DESC", (cid,))
-            rows = cur.fetchall()
-            conn.close()
+            rows = arquivo.client_history(cid, include_archive=incluir.get())
             text = f"Histórico de atendimentos do cliente {cid}:\n\n"
             if not rows:
                 text += "Nenhuma O.S. encontrada.\n"
@@ -923,9 +1265,12 @@ class App(tk.Tk):
         ttk.Label(win, text="ID do cliente").pack(padx=8, pady=4)
         entry = ttk.Entry(win)
         entry.pack(fill=tk.X, padx=8)
+        incluir = tk.BooleanVar(value=False)
+        ttk.Checkbutton(win, text="Incluir arquivo morto", variable=incluir).pack(padx=8, pady=4)
         ttk.Button(win, text="Mostrar", command=do_show).pack(padx=8, pady=8)
 
 
 if __name__ == '__main__':
     app = App()
     app.mainloop()
+    db.close_pool()
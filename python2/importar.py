@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importação em massa, sem interface gráfica (clientes, técnicos, O.S., histórico)
+
+Uso:
+    python importar.py clients clientes.csv
+    python importar.py orders ordens.jsonl --carga-inicial --lote 10000
+
+- Lê CSV (com cabeçalho) ou JSON lines em fluxo, sem carregar o arquivo todo.
+- Grava com executemany() em lotes grandes, um lote por transação.
+- Linhas inválidas vão para um arquivo de rejeitados (linha, erro, conteúdo).
+- Cada lote grava, na mesma transação, um checkpoint (tabela
+  import_checkpoints) com quantos registros do arquivo já foram processados;
+  rodar de novo o mesmo comando continua exatamente de onde parou.
+- --carga-inicial remove os índices e os triggers (log de alterações, totais
+  dos relatórios) da tabela durante a carga e os recria no final (uma
+  ordenação só, em vez de atualizar o índice a cada linha); os totais dos
+  relatórios são então recalculados de uma vez.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import arquivo
+import busca
+import db
+import migrations
+from change_tracker import log_bulk_load
+from db import get_pool
+from reports import rebuild_aggregates
+
+DATE_FMT = "%Y-%m-%d %H:%M:%S"
+BATCH_SIZE = 5000
+
+
+class TableSpec:
+    def __init__(self, required=(), ints=(), refs=None, dates=(), defaults=None):
+        self.required = required
+        self.ints = ints
+        self.refs = refs or {}
+        self.dates = dates
+        self.defaults = defaults or {}
+
+
+TABLES = {
+    "clients": TableSpec(
+        required=("nome", "tipo_pessoa", "documento"),
+        ints=("id",),
+        dates=("data_cadastro",),
+        defaults={"status": "Ativo"},
+    ),
+    "technicians": TableSpec(
+        required=("nome",),
+        ints=("id",),
+    ),
+    "orders": TableSpec(
+        required=("cliente_id",),
+        ints=("id", "cliente_id", "tecnico_id", "versao"),
+        refs={"cliente_id": "clients", "tecnico_id": "technicians"},
+        dates=("data_abertura", "data_encerramento"),
+        defaults={"status": "Aberta", "versao": 0},
+    ),
+    "history": TableSpec(
+        required=("order_id",),
+        ints=("id", "order_id"),
+        refs={"order_id": "orders"},
+        dates=("timestamp",),
+    ),
+}
+
+
+# ---------------- Leitura ----------------
+def read_records(path, fmt):
+    """Gera (registro, erro) em ordem; erro é uma mensagem quando a linha não pôde ser lida."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield row, None
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield {"_linha": line}, f"JSON inválido: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield {"_linha": line}, "JSON não é um objeto"
+                continue
+            yield record, None
+
+
+def detect_format(path):
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+# ---------------- Validação ----------------
+def validate(spec, cols, record, known_ids):
+    """Converte um registro em tupla na ordem de `cols` ou levanta ValueError."""
+    values = {}
+    for key, raw in record.items():
+        if key not in cols:
+            continue
+        if isinstance(raw, str):
+            raw = raw.strip()
+        values[key] = None if raw == "" else raw
+    for key, default in spec.defaults.items():
+        if values.get(key) is None:
+            values[key] = default
+    for key in spec.required:
+        if values.get(key) is None:
+            raise ValueError(f"campo obrigatório vazio: {key}")
+    for key in spec.ints:
+        if values.get(key) is not None:
+            try:
+                values[key] = int(values[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} não é um número inteiro: {values[key]!r}")
+    for key in spec.dates:
+        if values.get(key) is not None:
+            try:
+                datetime.strptime(str(values[key]), DATE_FMT)
+            except ValueError:
+                raise ValueError(f"{key} fora do formato {DATE_FMT}: {values[key]!r}")
+    for key, table in spec.refs.items():
+        if values.get(key) is not None and values[key] not in known_ids[table]:
+            raise ValueError(f"{key}={values[key]} não existe em {table}")
+    return tuple(values.get(c) for c in cols)
+
+
+def load_ids(pool, tables):
+    ids = {}
+    with pool.reader() as conn:
+        for table in tables:
+            ids[table] = {r[0] for r in conn.execute(f"SELECT id FROM {table}")}
+    return ids
+
+
+# ---------------- Índices adiados ----------------
+def suspend_indexes(conn, table):
+    """Remove índices secundários e triggers de `table`; devolve o DDL para recriar."""
+    rows = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE tbl_name = ? AND sql IS NOT NULL AND type IN ('index', 'trigger')",
+        (table,)).fetchall()
+    for kind, name, _sql in rows:
+        conn.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+    return [sql for _kind, _name, sql in rows]
+
+
+def restore_indexes(conn, ddl):
+    for sql in ddl:
+        conn.execute(sql)
+
+
+# ---------------- Checkpoint ----------------
+def load_checkpoint(pool, source, table):
+    row = pool.fetch_one(
+        "SELECT tbl, processed, inserted, rejected, deferred_ddl FROM import_checkpoints WHERE source = ?",
+        (source,))
+    if row is None:
+        return {"source": source, "table": table, "processed": 0, "inserted": 0, "rejected": 0,
+                "deferred_ddl": []}
+    if row[0] != table:
+        raise SystemExit(f"Há uma importação pendente de {source} para {row[0]}; use --reiniciar.")
+    return {"source": source, "table": table, "processed": row[1], "inserted": row[2],
+            "rejected": row[3], "deferred_ddl": json.loads(row[4] or "[]")}
+
+
+def save_checkpoint(conn, state):
+    """Deve ser chamada dentro da mesma transação que gravou o lote."""
+    conn.execute(
+        "INSERT OR REPLACE INTO import_checkpoints (source, tbl, processed, inserted, rejected, deferred_ddl) "
+        "VALUES (?,?,?,?,?,?)",
+        (state["source"], state["table"], state["processed"], state["inserted"], state["rejected"],
+         json.dumps(state["deferred_ddl"])))
+
+
+# ---------------- Importação ----------------
+def import_file(table, source, fmt=None, batch_size=BATCH_SIZE, rejects=None,
+                initial_load=False, restart=False, log=print):
+    """Importa `source` para `table`. Retorna o estado final (contadores)."""
+    spec = TABLES[table]
+    fmt = fmt or detect_format(source)
+    rejects = rejects or source + ".rejeitados.csv"
+    source_key = os.path.abspath(source)
+
+    pool = get_pool()
+    migrations.migrate(pool)
+    arquivo.attach(pool)  # rebuild_aggregates() no final conta também o arquivo morto
+    if restart:
+        with pool.writer() as conn:
+            row = conn.execute("SELECT deferred_ddl FROM import_checkpoints WHERE source = ?",
+                               (source_key,)).fetchone()
+            if row:
+                # não perder índices removidos pela tentativa anterior
+                restore_indexes(conn, json.loads(row[0] or "[]"))
+                if table == "orders":
+                    rebuild_aggregates(conn)
+                if table in busca.INDEXES:
+                    busca.rebuild_index(conn, table)
+                log_bulk_load(conn, table)
+            conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source_key,))
+    cols = pool.columns(table)
+    state = load_checkpoint(pool, source_key, table)
+    known_ids = load_ids(pool, set(spec.refs.values()))
+    skip = state["processed"]
+
+    if initial_load and not state["deferred_ddl"]:
+        with pool.writer() as conn:
+            state["deferred_ddl"] = suspend_indexes(conn, table)
+            save_checkpoint(conn, state)
+
+    marks = ",".join("?" * len(cols))
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({marks})"
+    start = time.monotonic()
+    batch, bad = [], []
+    processed = state["processed"]
+
+    with open(rejects, 'a', newline='', encoding='utf-8') as rej_file:
+        rej = csv.writer(rej_file)
+        if rej_file.tell() == 0:
+            rej.writerow(["registro", "erro", "conteudo"])
+
+        def flush():
+            state["processed"] = processed
+            try:
+                with pool.writer() as conn:
+                    conn.executemany(sql, [values for _n, _r, values in batch])
+                    if state["deferred_ddl"]:
+                        log_bulk_load(conn, table)     # sem os triggers do change_log
+                    save_checkpoint(conn, dict(state, inserted=state["inserted"] + len(batch),
+                                               rejected=state["rejected"] + len(bad)))
+                inserted = len(batch)
+            except sqlite3.IntegrityError:
+                # algum registro viola chave/unique: refaz o lote linha a linha
+                inserted = 0
+                with pool.writer() as conn:
+                    for number, record, values in batch:
+                        try:
+                            conn.execute(sql, values)
+                            inserted += 1
+                        except sqlite3.IntegrityError as e:
+                            bad.append([number, str(e), json.dumps(record, ensure_ascii=False)])
+                    if inserted and state["deferred_ddl"]:
+                        log_bulk_load(conn, table)
+                    save_checkpoint(conn, dict(state, inserted=state["inserted"] + inserted,
+                                               rejected=state["rejected"] + len(bad)))
+            state["inserted"] += inserted
+            state["rejected"] += len(bad)
+            for row in bad:
+                rej.writerow(row)
+            rej_file.flush()
+            batch.clear()
+            bad.clear()
+            elapsed = time.monotonic() - start
+            log(f"{state['inserted']} inseridos, {state['rejected']} rejeitados "
+                f"({(processed - skip) / elapsed if elapsed else 0:.0f} registros/s)")
+
+        for number, (record, error) in enumerate(read_records(source, fmt), start=1):
+            if number <= skip:
+                continue
+            processed = number
+            if error is None:
+                try:
+                    batch.append((number, record, validate(spec, cols, record, known_ids)))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                bad.append([number, error, json.dumps(record, ensure_ascii=False)])
+            if len(batch) >= batch_size or len(bad) >= batch_size:
+                flush()
+        if batch or bad:
+            flush()
+
+    with pool.writer() as conn:
+        if state["deferred_ddl"]:
+            log("Recriando índices...")
+            restore_indexes(conn, state["deferred_ddl"])
+            if table == "orders":
+                rebuild_aggregates(conn)
+            if table in busca.INDEXES:
+                busca.rebuild_index(conn, table)
+            log_bulk_load(conn, table)
+            state["deferred_ddl"] = []
+        conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source_key,))
+    pool.invalidate_schema()
+    state["elapsed"] = time.monotonic() - start
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importação em massa para o gestao.db")
+    parser.add_argument("tabela", choices=sorted(TABLES))
+    parser.add_argument("arquivo", help="CSV com cabeçalho ou JSON lines (.jsonl)")
+    parser.add_argument("--formato", choices=["csv", "jsonl"], help="padrão: pela extensão")
+    parser.add_argument("--db", default=db.DB_FILE, help="arquivo do banco (padrão: gestao.db)")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="registros por transação")
+    parser.add_argument("--rejeitados", help="arquivo CSV de linhas rejeitadas")
+    parser.add_argument("--carga-inicial", action="store_true", help="recria os índices só no final")
+    parser.add_argument("--reiniciar", action="store_true", help="ignora o checkpoint existente")
+    args = parser.parse_args(argv)
+
+    db.DB_FILE = args.db
+    try:
+        state = import_file(args.tabela, args.arquivo, fmt=args.formato, batch_size=args.lote,
+                            rejects=args.rejeitados,
+                            initial_load=args.carga_inicial, restart=args.reiniciar)
+    finally:
+        db.close_pool()
+    print(f"Concluído: {state['inserted']} inseridos, {state['rejected']} rejeitados "
+          f"em {state['elapsed']:.1f}s.")
+    return 1 if state["rejected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
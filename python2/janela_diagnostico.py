@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Janela de diagnóstico de desempenho (Ctrl+Shift+D na tela principal)
+
+Separada de diagnostico.py para que só a interface gráfica carregue o Tk.
+"""
+
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from diagnostico import TRACER
+
+
+class DiagnosticsWindow(tk.Toplevel):
+    """Janela de diagnóstico: p50/p95 por operação, consultas lentas e erros."""
+
+    def __init__(self, master, tracer=TRACER):
+        super().__init__(master)
+        self.tracer = tracer
+        self.title("Diagnóstico de desempenho")
+        self.geometry("900x500")
+
+        bar = ttk.Frame(self, padding=4)
+        bar.pack(fill=tk.X)
+        ttk.Button(bar, text="Atualizar", command=self.refresh).pack(side=tk.LEFT)
+        ttk.Button(bar, text="Salvar trace...", command=self.save).pack(side=tk.LEFT, padx=4)
+        ttk.Button(bar, text="Limpar", command=self.clear).pack(side=tk.LEFT)
+        self.toggle_btn = ttk.Button(bar, command=self.toggle)
+        self.toggle_btn.pack(side=tk.LEFT, padx=4)
+        self.status = ttk.Label(bar, text="")
+        self.status.pack(side=tk.RIGHT)
+
+        notebook = ttk.Notebook(self)
+        notebook.pack(fill=tk.BOTH, expand=True)
+        self.ops = self._table(notebook, "Operações", ("operacao", "n", "p50_ms", "p95_ms", "max_ms"), (480, 60, 90, 90, 90))
+        self.slow = self._table(notebook, "Consultas lentas", ("hora", "ms", "linhas", "sql"), (70, 80, 70, 640))
+        self.errs = self._table(notebook, "Erros", ("hora", "mensagem"), (70, 800))
+        self.refresh()
+
+    def _table(self, notebook, title, cols, widths):
+        frame = ttk.Frame(notebook)
+        notebook.add(frame, text=title)
+        tree = ttk.Treeview(frame, columns=cols, show="headings")
+        for col, width in zip(cols, widths):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, stretch=(col in ("operacao", "sql", "mensagem")))
+        scroll = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        return tree
+
+    def refresh(self):
+        for tree in (self.ops, self.slow, self.errs):
+            tree.delete(*tree.get_children())
+        for name, n, p50, p95, top in self.tracer.stats():
+            self.ops.insert("", tk.END, values=(name, n, f"{p50:.2f}", f"{p95:.2f}", f"{top:.2f}"))
+        for row in reversed(self.tracer.slow_queries()):
+            self.slow.insert("", tk.END, values=row)
+        for row in reversed(self.tracer.errors()):
+            self.errs.insert("", tk.END, values=row)
+        state = "ligado" if self.tracer.enabled else "desligado"
+        self.status.config(text=f"Rastreamento {state}; lenta a partir de {self.tracer.slow_ms} ms")
+        self.toggle_btn.config(text="Desligar rastreamento" if self.tracer.enabled else "Ligar rastreamento")
+
+    def toggle(self):
+        if self.tracer.enabled:
+            self.tracer.disable()
+        else:
+            self.tracer.enable()
+        self.refresh()
+
+    def clear(self):
+        self.tracer.clear()
+        self.refresh()
+
+    def save(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")], title="Salvar trace como...")
+        if not path:
+            return
+        self.tracer.dump(path)
+        messagebox.showinfo("Diagnóstico", f"Trace salvo em:\n{path}", parent=self)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migrações versionadas do esquema (controladas por PRAGMA user_version)
+
+Cada passo tem um número de versão e é aplicado uma única vez, em ordem,
+dentro de uma transação do escritor. Os passos são idempotentes (IF NOT
+EXISTS, verificação de colunas), então um banco antigo sem user_version
+pode ser migrado com segurança. Quando o banco já está na última versão,
+migrate() não executa nenhum DDL.
+"""
+
+import busca
+from datas import TS_COLUMNS, TS_EXPR
+from reports import DURATION_SQL, rebuild_aggregates
+
+# duração usada pelos triggers da migração 5 (antes das colunas epoch)
+_JULIANDAY_HOURS = "(julianday({o}.data_encerramento) - julianday({o}.data_abertura)) * 24"
+
+
+# ---------------- Utilitários para os passos ----------------
+def table_columns(conn, table):
+    """Colunas graváveis (PRAGMA table_info não lista colunas geradas)."""
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def add_column(conn, table, column, decl):
+    """ALTER TABLE ... ADD COLUMN, somente se a coluna ainda não existir."""
+    if column not in table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def rebuild_table(conn, table, create_sql):
+    """Recria `table` com uma nova definição, preservando os dados.
+
+    `create_sql` deve conter "{name}" no lugar do nome da tabela; colunas
+    geradas precisam estar nele. Índices, triggers e o contador do
+    AUTOINCREMENT da tabela antiga são recriados. Exige PRAGMA foreign_keys
+    desligado (migrate() já roda assim).
+    """
+    tmp = f"{table}__new"
+    ddl = [r[0] for r in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,))]
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    conn.execute(f"DROP TABLE IF EXISTS {tmp}")
+    conn.execute(create_sql.format(name=tmp))
+    common = [c for c in table_columns(conn, tmp) if c in table_columns(conn, table)]
+    cols = ", ".join(common)
+    conn.execute(f"INSERT INTO {tmp} ({cols}) SELECT {cols} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+    for sql in ddl:
+        conn.execute(sql)
+    if seq is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], table))
+
+
+# ---------------- Passos ----------------
+def _m001_base_tables(conn):
+    """Tabelas originais do sistema (idempotente para bancos já existentes)."""
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        tipo_pessoa TEXT NOT NULL,
+        documento TEXT NOT NULL,
+        cep TEXT,
+        rua TEXT,
+        numero TEXT,
+        bairro TEXT,
+        cidade TEXT,
+        estado TEXT,
+        ponto_referencia TEXT,
+        email TEXT,
+        telefone_principal TEXT,
+        telefone_secundario TEXT,
+        nome_responsavel TEXT,
+        cpf_responsavel TEXT,
+        tel_responsavel TEXT,
+        tel_zelador TEXT,
+        observacoes TEXT,
+        data_cadastro TEXT,
+        status TEXT,
+        modalidade_atendimento TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS technicians (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        cpf TEXT,
+        rg TEXT,
+        telefone TEXT,
+        email TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cliente_id INTEGER NOT NULL,
+        tipo_os TEXT,
+        data_abertura TEXT,
+        data_agendamento TEXT,
+        horario_previsto TEXT,
+        endereco_execucao TEXT,
+        titulo TEXT,
+        descricao TEXT,
+        tecnico_id INTEGER,
+        prioridade TEXT,
+        canal_origem TEXT,
+        equipamentos TEXT,
+        status TEXT,
+        checklist TEXT,
+        tempo_estimado TEXT,
+        materiais TEXT,
+        fotos TEXT,
+        assinatura_cliente TEXT,
+        assinatura_tecnico TEXT,
+        observacoes_finais TEXT,
+        data_encerramento TEXT,
+        FOREIGN KEY(cliente_id) REFERENCES clients(id),
+        FOREIGN KEY(tecnico_id) REFERENCES technicians(id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER,
+        timestamp TEXT,
+        evento TEXT,
+        responsavel TEXT,
+        detalhes TEXT,
+        FOREIGN KEY(order_id) REFERENCES orders(id)
+    )
+    """)
+
+
+def _m002_hot_path_indexes(conn):
+    """Índices das consultas mais frequentes (histórico, relatórios, detalhes)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_cliente ON orders(cliente_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_tecnico ON orders(tecnico_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_order ON history(order_id)")
+
+
+def _m003_change_log(conn):
+    """Log de alterações alimentado por triggers (atualização incremental das listagens)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tbl TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    )
+    """)
+    for table in ("clients", "technicians", "orders"):
+        for event, op, ref in (("INSERT", "I", "NEW"), ("UPDATE", "U", "NEW"), ("DELETE", "D", "OLD")):
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_log_{op.lower()} AFTER {event} ON {table}
+            BEGIN
+                INSERT INTO change_log (tbl, row_id, op) VALUES ('{table}', {ref}.id, '{op}');
+            END
+            """)
+
+
+def _m004_import_checkpoints(conn):
+    """Checkpoints da importação em massa (importar.py), gravados junto com cada lote."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source TEXT PRIMARY KEY,
+        tbl TEXT NOT NULL,
+        processed INTEGER NOT NULL,
+        inserted INTEGER NOT NULL,
+        rejected INTEGER NOT NULL,
+        deferred_ddl TEXT
+    )
+    """)
+
+
+def _report_delta(ref, sign, duration):
+    """Soma (sign="") ou subtrai (sign="-") a linha {ref} dos totais dos relatórios."""
+    dur = duration.format(o=ref)
+    return f"""
+        INSERT INTO report_status_counts (status, total) VALUES (IFNULL({ref}.status, ''), {sign}1)
+        ON CONFLICT(status) DO UPDATE SET total = total + excluded.total;
+        INSERT INTO report_tech_stats (tecnico_id, concluidas, horas_qtd, horas_soma)
+        SELECT {ref}.tecnico_id, {sign}1, {sign}(d IS NOT NULL), {sign}IFNULL(d, 0)
+        FROM (SELECT {dur} AS d)
+        WHERE {ref}.tecnico_id IS NOT NULL AND {ref}.data_encerramento IS NOT NULL
+        ON CONFLICT(tecnico_id) DO UPDATE SET
+            concluidas = concluidas + excluded.concluidas,
+            horas_qtd = horas_qtd + excluded.horas_qtd,
+            horas_soma = horas_soma + excluded.horas_soma;
+    """
+
+
+def _m005_report_aggregates(conn):
+    """Totais dos relatórios (por status e por técnico) mantidos por triggers em orders."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS report_status_counts (
+        status TEXT PRIMARY KEY,
+        total INTEGER NOT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS report_tech_stats (
+        tecnico_id INTEGER PRIMARY KEY,
+        concluidas INTEGER NOT NULL,
+        horas_qtd INTEGER NOT NULL,
+        horas_soma REAL NOT NULL
+    )
+    """)
+    _create_report_triggers(conn, _JULIANDAY_HOURS)
+    rebuild_aggregates(conn, _JULIANDAY_HOURS)
+
+
+def _create_report_triggers(conn, duration):
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_agg_i AFTER INSERT ON orders
+    BEGIN {_report_delta("NEW", "", duration)} END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_agg_d AFTER DELETE ON orders
+    BEGIN {_report_delta("OLD", "-", duration)} END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_agg_u
+    AFTER UPDATE OF status, tecnico_id, data_abertura, data_encerramento ON orders
+    BEGIN {_report_delta("OLD", "-", duration)} {_report_delta("NEW", "", duration)} END
+    """)
+
+
+def _m006_epoch_columns(conn):
+    """Colunas geradas com o epoch das datas (indexadas) e totais recalculados com elas."""
+    for table, col, ts in TS_COLUMNS:
+        if ts not in [r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")]:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {ts} INTEGER "
+                         f"GENERATED ALWAYS AS ({TS_EXPR.format(col=col)}) VIRTUAL")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{ts} ON {table}({ts})")
+    for name in ("trg_orders_agg_i", "trg_orders_agg_d", "trg_orders_agg_u"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    _create_report_triggers(conn, DURATION_SQL)
+    rebuild_aggregates(conn)
+
+
+def _epoch_columns_sql(table):
+    return "".join(f",\n        {ts} INTEGER GENERATED ALWAYS AS ({TS_EXPR.format(col=col)}) VIRTUAL"
+                   for tbl, col, ts in TS_COLUMNS if tbl == table)
+
+
+def _m007_cascading_foreign_keys(conn):
+    """ON DELETE CASCADE / SET NULL nas chaves de orders e history (exclusão em massa)."""
+    rebuild_table(conn, "orders", """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cliente_id INTEGER NOT NULL,
+        tipo_os TEXT,
+        data_abertura TEXT,
+        data_agendamento TEXT,
+        horario_previsto TEXT,
+        endereco_execucao TEXT,
+        titulo TEXT,
+        descricao TEXT,
+        tecnico_id INTEGER,
+        prioridade TEXT,
+        canal_origem TEXT,
+        equipamentos TEXT,
+        status TEXT,
+        checklist TEXT,
+        tempo_estimado TEXT,
+        materiais TEXT,
+        fotos TEXT,
+        assinatura_cliente TEXT,
+        assinatura_tecnico TEXT,
+        observacoes_finais TEXT,
+        data_encerramento TEXT""" + _epoch_columns_sql("orders") + """,
+        FOREIGN KEY(cliente_id) REFERENCES clients(id) ON DELETE CASCADE,
+        FOREIGN KEY(tecnico_id) REFERENCES technicians(id) ON DELETE SET NULL
+    )
+    """)
+    rebuild_table(conn, "history", """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER,
+        timestamp TEXT,
+        evento TEXT,
+        responsavel TEXT,
+        detalhes TEXT""" + _epoch_columns_sql("history") + """,
+        FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE
+    )
+    """)
+
+
+def _m008_attachments(conn):
+    """Anexos das O.S. (fotos, assinaturas): só metadados; os arquivos ficam em anexos/ (anexos.py)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS attachments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL DEFAULT 'foto',
+        sha256 TEXT NOT NULL,
+        extensao TEXT NOT NULL DEFAULT '',
+        nome TEXT,
+        mime TEXT,
+        tamanho INTEGER,
+        largura INTEGER,
+        altura INTEGER,
+        miniatura INTEGER NOT NULL DEFAULT 0,
+        criado_em TEXT,
+        UNIQUE(order_id, tipo, sha256),
+        FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attachments_sha ON attachments(sha256)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attachments_pending ON attachments(sha256) WHERE miniatura = 0")
+
+
+def _m009_order_version(conn):
+    """Versão da linha da O.S. (controle otimista entre estações, ordens.py)."""
+    add_column(conn, "orders", "versao", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _m010_cep_coords(conn):
+    """Coordenadas por CEP (ou prefixo de CEP), carregadas de arquivo para o planejamento de rotas (rotas.py)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS cep_coords (
+        cep TEXT PRIMARY KEY,
+        lat REAL NOT NULL,
+        lon REAL NOT NULL,
+        bairro TEXT,
+        cidade TEXT
+    ) WITHOUT ROWID
+    """)
+
+
+def _m011_full_text_search(conn):
+    """Índices FTS5 de O.S. e clientes mantidos por triggers (busca.py)."""
+    for table in busca.INDEXES:
+        busca.create_index(conn, table)
+
+
+# (versão, descrição, função) — sempre acrescentar no final, nunca renumerar.
+MIGRATIONS = [
+    (1, "tabelas base", _m001_base_tables),
+    (2, "índices de consulta", _m002_hot_path_indexes),
+    (3, "log de alterações", _m003_change_log),
+    (4, "checkpoints de importação", _m004_import_checkpoints),
+    (5, "totais dos relatórios", _m005_report_aggregates),
+    (6, "colunas epoch das datas", _m006_epoch_columns),
+    (7, "chaves estrangeiras em cascata", _m007_cascading_foreign_keys),
+    (8, "anexos das O.S.", _m008_attachments),
+    (9, "versão das O.S.", _m009_order_version),
+    (10, "coordenadas por CEP", _m010_cep_coords),
+    (11, "busca textual (FTS5)", _m011_full_text_search),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(pool):
+    """Leva o banco até LATEST_VERSION. Retorna quantos passos foram aplicados."""
+    if pool.fetch_one("PRAGMA user_version")[0] >= LATEST_VERSION:
+        return 0
+    applied = 0
+    # chaves estrangeiras desligadas: rebuild_table() apaga e recria tabelas
+    with pool.writer(foreign_keys=False) as conn:
+        # relê dentro do lock: outra estação pode ter migrado nesse meio tempo
+        version = schema_version(conn)
+        for number, _desc, step in MIGRATIONS:
+            if number <= version:
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            applied += 1
+    if applied:
+        pool.invalidate_schema()
+    return applied
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Operações sobre O.S. usadas pela tela e pela API (servidor.py)
+
+Controle otimista entre estações: cada O.S. tem uma coluna `versao`,
+incrementada a cada mudança de status. Quem leu a O.S. passa a versão lida
+para update_status(); se outra estação gravou antes, o UPDATE não encontra a
+linha com aquela versão e ConflitoVersao informa o estado atual, em vez de a
+alteração da outra estação ser sobrescrita sem aviso.
+"""
+
+from datetime import datetime
+
+from datas import DATE_FMT
+from db import get_pool
+
+STATUS = ("Aberta", "Em andamento", "Pendente", "Concluída", "Cancelada")
+
+
+class ConflitoVersao(Exception):
+    """A O.S. mudou desde que foi lida (outra estação gravou antes)."""
+
+    def __init__(self, oid, status, versao):
+        super().__init__(f"O.S. {oid} foi alterada em outra estação (status atual: {status})")
+        self.oid = oid
+        self.status = status
+        self.versao = versao
+
+
+def current(oid):
+    """(status, versao) atuais da O.S., ou None se ela não existe."""
+    return get_pool().fetch_one("SELECT status, versao FROM orders WHERE id = ?", (oid,))
+
+
+def update_status(oid, novo, responsavel="Operador", detalhes="", versao=None):
+    """Muda o status e registra no histórico, em uma única transação.
+
+    Com `versao`, só grava se a O.S. ainda estiver nessa versão (senão,
+    ConflitoVersao). Concluída também grava data_encerramento. Retorna a nova
+    versão, ou None se a O.S. não existe.
+    """
+    if novo not in STATUS:
+        raise ValueError(f"Status inválido: {novo}")
+    agora = datetime.now().strftime(DATE_FMT)
+    with get_pool().writer() as conn:
+        changed = conn.execute(
+            "UPDATE orders SET status = ?, versao = versao + 1, "
+            "data_encerramento = CASE WHEN ? = 'Concluída' THEN ? ELSE data_encerramento END "
+            "WHERE id = ? AND (? IS NULL OR versao = ?)",
+            (novo, novo, agora, oid, versao, versao)).rowcount
+        # dentro da mesma transação: ninguém mais grava entre o UPDATE e esta leitura
+        atual = conn.execute("SELECT status, versao FROM orders WHERE id = ?", (oid,)).fetchone()
+        if atual is None:
+            return None
+        if not changed:
+            raise ConflitoVersao(oid, *atual)
+        conn.execute("INSERT INTO history (order_id, timestamp, evento, responsavel, detalhes) VALUES (?,?,?,?,?)",
+                     (oid, agora, f"Status alterado para {novo}", responsavel, detalhes))
+    return atual[1]
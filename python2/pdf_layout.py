@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Layout do PDF da O.S. com medidas e cabeçalho reaproveitados
+
+- TextMeasure: larguras por caractere pré-calculadas (Latin-1) e quebra de
+  linha linear, memoizada por (texto, largura). A versão antiga chamava
+  c.stringWidth(linha + palavra) a cada palavra, o que é quadrático em
+  campos longos (descrição, checklist).
+- OSTemplate: posições, fontes, grupos e rótulos definidos uma única vez e
+  compartilhados entre páginas e documentos. O cabeçalho (logo + título +
+  linha) vira um form XObject desenhado uma vez por arquivo e apenas
+  referenciado (doForm) em cada O.S., então a imagem da logo é embutida uma
+  só vez mesmo em um PDF com centenas de O.S.
+- Fotos e assinaturas anexadas (anexos.py) entram como miniaturas em uma
+  grade no final da O.S.
+- draw_route(): folha de rota do técnico (rotas.py), impressa antes das O.S.
+  do lote.
+
+Executar este arquivo mede o tempo por documento com campos muito longos.
+"""
+
+import os
+import time
+from functools import lru_cache
+
+import diagnostico
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+
+WRAP_CACHE_SIZE = 4096
+
+GRUPOS = [
+    ("INFORMAÇÕES GERAIS", [
+        "id", "cliente_id", "tecnico_id", "status", "prioridade", "canal_origem"
+    ]),
+    ("DATAS", [
+        "data_abertura", "data_agendamento", "horario_previsto", "data_encerramento"
+    ]),
+    ("DETALHES", [
+        "tipo_os", "titulo", "descricao", "equipamentos", "checklist",
+        "endereco_execucao", "tempo_estimado", "materiais",
+        "observacoes_finais"
+    ]),
+    ("ASSINATURAS", [
+        "assinatura_cliente", "assinatura_tecnico"
+    ])
+]
+
+
+class TextMeasure:
+    """Largura de texto e quebra de linhas para uma fonte/tamanho fixos."""
+
+    def __init__(self, font, size):
+        self.font = font
+        self.size = size
+        self._face = pdfmetrics.getFont(font)
+        self._widths = {chr(i): self._face.stringWidth(chr(i), size) for i in range(32, 256)}
+        self.space = self._widths[" "]
+        self.wrap = lru_cache(maxsize=WRAP_CACHE_SIZE)(self._wrap)
+
+    def width(self, text):
+        widths = self._widths
+        total = 0.0
+        for ch in text:
+            w = widths.get(ch)
+            if w is None:
+                w = widths[ch] = self._face.stringWidth(ch, self.size)
+            total += w
+        return total
+
+    def _wrap(self, text, max_width):
+        """Linhas de `text` com largura < max_width (mesma regra do código antigo)."""
+        lines = []
+        words = []
+        current = 0.0
+        for word in text.split():
+            w = self.width(word) + self.space
+            if current + w < max_width or not words:
+                words.append(word)
+                current += w
+            else:
+                lines.append(" ".join(words) + " ")
+                words = [word]
+                current = w
+        lines.append(" ".join(words) + " " if words else "")
+        return tuple(lines)
+
+
+class OSTemplate:
+    """Página da O.S.: definida uma vez, reutilizada em todas as páginas e documentos."""
+
+    HEADER_FORM = "os_header"
+    THUMB_W = 120
+    THUMB_H = 90
+    THUMB_GAP = 12
+
+    def __init__(self, pagesize=A4):
+        self.width, self.height = pagesize
+        self.left = 40
+        self.right = self.width - 40
+        self.top = self.height - 50
+        self.bottom = 50
+        self.value_x = self.left + 120
+        self.max_width = 500
+        self.value_text = TextMeasure("Helvetica", 11)
+        self._layouts = {}
+
+    def layout(self, cols):
+        """Grupos com (rótulo, índice da coluna) já resolvidos para esta ordem de colunas."""
+        key = tuple(cols)
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = [
+                (titulo, [(f"{col.replace('_',' ').title()}:", key.index(col)) for col in campos])
+                for titulo, campos in GRUPOS
+            ]
+            self._layouts[key] = layout
+        return layout
+
+    def begin(self, c, logo=None):
+        """Define o cabeçalho como form XObject neste canvas (uma vez por arquivo)."""
+        if getattr(c, "_os_template", None) is self:
+            return
+        c._os_template = self
+        if isinstance(logo, str) and not os.path.exists(logo):
+            logo = None
+
+        c.beginForm(self.HEADER_FORM)
+        # ----------------------------------------------------
+        #  LOGO NO TOPO DIREITO
+        # ----------------------------------------------------
+        try:
+            if logo is not None:
+                c.drawImage(
+                    logo,
+                    self.width - 150,    # posição X
+                    self.height - 150,   # posição Y
+                    width=110,           # largura
+                    height=90,           # altura
+                    preserveAspectRatio=True,
+                    mask='auto'
+                )
+        except Exception as e:
+            diagnostico.error("Erro ao carregar a logo no PDF", e)
+
+        # --------------------------
+        #  CABEÇALHO
+        # --------------------------
+        c.setFont("Helvetica-Bold", 20)
+        c.drawString(self.left, self.top, "ORDEM DE SERVIÇO")
+        c.line(self.left, self.top - 10, self.right, self.top - 10)
+        c.endForm()
+
+    def draw(self, c, order, cols, photos=None):
+        """Desenha uma O.S. a partir de uma página nova e fecha a última página.
+
+        `photos`: [(tipo, nome, caminho da miniatura)] de anexos.thumbnails_for().
+        """
+        c.doForm(self.HEADER_FORM)
+        y = self.top - 40
+        c.setFont("Helvetica", 12)
+
+        def check_page():
+            nonlocal y
+            if y < self.bottom:
+                c.showPage()
+                c.setFont("Helvetica", 12)
+                y = self.top
+
+        for titulo, campos in self.layout(cols):
+            c.setFont("Helvetica-Bold", 14)
+            c.drawString(self.left, y, titulo)
+            y -= 20
+
+            for rotulo, idx in campos:
+                valor = str(order[idx]) if order[idx] else ""
+
+                check_page()
+
+                c.setFont("Helvetica-Bold", 11)
+                c.drawString(self.left, y, rotulo)
+                c.setFont("Helvetica", 11)
+
+                linhas = self.value_text.wrap(valor, self.max_width)
+                for linha in linhas[:-1]:
+                    c.drawString(self.value_x, y, linha)
+                    y -= 15
+                    check_page()
+
+                c.drawString(self.value_x, y, linhas[-1])
+                y -= 18
+
+            y -= 10
+            c.line(self.left, y, self.right, y)
+            y -= 25
+
+        if photos:
+            y = self.draw_photos(c, photos, y)
+        c.showPage()
+
+    def draw_photos(self, c, photos, y):
+        """Grade de miniaturas (THUMB_W x THUMB_H) com legenda, a partir de `y`."""
+        per_row = max(1, int((self.right - self.left + self.THUMB_GAP) // (self.THUMB_W + self.THUMB_GAP)))
+        row_h = self.THUMB_H + 30
+        c.setFont("Helvetica-Bold", 14)
+        if y - 20 - row_h < self.bottom:
+            c.showPage()
+            y = self.top
+        c.drawString(self.left, y, "FOTOS E ASSINATURAS")
+        y -= 20
+        for i, (tipo, nome, path) in enumerate(photos):
+            col = i % per_row
+            if col == 0:
+                if i:
+                    y -= row_h
+                if y - row_h < self.bottom:
+                    c.showPage()
+                    y = self.top
+            x = self.left + col * (self.THUMB_W + self.THUMB_GAP)
+            try:
+                c.drawImage(path, x, y - self.THUMB_H, width=self.THUMB_W, height=self.THUMB_H,
+                            preserveAspectRatio=True, anchor='sw')
+            except Exception as e:
+                diagnostico.error(f"Erro ao desenhar miniatura {path} no PDF", e)
+            c.setFont("Helvetica", 8)
+            legenda = tipo if tipo != "foto" else (nome or "")
+            c.drawString(x, y - self.THUMB_H - 10, legenda[:30])
+        return y - row_h
+
+
+# (título, chave da parada, largura em pt)
+ROUTE_COLS = (
+    ("#", None, 22), ("O.S.", "oid", 42), ("Hora", "horario", 38), ("Cliente", "cliente", 130),
+    ("Endereço", "endereco", 170), ("Bairro", "bairro", 80), ("km", "km", 33),
+)
+
+
+def _fit(measure, text, width):
+    """Corta `text` para caber em `width` (com reticências)."""
+    if measure.width(text) <= width:
+        return text
+    while text and measure.width(text + "...") > width:
+        text = text[:-1]
+    return text + "..."
+
+
+def draw_route(c, route, template=None):
+    """Folha de rota de um técnico a partir de uma página nova: paradas na ordem de visita."""
+    t = template or default_template()
+    cell = TextMeasure("Helvetica", 9)
+    row_h = 14
+
+    def header(y):
+        c.setFont("Helvetica-Bold", 9)
+        x = t.left
+        for titulo, _key, width in ROUTE_COLS:
+            c.drawString(x, y, titulo)
+            x += width
+        c.line(t.left, y - 4, t.right, y - 4)
+        return y - row_h - 2
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(t.left, t.top, f"ROTA DO DIA {route['dia']}")
+    c.setFont("Helvetica", 11)
+    c.drawString(t.left, t.top - 20, f"Técnico: {route['tecnico']}   O.S.: {len(route['paradas'])}   "
+                                      f"Distância estimada: {route['km']:.1f} km")
+    c.drawString(t.left, t.top - 36, _fit(TextMeasure("Helvetica", 11), "Setores: " + " > ".join(route["setores"]),
+                                          t.right - t.left))
+    y = header(t.top - 62)
+    for n, stop in enumerate(route["paradas"], 1):
+        if y < t.bottom:
+            c.showPage()
+            y = header(t.top)
+        c.setFont("Helvetica", 9)
+        x = t.left
+        for _titulo, key, width in ROUTE_COLS:
+            if key is None:
+                text = str(n)
+            elif key == "km":
+                text = "-" if stop["km"] is None else f"{stop['km']:.1f}"
+            else:
+                text = str(stop.get(key) or "")
+            c.drawString(x, y, _fit(cell, text, width - 4))
+            x += width
+        y -= row_h
+    c.showPage()
+
+
+_default = None
+
+
+def default_template():
+    global _default
+    if _default is None:
+        _default = OSTemplate()
+    return _default
+
+
+# ---------------------------------------------------------
+# Benchmark: tempo por documento com campos longos
+# ---------------------------------------------------------
+def _benchmark(docs=50, words=3000):
+    import tempfile
+    from pdf_os import render_os_pdf
+
+    cols = ("id", "cliente_id", "tipo_os", "data_abertura", "data_agendamento", "horario_previsto",
+            "endereco_execucao", "titulo", "descricao", "tecnico_id", "prioridade", "canal_origem",
+            "equipamentos", "status", "checklist", "tempo_estimado", "materiais", "fotos",
+            "assinatura_cliente", "assinatura_tecnico", "observacoes_finais", "data_encerramento")
+    texto = " ".join(f"palavra{i % 97}" for i in range(words))
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        for i in range(docs):
+            order = [i, 1, "Manutenção", "2025-01-01 08:00:00", "", "", "Rua X, 10", "Título",
+                     f"{i} {texto}", 2, "Alta", "Telefone", texto, "Aberta", texto, "2h", texto,
+                     "", "", "", texto, None]
+            render_os_pdf(os.path.join(tmp, f"{i}.pdf"), order, cols)
+        elapsed = time.perf_counter() - start
+    print(f"{docs} documentos, {words} palavras por campo longo: {elapsed / docs * 1000:.1f} ms/documento")
+
+    # quebra de linha isolada: regra antiga (stringWidth da linha inteira a cada palavra) x TextMeasure
+    start = time.perf_counter()
+    linha = ""
+    for palavra in texto.split():
+        if pdfmetrics.stringWidth(linha + palavra + " ", "Helvetica", 11) < 500:
+            linha += palavra + " "
+        else:
+            linha = palavra + " "
+    antigo = time.perf_counter() - start
+    start = time.perf_counter()
+    TextMeasure("Helvetica", 11)._wrap(texto, 500)
+    novo = time.perf_counter() - start
+    print(f"quebra de {words} palavras: antiga {antigo * 1000:.2f} ms, nova {novo * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    _benchmark()
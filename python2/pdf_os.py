@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Geração do PDF da Ordem de Serviço (individual e em lote)
+
+render_os_pdf() gera uma O.S.; render_batch() gera muitas de uma vez (um PDF
+por O.S. ou um único PDF com todas), distribuindo o trabalho em um
+ProcessPoolExecutor. O desenho em si fica em pdf_layout.py. A logo é lida uma vez no processo principal e cada
+processo de trabalho a decodifica uma única vez no initializer. Em vez da foto
+original, os PDFs recebem a variante JPEG compacta do cache de imagens
+(cache_imagens.pdf_logo). As miniaturas dos anexos (anexos.thumbnails_for)
+entram no final de cada O.S. Com `routes` (rotas.plan_day), as folhas de
+rota dos técnicos vão no início do PDF único ou em ROTAS.pdf na pasta.
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+
+import diagnostico
+from cache_imagens import pdf_logo
+from datas import day_range
+from db import get_pool
+from executor import Cancelled
+from pdf_layout import default_template, draw_route
+
+# pypdf é opcional: sem ele o PDF único é gerado em um só processo
+try:
+    from pypdf import PdfWriter
+except Exception:
+    PdfWriter = None
+
+# O.S. por tarefa enviada ao pool de processos
+CHUNK_SIZE = 25
+ROUTES_FILE = "ROTAS.pdf"
+# abaixo disso não compensa subir processos
+INLINE_LIMIT = 20
+
+
+def draw_os(c, order, cols, logo=None, template=None, photos=None):
+    """Desenha uma O.S. (`order`, na ordem de `cols`) no canvas, a partir de uma página nova.
+
+    `logo` pode ser um caminho de arquivo ou um ImageReader já decodificado;
+    só é usado na primeira O.S. de cada canvas (o cabeçalho vira um form XObject).
+    `photos`: miniaturas dos anexos desta O.S. (anexos.thumbnails_for).
+    """
+    template = template or default_template()
+    template.begin(c, logo)
+    template.draw(c, order, cols, photos)
+
+
+def render_os_pdf(path, order, cols, logo=None, photos=None):
+    """Gera o PDF de uma O.S. em `path`. Não usa o Tk."""
+    if isinstance(logo, str):
+        logo = pdf_logo(logo)
+    c = canvas.Canvas(path, pagesize=A4)
+    draw_os(c, order, cols, logo, photos=photos)
+    c.save()
+
+
+# ---------------------------------------------------------
+# Lote
+# ---------------------------------------------------------
+def file_name(order_id):
+    return f"OS_{int(order_id):06d}.pdf"
+
+
+def fetch_orders(ids=None, scheduled_on=None):
+    """O.S. do lote, em ordem de id: por lista de ids ou por dia de agendamento (YYYY-MM-DD)."""
+    pool = get_pool()
+    cols = pool.columns("orders")
+    if ids is not None:
+        ids = sorted({int(i) for i in ids})
+        rows = []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            marks = ",".join("?" * len(part))
+            rows += pool.fetch_all(f"SELECT * FROM orders WHERE id IN ({marks}) ORDER BY id", part)
+        return rows, cols
+    start, end = day_range(scheduled_on, scheduled_on)
+    rows = pool.fetch_all(
+        "SELECT * FROM orders WHERE agendamento_ts >= ? AND agendamento_ts < ? ORDER BY id",
+        (start, end))
+    return rows, cols
+
+
+def read_logo(path):
+    path = pdf_logo(path)
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return None
+
+
+def logo_reader(data):
+    return ImageReader(io.BytesIO(data)) if data else None
+
+
+_worker_logo = None
+
+
+def _init_worker(logo_bytes, log_path=None):
+    global _worker_logo
+    _worker_logo = logo_reader(logo_bytes)
+    if log_path:
+        # erros dos workers (diagnostico.error) no mesmo log da tela
+        diagnostico.enable(log_path)
+
+
+def render_routes_pdf(path, routes):
+    """Folhas de rota (uma ou mais páginas por técnico) em `path`."""
+    c = canvas.Canvas(path, pagesize=A4)
+    for route in routes:
+        draw_route(c, route)
+    c.save()
+
+
+def _render_chunk(orders, cols, out_dir=None, merged_path=None, logo=None, photos=None, routes=None):
+    """Uma O.S. por arquivo em `out_dir`, ou todas em `merged_path` (depois das folhas de rota)."""
+    logo = logo if logo is not None else _worker_logo
+    photos = photos or {}
+    if merged_path:
+        c = canvas.Canvas(merged_path, pagesize=A4)
+        for route in routes or ():
+            draw_route(c, route)
+        for order in orders:
+            draw_os(c, order, cols, logo, photos=photos.get(order[0]))
+        c.save()
+        return len(orders)
+    for order in orders:
+        render_os_pdf(os.path.join(out_dir, file_name(order[0])), order, cols, logo, photos.get(order[0]))
+    return len(orders)
+
+
+def render_batch(token, orders, cols, out, logo_path=None, merged=False, workers=None, chunk_size=CHUNK_SIZE,
+                 photos=None, routes=None):
+    """Gera os PDFs do lote. `out` é um diretório, ou o arquivo final se merged=True.
+
+    `photos`: {order_id: miniaturas} de anexos.thumbnails_for(). `routes`:
+    rotas de rotas.plan_day() (as O.S. já devem vir na ordem das rotas).
+    Retorna o número de O.S. geradas. Feito para rodar no BackgroundExecutor.
+    """
+    photos = photos or {}
+    total = len(orders)
+    if not total:
+        return 0
+    logo_bytes = read_logo(logo_path)
+    chunks = [orders[i:i + chunk_size] for i in range(0, total, chunk_size)]
+    if not merged:
+        os.makedirs(out, exist_ok=True)
+        if routes:
+            render_routes_pdf(os.path.join(out, ROUTES_FILE), routes)
+
+    # PDF único sem pypdf (não há como juntar partes) ou lote pequeno: neste processo
+    if (merged and PdfWriter is None) or total <= INLINE_LIMIT or workers == 1:
+        logo = logo_reader(logo_bytes)
+        if merged:
+            token.check()
+            _render_chunk(orders, cols, merged_path=out, logo=logo, photos=photos, routes=routes)
+            return total
+        done = 0
+        for chunk in chunks:
+            token.check()
+            done += _render_chunk(chunk, cols, out_dir=out, logo=logo, photos=photos)
+            token.report(f"{done}/{total} PDFs")
+        return total
+
+    parts = [f"{out}.part{i:04d}" for i in range(len(chunks))] if merged else None
+    routes_part = f"{out}.rotas" if merged and routes else None
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    done = 0
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(logo_bytes, diagnostico.TRACER.log_path))
+    try:
+        futures = [
+            pool.submit(_render_chunk, chunk, cols, None if merged else out, parts[i] if merged else None,
+                        photos={o[0]: photos[o[0]] for o in chunk if o[0] in photos})
+            for i, chunk in enumerate(chunks)
+        ]
+        for future in as_completed(futures):
+            if token.cancelled:
+                raise Cancelled()
+            done += future.result()
+            token.report(f"{done}/{total} PDFs")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if merged and (token.cancelled or done < total):
+            _remove(parts)
+
+    if merged:
+        if routes_part:
+            render_routes_pdf(routes_part, routes)
+            parts.insert(0, routes_part)
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(part)
+        with open(out, 'wb') as f:
+            writer.write(f)
+        _remove(parts)
+    return total
+
+
+def _remove(paths):
+    for p in paths:
+        if os.path.exists(p):
+            os.remove(p)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Relatórios a partir de totais mantidos por triggers
+
+As tabelas report_status_counts e report_tech_stats (migração 5) são
+atualizadas por triggers de INSERT/UPDATE/DELETE em orders, então os
+relatórios leem uma linha por grupo em vez de refazer GROUP BY sobre todas
+as O.S. rebuild_aggregates() recalcula tudo do zero,
+caso os totais fiquem fora de sincronia (ex.: edição manual do banco).
+Os totais cobrem também as O.S. do arquivo morto (arquivo.py).
+
+    python reports.py --rebuild
+"""
+
+import argparse
+
+import db
+
+# status NULL é guardado como '' (chave primária não aceita NULL em UPSERT)
+OS_BY_STATUS_SQL = """
+    SELECT NULLIF(status, ''), total FROM report_status_counts
+    WHERE total > 0
+    ORDER BY status
+"""
+
+PERFORMANCE_BY_TECH_SQL = """
+    SELECT t.id, t.nome,
+      IFNULL(s.concluidas, 0) as total_os,
+      s.horas_soma / NULLIF(s.horas_qtd, 0) as horas_medias
+    FROM technicians t
+    LEFT JOIN report_tech_stats s ON s.tecnico_id = t.id
+    ORDER BY total_os DESC
+"""
+
+# duração (horas) de uma O.S. pelas colunas epoch (datas.py); NULL se alguma
+# data não puder ser interpretada
+DURATION_SQL = "({o}.encerramento_ts - {o}.abertura_ts) / 3600.0"
+
+# nome do banco do arquivo morto quando anexado (arquivo.py)
+ARCHIVE_SCHEMA = "arquivo"
+
+# relatórios de um período: faixa no índice das colunas epoch
+OS_BY_STATUS_RANGE_SQL = """
+    SELECT status, COUNT(*) FROM orders
+    WHERE abertura_ts >= ? AND abertura_ts < ?
+    GROUP BY status ORDER BY status
+"""
+
+PERFORMANCE_BY_TECH_RANGE_SQL = """
+    SELECT t.id, t.nome, COUNT(*) as total_os,
+      AVG((o.encerramento_ts - o.abertura_ts) / 3600.0) as horas_medias
+    FROM orders o JOIN technicians t ON t.id = o.tecnico_id
+    WHERE o.encerramento_ts >= ? AND o.encerramento_ts < ?
+    GROUP BY t.id
+    ORDER BY total_os DESC
+"""
+
+
+def _orders_source(conn):
+    """orders, ou orders + O.S. do arquivo morto quando ele está anexado em `conn`."""
+    if not conn.execute(f"SELECT 1 FROM pragma_database_list WHERE name = '{ARCHIVE_SCHEMA}'").fetchone():
+        return "orders"
+    if not conn.execute(f"SELECT 1 FROM {ARCHIVE_SCHEMA}.sqlite_master WHERE name = 'orders'").fetchone():
+        return "orders"
+    cols = "id, status, tecnico_id, data_abertura, data_encerramento, abertura_ts, encerramento_ts"
+    return (f"(SELECT {cols} FROM main.orders UNION ALL SELECT {cols} FROM {ARCHIVE_SCHEMA}.orders "
+            f"WHERE id NOT IN (SELECT id FROM main.orders))")
+
+
+def rebuild_aggregates(conn, duration=DURATION_SQL):
+    """Recalcula os totais dos relatórios a partir da tabela orders (e do arquivo morto)."""
+    source = _orders_source(conn)
+    conn.execute("DELETE FROM report_status_counts")
+    conn.execute(f"""
+        INSERT INTO report_status_counts (status, total)
+        SELECT IFNULL(status, ''), COUNT(*) FROM {source} AS orders GROUP BY IFNULL(status, '')
+    """)
+    conn.execute("DELETE FROM report_tech_stats")
+    conn.execute(f"""
+        INSERT INTO report_tech_stats (tecnico_id, concluidas, horas_qtd, horas_soma)
+        SELECT tecnico_id, COUNT(*), COUNT({duration.format(o='orders')}),
+               IFNULL(SUM({duration.format(o='orders')}), 0)
+        FROM {source} AS orders
+        WHERE tecnico_id IS NOT NULL AND data_encerramento IS NOT NULL
+        GROUP BY tecnico_id
+    """)
+
+
+def rebuild(token=None):
+    """Recalcula os totais no escritor do pool (aceita o CancelToken do executor)."""
+    import arquivo  # aqui dentro: arquivo importa este módulo
+    pool = db.get_pool()
+    arquivo.attach(pool)
+    with pool.writer() as conn:
+        rebuild_aggregates(conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Totais dos relatórios")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--rebuild", action="store_true", help="recalcula os totais do zero")
+    args = parser.parse_args(argv)
+    import migrations  # aqui dentro: migrations importa este módulo
+    db.DB_FILE = args.db
+    try:
+        pool = db.get_pool()
+        migrations.migrate(pool)
+        if args.rebuild:
+            rebuild()
+        for status, total in pool.fetch_all(OS_BY_STATUS_SQL):
+            print(f"{status}: {total}")
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
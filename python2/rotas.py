@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Planejamento das rotas do dia por técnico (offline, por CEP/bairro)
+
+As coordenadas vêm da tabela cep_coords (migração 10), carregada de um CSV
+com cabeçalho (cep, lat, lon e, opcionalmente, bairro e cidade; separador
+"," ou ";"). O CEP pode ser completo ou só um prefixo (ex.: 5 dígitos, o
+setor dos Correios):
+
+    python rotas.py --carregar-ceps ceps.csv
+    python rotas.py --dia 2025-06-02 [--tecnico 3]
+
+Para cada técnico, as O.S. em aberto agendadas no dia são localizadas pelo
+CEP do cliente (prefixo mais longo encontrado) ou, sem CEP conhecido, pelo
+centro do bairro. A ordem de visita sai de vizinho mais próximo + 2-opt
+sobre distâncias planas (projeção equiretangular, boa em escala de cidade).
+O.S. sem coordenada entram logo depois das do mesmo setor (prefixo do CEP
+ou bairro), ou no final. Os horários agendados não restringem a ordem: a
+rota é uma sugestão de sequência, impressa junto com os PDFs do lote.
+"""
+
+import argparse
+import csv
+import math
+import sys
+import time
+
+import db
+from agenda import CLOSED_STATUS, fmt_hour, make_slot
+from datas import day_range
+from texto import digits as cep_digits, fold
+
+EARTH_KM = 6371.0
+SETOR_DIGITS = 5
+MIN_PREFIX = 3
+# passadas completas do 2-opt sem melhora antes de parar (limite de segurança)
+TWO_OPT_PASSES = 50
+
+_ROUTE_SQL = ("SELECT o.id, o.tecnico_id, t.nome, o.agendamento_ts, o.horario_previsto, c.nome, "
+              "o.endereco_execucao, c.cep, c.bairro, c.cidade "
+              "FROM orders o JOIN clients c ON o.cliente_id = c.id LEFT JOIN technicians t ON o.tecnico_id = t.id "
+              "WHERE o.agendamento_ts >= ? AND o.agendamento_ts < ? AND o.tecnico_id IS NOT NULL "
+              "AND o.status NOT IN (?, ?)")
+
+
+def _number(text):
+    return float(str(text).strip().replace(",", "."))
+
+
+# ---------------------------------------------------------
+# Tabela de CEPs
+# ---------------------------------------------------------
+def load_ceps(path):
+    """Carrega (substitui) as coordenadas do CSV em cep_coords. Retorna (gravados, rejeitados)."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=";" if sample.count(";") > sample.count(",") else ",")
+        names = {fold(n): n for n in reader.fieldnames or ()}
+        col = {key: next((names[a] for a in aliases if a in names), None) for key, aliases in (
+            ("cep", ("cep",)), ("lat", ("lat", "latitude")), ("lon", ("lon", "lng", "longitude")),
+            ("bairro", ("bairro",)), ("cidade", ("cidade", "municipio")))}
+        if not (col["cep"] and col["lat"] and col["lon"]):
+            raise ValueError("O arquivo precisa das colunas cep, lat e lon")
+        rows, rejected = [], 0
+        for rec in reader:
+            cep = cep_digits(rec.get(col["cep"]))
+            try:
+                lat, lon = _number(rec[col["lat"]]), _number(rec[col["lon"]])
+            except (TypeError, ValueError):
+                rejected += 1
+                continue
+            if len(cep) < MIN_PREFIX or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                rejected += 1
+                continue
+            rows.append((cep, lat, lon, (rec.get(col["bairro"]) or "").strip() if col["bairro"] else None,
+                         (rec.get(col["cidade"]) or "").strip() if col["cidade"] else None))
+    with db.get_pool().writer() as conn:
+        conn.execute("DELETE FROM cep_coords")
+        conn.executemany("INSERT OR REPLACE INTO cep_coords (cep, lat, lon, bairro, cidade) VALUES (?,?,?,?,?)", rows)
+    return len(rows), rejected
+
+
+class CepIndex:
+    """CEP/prefixo -> coordenada e centro de cada bairro, em memória."""
+
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = db.get_pool().fetch_all("SELECT cep, lat, lon, bairro, cidade FROM cep_coords")
+        self.by_cep = {}
+        sums = {}
+        for cep, lat, lon, bairro, cidade in rows:
+            self.by_cep[cep] = (lat, lon)
+            if bairro:
+                for key in ((fold(cidade), fold(bairro)), ("", fold(bairro))):
+                    acc = sums.setdefault(key, [0.0, 0.0, 0])
+                    acc[0] += lat
+                    acc[1] += lon
+                    acc[2] += 1
+        self.by_bairro = {key: (la / n, lo / n) for key, (la, lo, n) in sums.items()}
+
+    def __len__(self):
+        return len(self.by_cep)
+
+    def locate(self, cep=None, bairro=None, cidade=None):
+        """(lat, lon) pelo prefixo de CEP mais longo conhecido, senão pelo bairro; None se nada bater."""
+        digits = cep_digits(cep)[:8]
+        for n in range(len(digits), MIN_PREFIX - 1, -1):
+            point = self.by_cep.get(digits[:n])
+            if point:
+                return point
+        if bairro:
+            return self.by_bairro.get((fold(cidade), fold(bairro))) or self.by_bairro.get(("", fold(bairro)))
+        return None
+
+
+# ---------------------------------------------------------
+# Ordem de visita
+# ---------------------------------------------------------
+def project(points):
+    """(x, y) em km, projeção equiretangular em torno da latitude média."""
+    if not points:
+        return []
+    cos0 = math.cos(math.radians(sum(p[0] for p in points) / len(points)))
+    k = math.pi / 180 * EARTH_KM
+    return [(lon * k * cos0, lat * k) for lat, lon in points]
+
+
+def path_length(xy, order):
+    return sum(math.dist(xy[a], xy[b]) for a, b in zip(order, order[1:]))
+
+
+def nearest_neighbor(xy, start=0):
+    left = set(range(len(xy)))
+    left.discard(start)
+    order = [start]
+    while left:
+        here = xy[order[-1]]
+        nxt = min(left, key=lambda i: math.dist(here, xy[i]))
+        left.remove(nxt)
+        order.append(nxt)
+    return order
+
+
+def two_opt(xy, order):
+    """Melhora um caminho aberto (o primeiro ponto fica fixo) invertendo trechos enquanto encurtar."""
+    order = list(order)
+    n = len(order)
+    d = math.dist
+    for _ in range(TWO_OPT_PASSES):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = xy[order[i - 1]], xy[order[i]]
+            for j in range(i + 1, n):
+                c = xy[order[j]]
+                # caminho aberto: depois do último ponto não há aresta
+                after = d(b, xy[order[j + 1]]) - d(c, xy[order[j + 1]]) if j + 1 < n else 0.0
+                if d(a, c) + after < d(a, b) - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    b = xy[order[i]]
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def route_order(points, depot=None):
+    """Índices de `points` [(lat, lon)] na ordem de visita. Com `depot`, a rota sai dele."""
+    if len(points) < 2:
+        return list(range(len(points)))
+    all_points = ([depot] if depot else []) + list(points)
+    xy = project(all_points)
+    if depot:
+        order = two_opt(xy, nearest_neighbor(xy, 0))[1:]
+        return [i - 1 for i in order]
+    # sem ponto de partida: começa pela ponta (o ponto mais distante do centro)
+    cx, cy = sum(p[0] for p in xy) / len(xy), sum(p[1] for p in xy) / len(xy)
+    start = max(range(len(xy)), key=lambda i: math.dist(xy[i], (cx, cy)))
+    return two_opt(xy, nearest_neighbor(xy, start))
+
+
+# ---------------------------------------------------------
+# Planejamento
+# ---------------------------------------------------------
+def _setor(cep, bairro):
+    digits = cep_digits(cep)
+    if len(digits) >= SETOR_DIGITS:
+        return digits[:SETOR_DIGITS]
+    return (bairro or "").strip().title() or "?"
+
+
+def build_route(stops, index, depot=None):
+    """Ordena as paradas de um técnico; devolve (paradas na ordem, km total)."""
+    located, loose = [], []
+    for stop in stops:
+        stop["ponto"] = index.locate(stop["cep"], stop["bairro"], stop["cidade"])
+        (located if stop["ponto"] else loose).append(stop)
+    ordered = [located[i] for i in route_order([s["ponto"] for s in located], depot)]
+    xy = project([depot] + [s["ponto"] for s in ordered] if depot else [s["ponto"] for s in ordered])
+    offset = 1 if depot else 0
+    total = 0.0
+    for i, stop in enumerate(ordered):
+        stop["km"] = round(math.dist(xy[i + offset - 1], xy[i + offset]), 2) if i + offset else 0.0
+        total += stop["km"]
+    # sem coordenada: logo depois da última parada do mesmo setor
+    for stop in sorted(loose, key=lambda s: s["oid"]):
+        stop["km"] = None
+        pos = max((i for i, s in enumerate(ordered) if s["setor"] == stop["setor"]), default=len(ordered) - 1)
+        ordered.insert(pos + 1, stop)
+    return ordered, round(total, 2)
+
+
+def plan_day(dia, tecnico_id=None, depot=None, index=None):
+    """Rotas do dia (YYYY-MM-DD), uma por técnico com O.S. agendadas.
+
+    Retorna [{"tecnico_id", "tecnico", "dia", "paradas": [...], "km", "setores"}],
+    ordenado pelo nome do técnico. Cada parada: oid, horario, cliente,
+    endereco, bairro, cep, setor, ponto (lat, lon) ou None, km desde a anterior.
+    """
+    start, end = day_range(dia, dia)
+    sql, params = _ROUTE_SQL, [start, end, *CLOSED_STATUS]
+    if tecnico_id is not None:
+        sql += " AND o.tecnico_id = ?"
+        params.append(int(tecnico_id))
+    index = index if index is not None else CepIndex()
+    by_tech = {}
+    for oid, tid, tnome, ts, horario, cliente, endereco, cep, bairro, cidade in db.get_pool().fetch_all(
+            sql + " ORDER BY o.id", params):
+        by_tech.setdefault((tid, tnome), []).append({
+            "oid": oid, "horario": fmt_hour(make_slot(ts, horario)[0]), "cliente": cliente or "",
+            "endereco": endereco or "", "bairro": bairro or "", "cidade": cidade or "", "cep": cep or "",
+            "setor": _setor(cep, bairro)})
+    routes = []
+    for (tid, tnome), stops in by_tech.items():
+        ordered, km = build_route(stops, index, depot)
+        setores = list(dict.fromkeys(s["setor"] for s in ordered))
+        routes.append({"tecnico_id": tid, "tecnico": tnome or f"Técnico {tid}", "dia": dia,
+                       "paradas": ordered, "km": km, "setores": setores})
+    routes.sort(key=lambda r: (fold(r["tecnico"]), r["tecnico_id"]))
+    return routes
+
+
+def route_order_ids(routes):
+    """Ids das O.S. na ordem das rotas (para ordenar o lote de PDFs)."""
+    return [stop["oid"] for route in routes for stop in route["paradas"]]
+
+
+def sort_by_route(rows, routes):
+    """Linhas de O.S. (id na 1ª coluna) na ordem das rotas; as fora delas vão no final, por id."""
+    rank = {oid: i for i, oid in enumerate(route_order_ids(routes))}
+    return sorted(rows, key=lambda r: (rank.get(r[0], len(rank)), r[0]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rotas do dia por técnico (CEP/bairro)")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--carregar-ceps", metavar="CSV", help="carrega a tabela de coordenadas por CEP")
+    parser.add_argument("--dia", help="planeja as rotas do dia (YYYY-MM-DD)")
+    parser.add_argument("--tecnico", type=int, help="só este técnico")
+    args = parser.parse_args(argv)
+    import migrations
+    db.DB_FILE = args.db
+    try:
+        migrations.migrate(db.get_pool())
+        if args.carregar_ceps:
+            ok, bad = load_ceps(args.carregar_ceps)
+            print(f"{ok} CEPs carregados, {bad} linhas rejeitadas")
+        if args.dia:
+            start = time.perf_counter()
+            routes = plan_day(args.dia, args.tecnico)
+            elapsed = time.perf_counter() - start
+            for route in routes:
+                print(f"{route['tecnico']}: {len(route['paradas'])} O.S., {route['km']:.1f} km, "
+                      f"setores {' > '.join(route['setores'])}")
+                for n, stop in enumerate(route["paradas"], 1):
+                    km = "sem coordenada" if stop["km"] is None else f"{stop['km']:.1f} km"
+                    print(f"  {n:2d}. O.S. {stop['oid']} {stop['horario']} {stop['cliente']} - "
+                          f"{stop['bairro']} ({km})")
+            print(f"{len(routes)} rotas planejadas em {elapsed:.2f}s")
+    finally:
+        db.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
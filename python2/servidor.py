@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API HTTP/JSON local sobre o gestao.db (para celulares e tablets da rede)
+
+    GET  /clientes                 ?limite=50&antes=<id>
+    GET  /clientes/<id>
+    GET  /os                       ?status=&de=AAAA-MM-DD&ate=AAAA-MM-DD&tecnico=&limite=&antes=
+    GET  /os/<id>
+    GET  /os/<id>/historico
+    POST /os/<id>/status           {"status": "...", "responsavel": "...", "detalhes": "...", "versao": n}
+
+- ThreadingHTTPServer: uma thread por conexão (HTTP/1.1 keep-alive). As
+  leituras usam os leitores do pool (db.py, WAL) e rodam em paralelo; as
+  escritas passam pelo escritor único do pool, serializadas pelo lock dele.
+- Listagens paginadas por chave (virtual_tree.KeysetPager): a resposta traz
+  {"itens": [...], "proximo": <id>|null}; a próxima página é ?antes=<proximo>.
+- Cada GET leva um ETag derivado do change_log e do histórico. Com
+  If-None-Match igual ao atual a resposta é 304, sem executar a consulta.
+- Com "versao" (a lida em GET /os/<id>), a mudança de status só é gravada se
+  ninguém alterou a O.S. depois; senão a resposta é 409 com o status e a
+  versão atuais (ordens.ConflitoVersao).
+- Com --token, toda requisição precisa de "Authorization: Bearer <token>".
+
+    python servidor.py --porta 8080
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+import ordens
+from diagnostico import TRACER
+from export import order_filters
+from virtual_tree import KeysetPager
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+MAX_BODY_BYTES = 64 * 1024
+
+CLIENT_COLS = "id, nome, tipo_pessoa, documento, cidade, estado, telefone_principal, email, status"
+ORDER_COLS = ("o.id, o.cliente_id, c.nome AS cliente, o.tecnico_id, t.nome AS tecnico, o.tipo_os, o.titulo, "
+              "o.prioridade, o.status, o.data_abertura, o.data_agendamento, o.data_encerramento, o.versao")
+ORDERS_SQL = (f"SELECT {ORDER_COLS} FROM orders o LEFT JOIN clients c ON o.cliente_id = c.id "
+              f"LEFT JOIN technicians t ON o.tecnico_id = t.id")
+# versão dos dados: muda a cada escrita em clientes/técnicos/O.S. (change_log, inclusive as cargas
+# em massa sem triggers, change_tracker.log_bulk_load) ou no histórico
+VERSION_SQL = "SELECT (SELECT IFNULL(MAX(seq), 0) FROM change_log), (SELECT IFNULL(MAX(id), 0) FROM history)"
+
+
+class ApiError(Exception):
+    def __init__(self, http_status, message, **extra):
+        super().__init__(message)
+        self.status = http_status
+        self.extra = extra
+
+
+def _rows(conn, sql, params=()):
+    cur = conn.execute(sql, params)
+    names = [d[0] for d in cur.description]
+    return [dict(zip(names, r)) for r in cur.fetchall()]
+
+
+def _int_param(query, name, default=None, maximum=None):
+    value = query.get(name, [None])[0]
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Parâmetro '{name}' deve ser inteiro") from None
+    if value < 1:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Parâmetro '{name}' deve ser positivo")
+    return min(value, maximum) if maximum else value
+
+
+def _col_names(cols):
+    """Nomes das colunas: "o.id, c.nome AS cliente" -> ["id", "cliente"]."""
+    return [c.split(" AS ")[-1].split(".")[-1].strip() for c in cols.split(",")]
+
+
+def _page(select, cols, key, query, filters=()):
+    """Uma página ordenada por `key` (decrescente) e o cursor da próxima."""
+    limit = _int_param(query, "limite", PAGE_LIMIT, MAX_PAGE_LIMIT)
+    before = _int_param(query, "antes")
+    pager = KeysetPager(select, key=key, page_size=limit + 1)   # +1: sabe se há próxima página
+    pager.set_filters(filters)
+    rows = pager.older(before) if before else pager.first()
+    names = _col_names(cols)
+    items = [dict(zip(names, r)) for r in rows[:limit]]
+    return {"itens": items, "proximo": items[-1]["id"] if len(rows) > limit else None}
+
+
+# ---------------------------------------------------------
+# Rotas
+# ---------------------------------------------------------
+def list_clients(query):
+    return _page(f"SELECT {CLIENT_COLS} FROM clients", CLIENT_COLS, "id", query)
+
+
+def get_client(cid):
+    with db.get_pool().reader() as conn:
+        rows = _rows(conn, f"SELECT {CLIENT_COLS} FROM clients WHERE id = ?", (cid,))
+    if not rows:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Cliente {cid} não encontrado")
+    return rows[0]
+
+
+def list_orders(query):
+    status = query.get("status", [None])[0]
+    if status and status not in ordens.STATUS:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Status inválido: {status}")
+    try:
+        clauses, params = order_filters(status, query.get("de", [None])[0], query.get("ate", [None])[0],
+                                        _int_param(query, "tecnico"), alias="o.")
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Datas no formato AAAA-MM-DD") from None
+    filters = [(" AND ".join(clauses), params)] if clauses else []
+    return _page(ORDERS_SQL, ORDER_COLS, "o.id", query, filters)
+
+
+def get_order(oid):
+    with db.get_pool().reader() as conn:
+        rows = _rows(conn, f"{ORDERS_SQL} WHERE o.id = ?", (oid,))
+    if not rows:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"O.S. {oid} não encontrada")
+    return rows[0]
+
+
+def order_history(oid):
+    with db.get_pool().reader() as conn:
+        if conn.execute("SELECT 1 FROM orders WHERE id = ?", (oid,)).fetchone() is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"O.S. {oid} não encontrada")
+        items = _rows(conn, "SELECT id, timestamp, evento, responsavel, detalhes FROM history "
+                            "WHERE order_id = ? ORDER BY id", (oid,))
+    return {"itens": items}
+
+
+def set_order_status(oid, body):
+    novo = body.get("status")
+    if novo not in ordens.STATUS:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Status inválido: {novo}")
+    versao = body.get("versao")
+    if versao is not None and (not isinstance(versao, int) or isinstance(versao, bool)):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Campo 'versao' deve ser inteiro")
+    try:
+        found = ordens.update_status(oid, novo, str(body.get("responsavel") or "API"),
+                                     str(body.get("detalhes") or ""), versao=versao)
+    except ordens.ConflitoVersao as e:
+        raise ApiError(HTTPStatus.CONFLICT, str(e), status=e.status, versao=e.versao) from None
+    if found is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"O.S. {oid} não encontrada")
+    return get_order(oid)
+
+
+GET_ROUTES = (
+    (re.compile(r"^/clientes$"), list_clients),
+    (re.compile(r"^/clientes/(\d+)$"), lambda q, cid: get_client(int(cid))),
+    (re.compile(r"^/os$"), list_orders),
+    (re.compile(r"^/os/(\d+)$"), lambda q, oid: get_order(int(oid))),
+    (re.compile(r"^/os/(\d+)/historico$"), lambda q, oid: order_history(int(oid))),
+)
+POST_ROUTES = (
+    (re.compile(r"^/os/(\d+)/status$"), lambda body, oid: set_order_status(int(oid), body)),
+)
+
+
+def _match(routes, path):
+    for pattern, handler in routes:
+        m = pattern.match(path)
+        if m:
+            return handler, m.groups()
+    return None, ()
+
+
+def data_version():
+    return db.get_pool().fetch_one(VERSION_SQL)
+
+
+def etag_for(target, version=None):
+    """ETag fraco: versão dos dados + a URL pedida (caminho e filtros)."""
+    seq, hist = version or data_version()
+    return f'W/"{seq}.{hist}.{hashlib.sha1(target.encode("utf-8")).hexdigest()[:8]}"'
+
+
+# ---------------------------------------------------------
+# Servidor
+# ---------------------------------------------------------
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "GestaoOS/1.0"
+    # cabeçalho e corpo saem em dois write(); com Nagle, keep-alive espera ~40 ms pelo ACK
+    disable_nagle_algorithm = True
+    token = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload=None, headers=()):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _authorized(self):
+        if not self.token:
+            return True
+        if self.headers.get("Authorization", "") == f"Bearer {self.token}":
+            return True
+        self._send(HTTPStatus.UNAUTHORIZED, {"erro": "Token inválido"}, [("WWW-Authenticate", "Bearer")])
+        return False
+
+    def _dispatch(self, routes, *args):
+        url = urlsplit(self.path)
+        handler, groups = _match(routes, url.path.rstrip("/") or "/")
+        if handler is None:
+            other = POST_ROUTES if routes is GET_ROUTES else GET_ROUTES
+            if _match(other, url.path.rstrip("/"))[0] is not None:
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, "Método não permitido")
+            raise ApiError(HTTPStatus.NOT_FOUND, "Recurso não encontrado")
+        return handler(*args, *groups) if args else handler(parse_qs(url.query), *groups)
+
+    def _handle(self, fn):
+        try:
+            if self._authorized():
+                fn()
+        except ApiError as e:
+            self._send(e.status, {"erro": str(e), **e.extra})
+        except sqlite3.Error as e:
+            TRACER.error(f"API {self.command} {self.path}", e)
+            self._send(HTTPStatus.SERVICE_UNAVAILABLE, {"erro": "Banco de dados indisponível"},
+                       [("Retry-After", "1")])
+        except Exception as e:
+            TRACER.error(f"API {self.command} {self.path}", e)
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": "Erro interno"})
+
+    def do_GET(self):
+        def get():
+            version = data_version()
+            tag = etag_for(self.path, version)
+            if tag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                self._send(HTTPStatus.NOT_MODIFIED, headers=[("ETag", tag)])
+                return
+            payload = self._dispatch(GET_ROUTES)
+            # escrita entre a leitura da versão e a consulta: não promete cache
+            headers = [("Cache-Control", "no-cache")]
+            if data_version() == version:
+                headers.append(("ETag", tag))
+            self._send(HTTPStatus.OK, payload, headers)
+        self._handle(get)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        def post():
+            raw = (self.headers.get("Content-Length") or "0").strip()
+            if not (raw.isascii() and raw.isdigit()):
+                # corpo de tamanho desconhecido: não dá para achar o início da próxima requisição
+                self.close_connection = True
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length inválido")
+            length = int(raw)
+            if length > MAX_BODY_BYTES:
+                raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo muito grande")
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "JSON inválido") from None
+            if not isinstance(body, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Esperado um objeto JSON")
+            self._send(HTTPStatus.OK, self._dispatch(POST_ROUTES, body))
+        self._handle(post)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+    """Servidor pronto para serve_forever() (porta 0 escolhe uma livre)."""
+    handler = type("Handler", (ApiHandler,), {"token": token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP/JSON das O.S.")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--host", default=DEFAULT_HOST, help="0.0.0.0 para aceitar conexões da rede")
+    parser.add_argument("--porta", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", help="exige Authorization: Bearer <token>")
+    args = parser.parse_args(argv)
+    import migrations
+    db.DB_FILE = args.db
+    migrations.migrate(db.get_pool())
+    server = make_server(args.host, args.porta, args.token)
+    print(f"API em http://{server.server_address[0]}:{server.server_address[1]}/ (Ctrl+C para parar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
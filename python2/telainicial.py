@@ -1,85 +1,170 @@
 import tkinter as tk
-from PIL import Image, ImageTk
+from tkinter import ttk, messagebox
+import queue
 import sys
 import os
-import time
+import threading
+
+import cache_imagens
+import diagnostico
 
 # ==== Permite acessar arquivos mesmo se virar EXE ====
 def resource_path(rel_path):
     base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, rel_path)
 
+
+# ==== PRÉ-CARGA (enquanto o splash aparece) ====
+# Etapas mostradas na barra de progresso do splash
+PRELOAD_STEPS = (
+    "Carregando módulos...",
+    "Abrindo banco de dados...",
+    "Lendo dados recentes...",
+    "Carregando imagens...",
+)
+POLL_MS = 30
+SPLASH_SIZE = (600, 360)
+BG_SIZE = (900, 600)
+
+
+def preload(report):
+    """Importa a tela principal, prepara o banco e gera as imagens no cache.
+
+    Roda fora da thread do Tk: não cria widgets nem PhotoImage. `report(etapa,
+    texto)` informa o progresso. Retorna os caminhos das variantes em cache
+    (cache_imagens.py), que as telas carregam sem decodificar de novo.
+    """
+    report(0, PRELOAD_STEPS[0])
+    import gui_gestao_com_excluir as gui
+    from virtual_tree import KeysetPager
+
+    report(1, PRELOAD_STEPS[1])
+    gui.init_db()
+
+    # primeiras páginas das listagens: páginas do banco no cache e statements
+    # preparados nas conexões do pool, que a tela principal reaproveita
+    report(2, PRELOAD_STEPS[2])
+    KeysetPager(gui.CLIENTS_LIST_SQL).first()
+    KeysetPager(gui.ORDERS_LIST_SQL, key="o.id").first()
+    gui.get_pool().fetch_all(gui.OS_BY_STATUS_SQL)
+
+    report(3, PRELOAD_STEPS[3])
+    images = {
+        "fundo": cache_imagens.variant(resource_path("os.png"), BG_SIZE, fit="cover"),
+        "logo": cache_imagens.variant(gui.LOGO_PATH, gui.LOGO_SIZE),
+        "logo_pdf": cache_imagens.pdf_logo(gui.LOGO_PATH),
+    }
+    report(len(PRELOAD_STEPS), "Pronto")
+    return images
+
+
 # ==== SPLASH SCREEN ====
-def show_splash(duration=1.6):
-    splash = tk.Toplevel()
-    splash.overrideredirect(True)
-
-    w, h = 600, 360
-    ws = splash.winfo_screenwidth()
-    hs = splash.winfo_screenheight()
-    x = (ws // 2) - (w // 2)
-    y = (hs // 2) - (h // 2)
-    splash.geometry(f"{w}x{h}+{x}+{y}")
-
-    try:
-        img_path = resource_path("splash.png")
-        img = Image.open(img_path).resize((w, h), Image.LANCZOS)
-        photo = ImageTk.PhotoImage(img)
-
-        lbl = tk.Label(splash, image=photo)
-        lbl.image = photo
-        lbl.pack(fill="both", expand=True)
-
-    except Exception as e:
-        print("Erro no splash:", e)
-        tk.Label(
-            splash,
-            text="Carregando...",
-            font=("Arial", 22, "bold")
-        ).pack(expand=True)
-
-    splash.update()
-    time.sleep(duration)
-    splash.destroy()
+class Splash(tk.Toplevel):
+    """Splash com barra de progresso; fecha assim que `work` termina.
+
+    `work(report)` roda em uma thread; o resultado (ou {"erro": exceção} se a
+    pré-carga falhar) vai para on_done(resultado) na thread do Tk.
+    """
+
+    def __init__(self, master, work=preload, on_done=None):
+        super().__init__(master)
+        self.overrideredirect(True)
+        self.on_done = on_done
+
+        w, h = SPLASH_SIZE
+        ws = self.winfo_screenwidth()
+        hs = self.winfo_screenheight()
+        x = (ws // 2) - (w // 2)
+        y = (hs // 2) - (h // 2)
+        self.geometry(f"{w}x{h}+{x}+{y}")
+
+        bottom = tk.Frame(self)
+        bottom.pack(side="bottom", fill="x")
+        self.status = tk.Label(bottom, text=PRELOAD_STEPS[0], anchor="w")
+        self.status.pack(fill="x", padx=8)
+        self.progress = ttk.Progressbar(bottom, maximum=len(PRELOAD_STEPS), mode="determinate")
+        self.progress.pack(fill="x", padx=8, pady=(0, 8))
+
+        photo = cache_imagens.photo(resource_path("splash.png"), SPLASH_SIZE, master=self)
+        if photo is not None:
+            lbl = tk.Label(self, image=photo)
+            lbl.image = photo
+            lbl.pack(fill="both", expand=True)
+        else:
+            diagnostico.error("Erro no splash: splash.png não carregada")
+            tk.Label(
+                self,
+                text="Carregando...",
+                font=("Arial", 22, "bold")
+            ).pack(expand=True)
+
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, args=(work,), daemon=True).start()
+        self.after(POLL_MS, self._poll)
+
+    def _run(self, work):
+        try:
+            result = work(lambda step, text: self._queue.put(("progress", step, text)))
+        except Exception as e:
+            diagnostico.error("Erro na pré-carga", e)
+            result = {"erro": e}
+        self._queue.put(("done", result))
+
+    def _poll(self):
+        while True:
+            try:
+                msg = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if msg[0] == "done":
+                self.destroy()
+                if self.on_done:
+                    self.on_done(msg[1])
+                return
+            _kind, step, text = msg
+            self.progress["value"] = step
+            self.status.config(text=text)
+        self.after(POLL_MS, self._poll)
+
+
+def show_splash(work=preload):
+    """Mostra o splash até a pré-carga terminar; devolve o resultado dela."""
+    root = tk.Tk()
+    root.withdraw()
+    result = {}
+
+    def done(value):
+        result.update(value)
+        root.quit()
+
+    Splash(root, work, done)
+    root.mainloop()
+    root.destroy()
+    return result
 
 
 # ==== ABERTURA DO SISTEMA PRINCIPAL ====
 def iniciar():
     import gui_gestao_com_excluir
     gui_gestao_com_excluir.App().mainloop()
+    gui_gestao_com_excluir.db.close_pool()
 
 
 # ==== TELA INICIAL ====
 class TelaInicial(tk.Tk):
-    def __init__(self):
+    def __init__(self, preload_error=None):
         super().__init__()
         self.title("TDG Monitoramento Eletrônico - Início")
         self.geometry("900x600")
         self.resizable(False, False)
 
-        # Carrega fundo
-        try:
-            img_path = resource_path("os.png")
-            img = Image.open(img_path)
-
-            img_ratio = img.width / img.height
-            frame_ratio = 900 / 600
-
-            if img_ratio > frame_ratio:
-                new_height = 600
-                new_width = int(new_height * img_ratio)
-            else:
-                new_width = 900
-                new_height = int(new_width / img_ratio)
-
-            img = img.resize((new_width, new_height), Image.LANCZOS)
-            self.bg = ImageTk.PhotoImage(img)
-
+        # Carrega fundo (variante já gerada pela pré-carga)
+        self.bg = cache_imagens.photo(resource_path("os.png"), BG_SIZE, fit="cover", master=self)
+        if self.bg is not None:
             bg_label = tk.Label(self, image=self.bg)
             bg_label.place(x=0, y=0, relwidth=1, relheight=1)
-
-        except Exception as e:
-            print("Erro carregando os.png:", e)
+        else:
+            diagnostico.error("Erro carregando os.png")
 
         # Botão iniciar centralizado
         btn = tk.Button(
@@ -96,6 +181,11 @@ class TelaInicial(tk.Tk):
         )
         btn.place(relx=0.5, rely=0.90, anchor="center")
 
+        if preload_error is not None:
+            self.after(0, lambda: messagebox.showwarning(
+                "Atenção", f"A pré-carga falhou:\n{preload_error}\n\n"
+                           "O sistema tenta preparar o banco de novo ao iniciar.", parent=self))
+
     def abrir_sistema(self):
         self.destroy()
         iniciar()
@@ -103,11 +193,6 @@ class TelaInicial(tk.Tk):
 
 # ==== EXECUÇÃO ====
 if __name__ == "__main__":
-    root = tk.Tk()
-    root.withdraw()
-
-    show_splash()
-
-    root.destroy()
-    app = TelaInicial()
+    preloaded = show_splash()
+    app = TelaInicial(preload_error=preloaded.get("erro"))
     app.mainloop()
@@ -1,21 +1,46 @@
+import csv
+import gzip
+import json
 import os
 import sqlite3
+import threading
 import pytest
-from gui_gestao_com_excluir import get_conn, init_db, DB_FILE
+import db
+import migrations
+from virtual_tree import KeysetPager
+from change_tracker import ChangeTracker, prune_change_log
+from executor import BackgroundExecutor, CancelToken, Cancelled, interruptible, query_all
+from export import export_csv, order_filters
+from gui_gestao_com_excluir import get_conn, init_db, get_pool, ORDERS_LIST_SQL
+from pdf_os import fetch_orders, render_batch, render_os_pdf
+from pdf_layout import TextMeasure
+import importar
+import reports
+import datas
+import benchmark
+import diagnostico
+import exclusao
+import arquivo
+import cache_imagens
+import anexos
 
 
 
 #  FIXTURE DE BANCO LIMPO
 
 @pytest.fixture
-def clean_db():
-    """Remove o banco antes de cada teste para garantir ambiente limpo."""
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
+def clean_db(tmp_path, monkeypatch):
+    """Usa um banco novo em diretório temporário (não apaga o gestao.db real)."""
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "gestao.db"))
     init_db()
     yield
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
+    db.close_pool()
+
+
+@pytest.fixture(autouse=True)
+def image_cache(tmp_path, monkeypatch):
+    """Variantes de imagem em diretório temporário (não suja o .cache_imagens real)."""
+    monkeypatch.setattr(cache_imagens, "CACHE_DIR", str(tmp_path / "cache_imagens"))
 
 
 
@@ -118,3 +143,1013 @@ def test_insert_order(clean_db):
     assert result[0] == "Instalação"
 
     conn.close()
+
+
+
+#  TESTE: POOL DE CONEXÕES
+
+def test_pool_reuses_connections_and_uses_wal(clean_db):
+    pool = get_pool()
+    assert pool is get_pool()
+    assert pool.fetch_one("PRAGMA journal_mode")[0] == "wal"
+
+    with pool.reader() as conn:
+        first = conn
+    with pool.reader() as conn:
+        assert conn is first
+
+
+def test_pool_schema_cache(clean_db):
+    pool = get_pool()
+    cols = pool.columns("orders")
+    assert cols[0] == "id"
+    assert "data_encerramento" in cols
+    assert pool.columns("orders") is cols
+
+
+def test_pool_writer_rolls_back_on_error(clean_db):
+    pool = get_pool()
+    with pytest.raises(RuntimeError):
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO technicians (nome) VALUES ('Rollback')")
+            raise RuntimeError("falha")
+    assert pool.fetch_one("SELECT COUNT(*) FROM technicians")[0] == 0
+
+
+def test_pool_readers_from_threads(clean_db):
+    pool = get_pool()
+    pool.execute("INSERT INTO technicians (nome) VALUES ('T')")
+    results = []
+
+    def worker():
+        results.append(pool.fetch_one("SELECT COUNT(*) FROM technicians")[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [1] * 8
+
+
+
+#  TESTE: MIGRAÇÕES E ÍNDICES
+
+def test_migrations_set_user_version_and_skip_when_current(clean_db):
+    pool = get_pool()
+    assert pool.fetch_one("PRAGMA user_version")[0] == migrations.LATEST_VERSION
+    assert init_db() == 0
+
+
+def test_migrations_upgrade_legacy_db(tmp_path, monkeypatch):
+    # banco criado pela versão antiga: tabelas existem, user_version = 0
+    path = tmp_path / "legado.db"
+    conn = sqlite3.connect(path)
+    migrations._m001_base_tables(conn)
+    conn.execute("INSERT INTO technicians (nome) VALUES ('Antigo')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, "DB_FILE", str(path))
+    try:
+        assert init_db() == migrations.LATEST_VERSION
+        assert get_pool().fetch_one("SELECT nome FROM technicians")[0] == "Antigo"
+    finally:
+        db.close_pool()
+
+
+def _query_plan(sql, params=()):
+    rows = get_pool().fetch_all("EXPLAIN QUERY PLAN " + sql, params)
+    return " | ".join(r[-1] for r in rows)
+
+
+@pytest.mark.parametrize("sql, index", [
+    ("SELECT id FROM orders WHERE cliente_id = ? ORDER BY id DESC", "idx_orders_cliente"),
+    ("SELECT id FROM orders WHERE tecnico_id = ?", "idx_orders_tecnico"),
+    ("SELECT id FROM orders WHERE status = ?", "idx_orders_status"),
+    ("SELECT timestamp FROM history WHERE order_id = ? ORDER BY id", "idx_history_order"),
+])
+def test_hot_queries_use_indexes(clean_db, sql, index):
+    assert index in _query_plan(sql, (1,))
+
+
+
+#  TESTE: PAGINAÇÃO POR CHAVE (LISTAGEM VIRTUAL)
+
+def _seed_orders(n):
+    with get_pool().writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('C', 'Física', '1')")
+        conn.executemany(
+            "INSERT INTO orders (cliente_id, tipo_os, status) VALUES (1, 'Instalação', 'Aberta')",
+            [()] * n)
+
+
+def test_keyset_pager_walks_full_history(clean_db):
+    _seed_orders(250)
+    pager = KeysetPager(ORDERS_LIST_SQL, key="o.id", page_size=100)
+
+    page = pager.first()
+    assert [r[0] for r in page[:2]] == [250, 249]
+    seen = [r[0] for r in page]
+    while len(page) == pager.page_size:
+        page = pager.older(page[-1][0])
+        seen += [r[0] for r in page]
+    assert seen == list(range(250, 0, -1))
+
+    back = pager.newer(150)
+    assert [r[0] for r in back] == list(range(250, 150, -1))
+
+
+def test_keyset_pager_filters(clean_db):
+    _seed_orders(10)
+    get_pool().execute("UPDATE orders SET status = 'Concluída' WHERE id % 2 = 0")
+    pager = KeysetPager(ORDERS_LIST_SQL, key="o.id", page_size=3)
+    pager.set_filters([("o.status = ?", ("Concluída",))])
+    assert [r[0] for r in pager.first()] == [10, 8, 6]
+    assert [r[0] for r in pager.older(6)] == [4, 2]
+
+
+
+#  TESTE: DETECÇÃO DE ALTERAÇÕES
+
+def test_change_tracker_reports_only_changed_rows(clean_db):
+    pool = get_pool()
+    _seed_orders(3)
+    tracker = ChangeTracker(pool.path)
+    assert tracker.poll() == {}
+
+    pool.execute("UPDATE orders SET status = 'Concluída' WHERE id = 2")
+    pool.execute("INSERT INTO orders (cliente_id, status) VALUES (1, 'Aberta')")
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO orders (cliente_id, status) VALUES (1, 'Aberta')")
+        conn.execute("DELETE FROM orders WHERE id IN (3, 5)")
+
+    assert tracker.poll() == {"orders": ({2, 4}, {3, 5})}
+    assert tracker.poll() == {}
+    tracker.close()
+
+
+def test_change_tracker_requests_reload_after_prune(clean_db):
+    pool = get_pool()
+    tracker = ChangeTracker(pool.path)
+    _seed_orders(1)
+    assert tracker.poll() == {"clients": ({1}, set()), "orders": ({1}, set())}
+
+    _seed_orders(30)
+    assert prune_change_log(pool, keep=5) > 0
+    assert tracker.poll() is None
+    tracker.close()
+
+
+
+#  TESTE: EXECUÇÃO EM SEGUNDO PLANO
+
+class _AfterLoop:
+    """Substitui o mainloop: guarda os callbacks de after() para rodar no teste."""
+
+    def __init__(self):
+        self.calls = []
+
+    def after(self, _ms, fn):
+        self.calls.append(fn)
+
+    def run_until(self, cond, timeout=5.0):
+        import time
+        end = time.time() + timeout
+        while not cond() and time.time() < end:
+            calls, self.calls = self.calls, []
+            for fn in calls:
+                fn()
+            time.sleep(0.01)
+
+
+def test_executor_delivers_results_on_ui_thread(clean_db):
+    _seed_orders(5)
+    loop = _AfterLoop()
+    busy = []
+    ex = BackgroundExecutor(loop, on_busy=busy.append)
+    results = []
+
+    def on_done(rows):
+        results.append((threading.current_thread() is threading.main_thread(), rows))
+
+    ex.submit(query_all, "SELECT COUNT(*) FROM orders", label="contagem", on_done=on_done)
+    loop.run_until(lambda: results)
+    ex.shutdown()
+
+    assert results == [(True, [(5,)])]
+    assert busy[0] == ["contagem"] and busy[-1] == []
+
+
+def test_interruptible_aborts_running_query(clean_db):
+    token = CancelToken()
+    token.cancel()
+    with get_pool().reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            with interruptible(conn, token):
+                conn.execute("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) "
+                             "SELECT COUNT(*) FROM n").fetchone()
+        # depois de sair do bloco a conexão volta a funcionar normalmente
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_render_os_pdf_without_ui(clean_db, tmp_path):
+    _seed_orders(1)
+    pool = get_pool()
+    pool.execute("UPDATE orders SET descricao = ? WHERE id = 1", ("texto longo " * 400,))
+    order = pool.fetch_one("SELECT * FROM orders WHERE id = 1")
+    out = tmp_path / "os.pdf"
+    render_os_pdf(str(out), order, pool.columns("orders"), str(tmp_path / "sem_logo.jpeg"))
+    assert out.read_bytes().startswith(b"%PDF")
+
+
+
+#  TESTE: EXPORTAÇÃO CSV EM FLUXO
+
+def test_export_csv_streams_filtered_rows_to_gzip(clean_db, tmp_path):
+    _seed_orders(50)
+    get_pool().execute("UPDATE orders SET status = 'Concluída', data_abertura = '2025-03-10 09:00:00' WHERE id <= 20")
+    clauses, params = order_filters(status="Concluída", date_from="2025-03-10", date_to="2025-03-10")
+    out = tmp_path / "os.csv.gz"
+
+    n = export_csv(CancelToken(), str(out), "orders", clauses, params, compress=True, batch_size=7)
+
+    assert n == 20
+    with gzip.open(out, "rt", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == "id" and len(rows) == 21
+    assert [int(r[0]) for r in rows[1:]] == list(range(1, 21))
+
+
+def test_export_csv_cancel_removes_partial_file(clean_db, tmp_path):
+    _seed_orders(10)
+    token = CancelToken()
+    token.cancel()
+    out = tmp_path / "os.csv"
+    with pytest.raises(Cancelled):
+        export_csv(token, str(out), "orders", batch_size=2)
+    assert not out.exists()
+
+
+
+#  TESTE: PDFs EM LOTE
+
+def test_render_batch_one_pdf_per_order_on_process_pool(clean_db, tmp_path):
+    from PIL import Image
+    logo = tmp_path / "logo.jpeg"
+    Image.new("RGB", (64, 48), "navy").save(logo)
+    _seed_orders(30)
+    get_pool().execute("UPDATE orders SET data_agendamento = '2025-05-02 08:00' WHERE id > 5")
+
+    orders, cols = fetch_orders(scheduled_on="2025-05-02")
+    assert len(orders) == 25
+    out = tmp_path / "lote"
+    n = render_batch(CancelToken(), orders, cols, str(out), str(logo), workers=2, chunk_size=10)
+
+    assert n == 25
+    assert sorted(os.listdir(out)) == [f"OS_{i:06d}.pdf" for i in range(6, 31)]
+
+
+def test_render_batch_merged_pdf(clean_db, tmp_path):
+    _seed_orders(3)
+    orders, cols = fetch_orders(ids=[3, 1])
+    out = tmp_path / "lote.pdf"
+    assert render_batch(CancelToken(), orders, cols, str(out), merged=True) == 2
+    assert out.read_bytes().count(b"/Type /Page\n") == 2
+
+
+def test_render_batch_merged_pdf_on_process_pool(clean_db, tmp_path):
+    pypdf = pytest.importorskip("pypdf")
+    _seed_orders(30)
+    orders, cols = fetch_orders(ids=list(range(1, 31)))
+    route = {"dia": "2025-06-02", "tecnico": "Ana", "km": 1.5, "setores": ["Centro"],
+             "paradas": [{"oid": 30, "horario": "08:00", "cliente": "C", "endereco": "Rua A, 1",
+                          "bairro": "Centro", "km": None}]}
+    (tmp_path / "saida").mkdir()
+    out = tmp_path / "saida" / "lote.pdf"
+    assert render_batch(CancelToken(), orders, cols, str(out), merged=True, workers=2, chunk_size=10,
+                        routes=[route]) == 30
+    reader = pypdf.PdfReader(str(out))
+    assert len(reader.pages) == 1 + 30
+    assert "ROTA DO DIA" in reader.pages[0].extract_text()
+    # partes juntadas na ordem dos blocos, depois da folha de rota
+    assert "Id:\n1 " in reader.pages[1].extract_text() and "Id:\n30 " in reader.pages[-1].extract_text()
+    assert os.listdir(out.parent) == ["lote.pdf"]                 # partes (.partNNNN, .rotas) removidas
+
+
+
+#  TESTE: LAYOUT DO PDF
+
+def test_text_measure_wraps_like_string_width():
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    texto = " ".join(f"equipamento{i % 13} série-{i} ção" for i in range(300))
+    esperado, linha = [], ""
+    for palavra in texto.split():
+        if stringWidth(linha + palavra + " ", "Helvetica", 11) < 500:
+            linha += palavra + " "
+        else:
+            esperado.append(linha)
+            linha = palavra + " "
+    esperado.append(linha)
+
+    assert list(TextMeasure("Helvetica", 11).wrap(texto, 500)) == esperado
+
+
+def test_merged_pdf_embeds_logo_once(clean_db, tmp_path):
+    from PIL import Image
+    logo = tmp_path / "logo.jpeg"
+    Image.new("RGB", (64, 48), "navy").save(logo)
+    _seed_orders(5)
+    orders, cols = fetch_orders(ids=range(1, 6))
+    out = tmp_path / "lote.pdf"
+    render_batch(CancelToken(), orders, cols, str(out), str(logo), merged=True)
+    pdf = out.read_bytes()
+    assert pdf.count(b"/Subtype /Image") == 1
+    assert pdf.count(b"/Type /Page\n") == 5
+
+
+
+#  TESTE: IMPORTAÇÃO EM MASSA
+
+def _write_clients_csv(path, n):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "nome", "tipo_pessoa", "documento", "cidade"])
+        for i in range(1, n + 1):
+            w.writerow([i, f"Cliente {i}", "Física", f"{i:011d}", "Recife"])
+        w.writerow(["", "", "Física", "1", ""])          # sem nome -> rejeitado
+        w.writerow([3, "Repetido", "Física", "3", ""])   # id duplicado -> rejeitado
+
+
+def test_import_csv_with_rejects_and_deferred_indexes(clean_db, tmp_path):
+    import servidor
+    src = tmp_path / "clientes.csv"
+    _write_clients_csv(src, 120)
+    get_pool().execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('Antes', 'Física', 'x')")
+    get_pool().execute("DELETE FROM clients")
+    tracker = ChangeTracker(get_pool().path)
+    tag = servidor.etag_for("/clientes")
+    state = importar.import_file("clients", str(src), batch_size=50, initial_load=True, log=lambda _m: None)
+    # carga sem os triggers do log: ETag do servidor muda e as listagens recarregam tudo
+    assert servidor.etag_for("/clientes") != tag
+    assert tracker.poll() is None
+    tracker.close()
+
+    assert (state["inserted"], state["rejected"]) == (120, 2)
+    assert get_pool().fetch_one("SELECT COUNT(*) FROM clients")[0] == 120
+    with open(str(src) + ".rejeitados.csv", encoding="utf-8") as f:
+        rejects = list(csv.reader(f))
+    assert [r[0] for r in rejects[1:]] == ["121", "122"]
+    # índices e triggers do log voltaram
+    names = {r[0] for r in get_pool().fetch_all("SELECT name FROM sqlite_master WHERE tbl_name = 'clients'")}
+    assert "trg_clients_log_i" in names
+
+
+def test_import_jsonl_resumes_from_checkpoint(clean_db, tmp_path):
+    _write_clients_csv(tmp_path / "c.csv", 5)
+    importar.import_file("clients", str(tmp_path / "c.csv"), log=lambda _m: None)
+    src = tmp_path / "ordens.jsonl"
+    with open(src, "w", encoding="utf-8") as f:
+        for i in range(1, 101):
+            f.write(json.dumps({"id": i, "cliente_id": i % 5 + 1, "tipo_os": "Visita"}) + "\n")
+        f.write('{"cliente_id": 999}\n')
+        f.write("não é json\n")
+
+    calls = []
+
+    def crash_after_first_batch(_msg):
+        calls.append(_msg)
+        if len(calls) == 1:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        importar.import_file("orders", str(src), batch_size=30, log=crash_after_first_batch)
+    assert get_pool().fetch_one("SELECT COUNT(*) FROM orders")[0] == 30
+
+    state = importar.import_file("orders", str(src), batch_size=30, log=lambda _m: None)
+    assert (state["inserted"], state["rejected"]) == (100, 2)
+    assert get_pool().fetch_one("SELECT COUNT(*) FROM orders")[0] == 100
+    assert get_pool().fetch_one("SELECT COUNT(*) FROM import_checkpoints")[0] == 0
+
+
+def _report_snapshot():
+    pool = get_pool()
+    status = pool.fetch_all(reports.OS_BY_STATUS_SQL)
+    techs = [(r[0], r[2], round(r[3] or 0, 6)) for r in pool.fetch_all(reports.PERFORMANCE_BY_TECH_SQL + ", t.id")]
+    return status, techs
+
+
+def _report_from_orders():
+    pool = get_pool()
+    status = pool.fetch_all("SELECT status, COUNT(*) FROM orders GROUP BY status ORDER BY status")
+    techs = pool.fetch_all("""
+        SELECT t.id, COUNT(o.id),
+          AVG((julianday(o.data_encerramento) - julianday(o.data_abertura)) * 24)
+        FROM technicians t
+        LEFT JOIN orders o ON o.tecnico_id = t.id AND o.data_encerramento IS NOT NULL
+        GROUP BY t.id ORDER BY COUNT(o.id) DESC, t.id
+    """)
+    return status, [(r[0], r[1], round(r[2] or 0, 6)) for r in techs]
+
+
+def test_report_aggregates_follow_order_changes(clean_db):
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('C', 'Física', '1')")
+        conn.executemany("INSERT INTO technicians (nome) VALUES (?)", [("T1",), ("T2",), ("T3",)])
+        conn.executemany(
+            "INSERT INTO orders (cliente_id, tecnico_id, status, data_abertura, data_encerramento) VALUES (1,?,?,?,?)",
+            [(i % 3 + 1 if i % 4 else None, ["Aberta", "Concluída", None][i % 3],
+              f"2025-01-{i % 28 + 1:02d} 08:00:00",
+              f"2025-01-{i % 28 + 1:02d} {8 + i % 9:02d}:30:00" if i % 2 else None)
+             for i in range(60)])
+    assert _report_snapshot() == _report_from_orders()
+
+    with pool.writer() as conn:
+        conn.execute("UPDATE orders SET status = 'Cancelada' WHERE id % 5 = 0")
+        conn.execute("UPDATE orders SET tecnico_id = 2 WHERE id % 7 = 0")
+        conn.execute("UPDATE orders SET data_encerramento = '2025-02-01 10:00:00' WHERE id % 6 = 0")
+        conn.execute("UPDATE orders SET data_abertura = 'data inválida' WHERE id = 3")
+        conn.execute("DELETE FROM orders WHERE id % 8 = 0")
+    assert _report_snapshot() == _report_from_orders()
+
+    # totais corrompidos: o rebuild volta a sincronizar
+    with pool.writer() as conn:
+        conn.execute("UPDATE report_status_counts SET total = 999")
+        conn.execute("DELETE FROM report_tech_stats")
+    reports.rebuild()
+    assert _report_snapshot() == _report_from_orders()
+
+
+def test_epoch_columns_range_filter_and_backfill(clean_db):
+    _seed_orders(10)
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.execute("UPDATE orders SET data_abertura = '2025-03-0' || id || ' 09:00:00' WHERE id <= 9")
+        conn.execute("UPDATE orders SET data_agendamento = '05/04/2025 14:30' WHERE id IN (2, 3)")
+        conn.execute("UPDATE orders SET data_agendamento = 'amanhã cedo' WHERE id = 4")
+
+    clauses, params = order_filters(date_from="2025-03-03", date_to="2025-03-05", alias="o.")
+    pager = KeysetPager(ORDERS_LIST_SQL, key="o.id")
+    pager.set_filters([(c, [p]) for c, p in zip(clauses, params)])
+    assert [r[0] for r in pager.first()] == [5, 4, 3]
+    plan = " ".join(r[3] for r in pool.fetch_all(
+        "EXPLAIN QUERY PLAN SELECT id FROM orders WHERE abertura_ts >= ? AND abertura_ts < ?", params))
+    assert "idx_orders_abertura_ts" in plan
+
+    assert fetch_orders(scheduled_on="2025-04-05")[0] == []
+    assert datas.backfill() == (2, 1)
+    rows, cols = fetch_orders(scheduled_on="2025-04-05")
+    assert [r[0] for r in rows] == [2, 3]
+    assert rows[0][cols.index("data_agendamento")] == "2025-04-05 14:30:00"
+    assert datas.backfill() == (0, 1)
+
+
+def test_benchmark_generates_dataset_and_compares_with_baseline(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "bench.db"))
+    try:
+        counts = benchmark.generate(str(tmp_path / "bench.db"), 300, log=lambda _m: None)
+        pool = get_pool()
+        assert pool.fetch_one("SELECT COUNT(*) FROM orders")[0] == 300
+        assert pool.fetch_one("SELECT COUNT(*) FROM history")[0] == counts["history"] >= 300
+        assert pool.fetch_one("SELECT SUM(total) FROM report_status_counts")[0] == 300
+        assert "idx_orders_abertura_ts" in {r[0] for r in pool.fetch_all("SELECT name FROM sqlite_master")}
+
+        results = benchmark.run_suite(repeat=1, log=lambda _m: None)
+        assert pool.fetch_one("SELECT COUNT(*) FROM orders")[0] == 300   # exclusão desfeita
+    finally:
+        db.close_pool()
+    assert {"relatorio_status", "exportar_csv_os", "pdf_os", "inicializacao"} <= set(results)
+
+    baseline = {"results": {name: dict(r, median_ms=r["median_ms"] * 2 or 1) for name, r in results.items()}}
+    comparison = benchmark.compare(results, baseline)
+    assert comparison["exportar_csv_os"]["situacao"] == "melhor"
+
+
+@pytest.fixture
+def tracing(tmp_path):
+    log = tmp_path / "lentas.log"
+    diagnostico.TRACER.clear()
+    diagnostico.enable(log_path=str(log), slow_ms=0)
+    yield log
+    diagnostico.disable()
+    diagnostico.TRACER.slow_ms = diagnostico.SLOW_QUERY_MS
+    diagnostico.TRACER.clear()
+
+
+def test_tracer_records_statements_handlers_and_slow_log(clean_db, tracing, tmp_path):
+    _seed_orders(30)
+    pool = get_pool()
+    assert len(pool.fetch_all("SELECT id FROM orders")) == 30
+    pool.fetch_one("SELECT COUNT(*) FROM orders")
+    with pool.reader() as conn:
+        for _row in conn.execute("SELECT id FROM orders WHERE id <= 5"):
+            pass
+
+    recent = {sql: rows for _h, _ms, rows, sql in diagnostico.TRACER.recent()}
+    assert recent["SELECT id FROM orders"] == 30
+    assert recent["SELECT COUNT(*) FROM orders"] == 1
+    assert recent["SELECT id FROM orders WHERE id <= 5"] == 5
+    assert recent["INSERT INTO orders (cliente_id, tipo_os, status) VALUES (1, 'Instalação', 'Aberta')"] == 30
+
+    class Tela:
+        def report_x(self):
+            return 42
+
+        def outro(self):
+            return 1
+
+    tela = Tela()
+    diagnostico.instrument(tela, ("report_",))
+    assert tela.report_x() == 42 and tela.report_x() == 42
+    stats = {name: n for name, n, _p50, _p95, _max in diagnostico.TRACER.stats()}
+    assert stats["tela: report_x"] == 2 and "tela: outro" not in stats
+
+    diagnostico.error("Erro de teste", ValueError("x"))
+    out = tmp_path / "trace.json"
+    diagnostico.TRACER.dump(str(out))
+    trace = json.loads(out.read_text(encoding="utf-8"))
+    assert trace["erros"][0]["mensagem"] == "Erro de teste: x"
+    assert any(op["nome"] == "tela: report_x" for op in trace["operacoes"])
+    log = tracing.read_text(encoding="utf-8")
+    assert "consulta lenta" in log and "Erro de teste" in log
+
+
+def test_tracing_is_opt_in_and_needs_no_tk(monkeypatch):
+    import subprocess
+    import sys
+    assert not diagnostico.TRACER.enabled
+    monkeypatch.setenv(diagnostico.ENV_FLAG, "0")
+    diagnostico.enable_from_env()
+    assert not diagnostico.TRACER.enabled
+    monkeypatch.setenv(diagnostico.ENV_FLAG, "1")
+    diagnostico.enable_from_env()
+    try:
+        assert diagnostico.TRACER.enabled
+    finally:
+        diagnostico.disable()
+    # db.py importa diagnostico: servidor/CLIs não podem carregar o Tk
+    code = ("import sys, db, diagnostico, servidor, importar, busca, rotas, benchmark, estresse_status, pdf_os; "
+            "assert 'tkinter' not in sys.modules")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_bulk_delete_cascades_in_one_transaction(clean_db):
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.executemany("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES (?, 'Física', '1')",
+                         [(f"C{i}",) for i in range(1, 4)])
+        conn.executemany("INSERT INTO technicians (nome) VALUES (?)", [("T1",), ("T2",)])
+        conn.executemany(
+            "INSERT INTO orders (cliente_id, tecnico_id, status, data_abertura, data_encerramento) "
+            "VALUES (?, ?, 'Concluída', '2025-01-01 08:00:00', '2025-01-01 10:00:00')",
+            [(i % 3 + 1, i % 2 + 1) for i in range(30)])
+        conn.executemany("INSERT INTO history (order_id, evento) VALUES (?, 'Abertura')",
+                         [(i,) for i in range(1, 31)] * 2)
+
+    assert exclusao.client_dependents([1]) == (10, 20)
+    # seleção acima do limite de parâmetros do SQLite (32766 ou 250000, conforme a compilação)
+    assert exclusao.client_dependents([1] + list(range(1000, 131000))) == (10, 20)
+    assert exclusao.delete_clients([1, 99]) == {"orders": 10, "history": 20, "clients": 1}
+    assert pool.fetch_one("SELECT COUNT(*) FROM orders WHERE cliente_id = 1")[0] == 0
+    assert pool.fetch_one("SELECT COUNT(*) FROM history")[0] == 40
+
+    assert exclusao.delete_technicians([2]) == {"orders_unassigned": 10, "technicians": 1}
+    assert pool.fetch_one("SELECT COUNT(*) FROM orders WHERE tecnico_id IS NULL")[0] == 10
+    # SET NULL dispara os triggers dos totais
+    assert _report_snapshot() == _report_from_orders()
+
+    ids = [r[0] for r in pool.fetch_all("SELECT id FROM orders WHERE cliente_id = 2")]
+    assert exclusao.delete_orders(ids + [ids[0]]) == {"orders": 10, "history": 20}
+    clauses, params = order_filters(status="Concluída")
+    assert exclusao.delete_orders(clauses=clauses, params=params) == {"orders": 10, "history": 20}
+    assert pool.fetch_one("SELECT COUNT(*) FROM history")[0] == 0
+
+    # O.S. órfã deixada pela exclusão antiga (sem chaves estrangeiras)
+    with pool.writer(foreign_keys=False) as conn:
+        conn.execute("INSERT INTO orders (cliente_id, status) VALUES (777, 'Aberta')")
+    assert exclusao.delete_orphan_orders() == {"orders": 1, "history": 0}
+
+
+def test_foreign_key_migration_keeps_indexes_triggers_and_ids(tmp_path, monkeypatch):
+    path = str(tmp_path / "antigo.db")
+    monkeypatch.setattr(db, "DB_FILE", path)
+    conn = sqlite3.connect(path)
+    migrations._m001_base_tables(conn)
+    conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('C', 'Física', '1')")
+    conn.executemany("INSERT INTO orders (cliente_id) VALUES (1)", [()] * 5)
+    conn.execute("DELETE FROM orders WHERE id = 5")
+    conn.execute("INSERT INTO history (order_id, evento) VALUES (4, 'x')")
+    conn.commit()
+    conn.close()
+    try:
+        init_db()
+        pool = get_pool()
+        names = {r[0] for r in pool.fetch_all("SELECT name FROM sqlite_master")}
+        assert {"idx_orders_cliente", "idx_orders_abertura_ts", "trg_orders_log_d", "trg_orders_agg_u",
+                "idx_history_order"} <= names
+        fks = {(r[2], r[3], r[6]) for r in pool.fetch_all("PRAGMA foreign_key_list(orders)")}
+        assert ("clients", "cliente_id", "CASCADE") in fks and ("technicians", "tecnico_id", "SET NULL") in fks
+        with pool.writer() as conn:
+            new_id = conn.execute("INSERT INTO orders (cliente_id) VALUES (1)").lastrowid
+        assert new_id == 6     # AUTOINCREMENT preservado
+        assert exclusao.delete_clients([1]) == {"orders": 5, "history": 1, "clients": 1}
+    finally:
+        db.close_pool()
+
+
+def test_archive_moves_old_closed_orders_and_keeps_totals(clean_db, monkeypatch):
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('C', 'Física', '1')")
+        conn.execute("INSERT INTO technicians (nome) VALUES ('T')")
+        conn.executemany(
+            "INSERT INTO orders (cliente_id, tecnico_id, status, data_abertura, data_encerramento) "
+            "VALUES (1, 1, ?, ?, ?)",
+            [("Concluída", "2020-01-01 08:00:00", "2020-01-01 11:00:00")] * 5
+            + [("Cancelada", "2020-02-01 08:00:00", None)] * 2
+            + [("Aberta", "2020-03-01 08:00:00", None), ("Concluída", "2099-01-01 08:00:00", "2099-01-01 09:00:00")])
+        conn.executemany("INSERT INTO history (order_id, evento) VALUES (?, 'Abertura')", [(i,) for i in range(1, 10)])
+    before = _report_snapshot()
+
+    # queda depois de gravar o arquivo e antes de apagar do principal: nada se perde
+    def crash(_conn):
+        raise sqlite3.OperationalError("queda simulada")
+    with monkeypatch.context() as m:
+        m.setattr(arquivo, "_add_back_totals", crash)
+        with pytest.raises(sqlite3.OperationalError):
+            arquivo.archive_orders(days=30, batch_size=3)
+    assert pool.fetch_one("SELECT COUNT(*) FROM main.orders")[0] == 9
+    assert pool.fetch_one("SELECT COUNT(*) FROM arquivo.orders")[0] == 3
+    assert _report_snapshot() == before
+
+    assert arquivo.archive_orders(days=30, batch_size=3) == {"orders": 7, "history": 7}
+    assert pool.fetch_one("SELECT COUNT(*) FROM main.orders")[0] == 2
+    assert pool.fetch_one("SELECT COUNT(*) FROM main.history")[0] == 2
+    assert os.path.exists(arquivo.archive_path())
+    assert _report_snapshot() == before
+    reports.rebuild()
+    assert _report_snapshot() == before
+
+    assert [r[0] for r in arquivo.client_history(1)] == [9, 8]
+    assert [r[0] for r in arquivo.client_history(1, include_archive=True)] == list(range(9, 0, -1))
+    row, hist = arquivo.find_order(1)
+    assert row[0] == 1 and len(hist) == 1
+    # nada mais a arquivar: uma segunda execução não muda nada
+    assert arquivo.archive_orders(days=30) == {"orders": 0, "history": 0}
+
+
+def test_gui_import_defers_reportlab_and_pillow():
+    profile = benchmark.import_profile(runs=1)
+    names = {m[0] for m in profile["modulos"]}
+    assert "gui_gestao_com_excluir" in names and profile["total_ms"] > 0
+    assert not any(n.split(".")[0] in ("reportlab", "PIL") for n in names)
+
+
+def test_splash_preload_prepares_database_and_reports_progress(tmp_path, monkeypatch):
+    import telainicial
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "gestao.db"))
+    steps = []
+    try:
+        images = telainicial.preload(lambda step, text: steps.append(step))
+        assert steps == list(range(len(telainicial.PRELOAD_STEPS) + 1))
+        assert get_pool().fetch_one("PRAGMA user_version")[0] == migrations.LATEST_VERSION
+        assert set(images) == {"fundo", "logo", "logo_pdf"}
+    finally:
+        db.close_pool()
+
+
+def test_image_cache_reuses_variants_and_shrinks_pdf_logo(clean_db, tmp_path):
+    from PIL import Image
+    logo = tmp_path / "logo.jpeg"
+    Image.frombytes("RGB", (1600, 1200), os.urandom(1600 * 1200 * 3)).save(logo, quality=95)
+
+    png = cache_imagens.variant(str(logo), (120, 80))
+    assert Image.open(png).size == (120, 80)
+    mtime = os.path.getmtime(png)
+    assert cache_imagens.variant(str(logo), (120, 80)) == png and os.path.getmtime(png) == mtime
+    assert Image.open(cache_imagens.variant(str(logo), (900, 600), fit="cover")).size == (900, 675)
+
+    # imagem trocada: variante nova, a antiga sai do cache
+    os.utime(logo, ns=(0, os.stat(logo).st_mtime_ns + 10**9))
+    novo = cache_imagens.variant(str(logo), (120, 80))
+    assert novo != png and not os.path.exists(png)
+    # PNG e JPEG do mesmo tamanho convivem no cache (um não apaga o outro)
+    jpg = cache_imagens.variant(str(logo), (120, 80), fmt="JPEG")
+    assert os.path.exists(novo) and cache_imagens.variant(str(logo), (120, 80)) == novo and os.path.exists(jpg)
+
+    # imagem ilegível: None e o erro vai para o diagnóstico
+    ruim = tmp_path / "ruim.png"
+    ruim.write_bytes(b"nao e imagem")
+    assert cache_imagens.variant(str(ruim), (120, 80)) is None
+    assert "ruim.png" in diagnostico.TRACER.errors()[-1][1]
+
+    _seed_orders(1)
+    order = get_pool().fetch_one("SELECT * FROM orders WHERE id = 1")
+    out = tmp_path / "os.pdf"
+    render_os_pdf(str(out), order, get_pool().columns("orders"), str(logo))
+    assert out.stat().st_size < logo.stat().st_size / 4
+
+
+def test_attachments_dedup_thumbnails_pdf_and_purge(clean_db, tmp_path, monkeypatch):
+    from PIL import Image
+    _seed_orders(2)
+    fotos = []
+    for i, cor in enumerate(("red", "green", "blue")):
+        path = tmp_path / f"foto{i}.png"
+        Image.new("RGB", (800, 600), cor).save(path)
+        fotos.append(str(path))
+    (tmp_path / "nota.txt").write_text("não é imagem")
+    monkeypatch.setattr(anexos, "MMAP_MIN_BYTES", 1)        # força a leitura por mmap
+
+    assert anexos.add_files(None, 1, fotos + [fotos[0], str(tmp_path / "nota.txt")]) == 4
+    assert anexos.add_files(None, 2, fotos[:1], "assinatura_cliente") == 1
+    blobs = [f for _d, _s, files in os.walk(anexos.store_dir()) for f in files]
+    assert len(blobs) == 4       # a mesma foto em duas O.S. é guardada uma vez
+
+    monkeypatch.setattr(anexos, "INLINE_LIMIT", 0)
+    assert anexos.make_thumbnails(workers=2) == 4
+    assert anexos.make_thumbnails() == 0
+    rows = get_pool().fetch_all("SELECT nome, miniatura, largura FROM attachments WHERE order_id = 1 ORDER BY id")
+    assert rows[-1] == ("nota.txt", -1, None) and rows[0] == ("foto0.png", 1, 800)
+    thumbs = anexos.thumbnails_for([1, 2])
+    assert len(thumbs[1]) == 3 and thumbs[2][0][0] == "assinatura_cliente"
+    assert Image.open(thumbs[1][0][2]).size == (256, 192)
+    # falha que não é "não é imagem" (aqui, destino ocupado): erro registrado, sem .tmp, tenta de novo depois
+    ocupado = tmp_path / "miniatura_ocupada"
+    ocupado.mkdir()
+    assert anexos._make_thumb(fotos[0], str(ocupado)) is False
+    assert "miniatura" in diagnostico.TRACER.errors()[-1][1]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+    orders, cols = fetch_orders(ids=[1, 2])
+    out = tmp_path / "lote.pdf"
+    render_batch(CancelToken(), orders, cols, str(out), merged=True, photos=thumbs)
+    assert out.read_bytes().count(b"/Subtype /Image") == 3
+    # miniatura que sumiu do disco: o PDF sai sem ela e o erro vai para o diagnóstico
+    sumiu = {2: [("foto", "x", str(tmp_path / "sumiu.png"))]}
+    render_batch(CancelToken(), orders, cols, str(out), merged=True, photos=sumiu)
+    assert "sumiu.png" in diagnostico.TRACER.errors()[-1][1]
+
+    exclusao.delete_orders([1])
+    assert get_pool().fetch_one("SELECT COUNT(*) FROM attachments")[0] == 1
+    assert anexos.purge_unreferenced() == 3
+
+
+def test_api_pagination_etag_status_and_load(clean_db):
+    import http.client
+    import carga_api
+    import servidor
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('C', 'Física', '1')")
+        conn.executemany("INSERT INTO orders (cliente_id, status) VALUES (1, 'Aberta')", [()] * 5)
+    server = servidor.make_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    client = http.client.HTTPConnection(host, port, timeout=10)
+
+    def call(method, path, body=None, headers=None):
+        client.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers or {})
+        resp = client.getresponse()
+        data = resp.read()
+        return resp.status, resp.getheader("ETag"), json.loads(data) if data else None
+
+    try:
+        status, tag, page = call("GET", "/os?limite=2")
+        assert status == 200 and [o["id"] for o in page["itens"]] == [5, 4] and page["proximo"] == 4
+        _, _, page = call("GET", "/os?limite=2&antes=2")
+        assert [o["id"] for o in page["itens"]] == [1] and page["proximo"] is None
+        assert call("GET", "/os?limite=2", headers={"If-None-Match": tag})[0] == 304
+
+        status, _, order = call("POST", "/os/3/status", {"status": "Concluída", "responsavel": "App"})
+        assert status == 200 and order["status"] == "Concluída" and order["data_encerramento"]
+        status, _, conflito = call("POST", "/os/3/status", {"status": "Aberta", "versao": 0})
+        assert status == 409 and (conflito["status"], conflito["versao"]) == ("Concluída", 1)
+        assert call("GET", "/os?limite=2", headers={"If-None-Match": tag})[0] == 200
+        _, _, hist = call("GET", "/os/3/historico")
+        assert [(h["evento"], h["responsavel"]) for h in hist["itens"]] == [("Status alterado para Concluída", "App")]
+
+        assert call("GET", "/os/99")[0] == 404
+        assert call("POST", "/os/3/status", {"status": "Perdida"})[0] == 400
+        assert call("GET", "/os?de=ontem")[0] == 400
+        assert call("POST", "/os/3")[0] == 405
+        for length in ("-1", "abc"):
+            bad = http.client.HTTPConnection(host, port, timeout=10)
+            bad.putrequest("POST", "/os/3/status")
+            bad.putheader("Content-Length", length)
+            bad.endheaders()
+            assert bad.getresponse().status == 400
+            bad.close()
+
+        result = carga_api.run_load(host, port, max_id=5, readers=2, writers=1, seconds=0.3)
+        assert result["total"]["n"] > 0 and result["total"]["erros"] == 0
+        assert {"listar", "detalhe", "status"} <= set(result["tipos"])
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_status_update_detects_conflicts_and_no_lost_updates_across_processes(clean_db, tmp_path):
+    import estresse_status
+    import ordens
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('C', 'Física', '1')")
+        conn.execute("INSERT INTO orders (cliente_id, status) VALUES (1, 'Aberta')")
+    assert ordens.current(1) == ("Aberta", 0)
+    assert ordens.update_status(1, "Em andamento", versao=0) == 1
+    with pytest.raises(ordens.ConflitoVersao) as conflito:
+        ordens.update_status(1, "Cancelada", versao=0)     # outra estação leu a versão 0
+    assert (conflito.value.status, conflito.value.versao) == ("Em andamento", 1)
+    assert ordens.update_status(1, "Concluída", versao=1) == 2
+    assert pool.fetch_one("SELECT data_encerramento IS NOT NULL FROM orders WHERE id = 1")[0] == 1
+    assert ordens.update_status(99, "Aberta") is None
+    assert pool.fetch_one("SELECT COUNT(*) FROM history")[0] == 2
+    db.close_pool()
+
+    result = estresse_status.run(str(tmp_path / "estresse.db"), processes=3, updates=20, orders=2)
+    assert result["problemas"] == [] and result["erros"] == 0
+    assert result["gravadas"] == 60
+
+
+def test_agenda_conflicts_suggestion_and_incremental_updates(clean_db):
+    import agenda
+    assert agenda.parse_duration("2h") == 7200 and agenda.parse_duration("1h30") == 5400
+    assert agenda.parse_duration("90min") == 5400 and agenda.parse_duration("1:15") == 4500
+    assert agenda.parse_duration("1,5") == 5400 and agenda.parse_duration("logo") is None
+    # número solto: horas até 12, minutos acima ("30" não bloqueia o dia inteiro do técnico)
+    assert agenda.parse_duration("2") == 7200 and agenda.parse_duration("12") == 12 * 3600
+    assert agenda.parse_duration("30") == 1800 and agenda.parse_duration("90") == 5400
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('C', 'Física', '1')")
+        conn.executemany("INSERT INTO technicians (nome) VALUES (?)", [("Ana",), ("Bia",), ("Caio",)])
+        conn.executemany(
+            "INSERT INTO orders (cliente_id, tecnico_id, status, data_agendamento, horario_previsto, tempo_estimado) "
+            "VALUES (1, ?, ?, ?, ?, ?)", [
+                (1, "Aberta", "2025-06-02 08:00:00", None, "2h"),       # Ana 08-10
+                (1, "Aberta", "2025-06-02", "14h", "1h"),               # Ana 14-15 (hora no horário previsto)
+                (2, "Aberta", "2025-06-02 09:00:00", None, "30min"),    # Bia 09-09:30
+                (3, "Concluída", "2025-06-02 09:00:00", None, "8h"),    # encerrada: não ocupa
+                (3, "Aberta", "2025-06-02 10:00:00", None, "6h"),       # Caio 10-16
+            ])
+    ag = agenda.Agenda()
+    nove = agenda.slot_from_text("2025-06-02 09:30", None, "1h")
+    assert ag.conflicts(1, *nove) == [1]
+    assert ag.conflicts(2, *nove) == []
+    assert ag.conflicts(1, *agenda.slot_from_text("2025-06-02 14:30", None, "1h")) == [2]
+    # às 11h só Ana e Bia estão livres; Bia tem menos horas no dia
+    assert ag.suggest(*agenda.slot_from_text("2025-06-02 11:00", None, "1h")) == 2
+    assert ag.suggest(*agenda.slot_from_text("2025-06-02 09:15", None, "1h")) is None
+
+    tracker = ChangeTracker(pool.path)
+    with pool.writer() as conn:
+        conn.execute("UPDATE orders SET status = 'Cancelada' WHERE id = 1")
+        conn.execute("INSERT INTO orders (cliente_id, tecnico_id, status, data_agendamento, tempo_estimado) "
+                     "VALUES (1, 2, 'Aberta', '2025-06-02 11:00:00', '2h')")
+    ag.apply_changes(*tracker.poll()["orders"])
+    tracker.close()
+    assert ag.conflicts(1, *nove) == []
+    assert ag.suggest(*agenda.slot_from_text("2025-06-02 11:00", None, "1h")) == 1
+    day = datas.to_ts(datas.parse("2025-06-02"))
+    week = ag.between(day, day + agenda.DAY_S)
+    assert sorted(week) == [1, 2, 3] and [oid for _s, _e, oid, _c in week[2]] == [3, 6]
+    assert not any(conflito for items in week.values() for *_r, conflito in items)
+
+
+
+#  TESTE: ROTAS DO DIA
+
+def test_route_planning_by_cep_and_route_sheet_in_batch(clean_db, tmp_path):
+    import rotas
+    ceps = tmp_path / "ceps.csv"
+    ceps.write_text("CEP;Latitude;Longitude;Bairro;Cidade\n"
+                    "50000-001;-8,000;-34,900;Centro;Recife\n"
+                    "50000-003;-8,000;-34,920;Centro;Recife\n"
+                    "50010;-8,000;-34,910;Boa Vista;Recife\n"
+                    "50020-000;-8,000;-34,940;Graças;Recife\n"
+                    "5003;x;-34,9;;\n", encoding="utf-8")
+    assert rotas.load_ceps(str(ceps)) == (4, 1)
+    index = rotas.CepIndex()
+    assert index.locate("50010-999") == (-8.0, -34.91)               # prefixo mais longo
+    assert index.locate("99999-999", "centro", "Recife") == (-8.0, -34.91)   # centro do bairro
+    assert rotas.route_order([(-8, -34.9 - 0.01 * i) for i in (3, 0, 5, 1, 4, 2)]) == [2, 4, 0, 5, 3, 1]
+
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.executemany("INSERT INTO clients (nome, tipo_pessoa, documento, cep, bairro, cidade) VALUES (?,?,?,?,?,?)", [
+            ("Longe", "Física", "1", "50020-000", "Graças", "Recife"),
+            ("Perto", "Física", "2", "50000-001", "Centro", "Recife"),
+            ("Meio", "Física", "3", "50010-500", "Boa Vista", "Recife"),
+            ("Sem CEP", "Física", "4", "", "Boa Vista", "Recife"),
+            ("Desconhecido", "Física", "5", "", "Lugar Nenhum", "Recife")])
+        conn.executemany("INSERT INTO technicians (nome) VALUES (?)", [("Ana",), ("Bia",)])
+        conn.executemany("INSERT INTO orders (cliente_id, tecnico_id, status, data_agendamento) VALUES (?,?,?,?)", [
+            (1, 1, "Aberta", "2025-06-02 08:00:00"), (5, 1, "Aberta", "2025-06-02 08:30:00"),
+            (2, 1, "Aberta", "2025-06-02 09:00:00"), (3, 1, "Aberta", "2025-06-02 10:00:00"),
+            (4, 1, "Aberta", "2025-06-02 11:00:00"), (2, 1, "Concluída", "2025-06-02 12:00:00"),
+            (2, 2, "Aberta", "2025-06-02 08:00:00"), (2, 2, "Aberta", "2025-06-03 08:00:00")])
+
+    routes = rotas.plan_day("2025-06-02")
+    assert [r["tecnico"] for r in routes] == ["Ana", "Bia"]
+    ana = routes[0]
+    # a partir de uma ponta, em linha; "Sem CEP" entra pelo bairro, "Desconhecido" vai no final
+    assert [s["oid"] for s in ana["paradas"]] in ([3, 4, 5, 1, 2], [1, 4, 5, 3, 2])
+    assert ana["paradas"][-1]["km"] is None and ana["km"] == pytest.approx(4.4, abs=0.1)
+    assert [r["tecnico"] for r in rotas.plan_day("2025-06-02", tecnico_id=2)] == ["Bia"]
+
+    orders, cols = fetch_orders(scheduled_on="2025-06-02")
+    orders = rotas.sort_by_route(orders, routes)
+    assert [r[0] for r in orders] == rotas.route_order_ids(routes) + [6]
+    out = tmp_path / "lote.pdf"
+    assert render_batch(CancelToken(), orders, cols, str(out), merged=True, routes=routes) == 7
+    assert out.read_bytes().count(b"/Type /Page\n") == 2 + 7
+    pasta = tmp_path / "lote"
+    render_batch(CancelToken(), orders[:2], cols, str(pasta), routes=routes[:1])
+    assert "ROTAS.pdf" in os.listdir(pasta)
+
+
+
+#  TESTE: AUTOCOMPLETAR DE CLIENTES E TÉCNICOS
+
+def test_prefix_index_search_and_incremental_updates(clean_db):
+    import autocompletar
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.executemany("INSERT INTO clients (nome, tipo_pessoa, documento, telefone_principal) VALUES (?,?,?,?)", [
+            ("José da Conceição", "Física", "123.456.789-00", "(81) 99876-5432"),
+            ("Condomínio São João", "Jurídica", "12.345.678/0001-90", ""),
+            ("Maria Joséfa", "Física", "98765432100", "81 3333-1111")])
+    index = autocompletar.PrefixIndex(autocompletar.CLIENTS_SQL)
+    assert index.search("jose") == []           # ainda não montado
+    index.load()
+    assert [oid for oid, _ in index.search("JOSE")] == [1, 3]
+    assert [oid for oid, _ in index.search("conceic")] == [1]
+    assert [oid for oid, _ in index.search("sao jo")] == [2]
+    assert sorted(oid for oid, _ in index.search("123.456")) == [1, 2]
+    assert [oid for oid, _ in index.search("99876")] == [1]       # telefone sem DDD
+    assert index.search("3")[0] == (3, "3 - Maria Joséfa (98765432100)")
+    assert autocompletar.parse_id("3 - Maria Joséfa (98765432100)") == 3 and autocompletar.parse_id("Maria") is None
+
+    tracker = ChangeTracker(pool.path)
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO clients (nome, tipo_pessoa, documento) VALUES ('Josué Lima', 'Física', '555')")
+        conn.execute("UPDATE clients SET nome = 'Maria Fernanda' WHERE id = 3")
+        conn.execute("DELETE FROM clients WHERE id = 1")
+    index.apply_changes(*tracker.poll()["clients"])
+    assert [oid for oid, _ in index.search("jos")] == [4]
+    assert [oid for oid, _ in index.search("fernanda")] == [3]
+
+    # mudanças chegando enquanto o índice é montado em segundo plano são reaplicadas
+    late = autocompletar.PrefixIndex(autocompletar.CLIENTS_SQL)
+    late.loading = True
+    built = late.build()
+    with pool.writer() as conn:
+        conn.execute("UPDATE clients SET nome = 'Josué Lima Neto' WHERE id = 4")
+    late.apply_changes(*tracker.poll()["clients"])
+    late.install(built)
+    tracker.close()
+    assert [oid for oid, _ in late.search("neto")] == [4] and len(late) == 3
+
+
+
+#  TESTE: BUSCA TEXTUAL (FTS5)
+
+def test_full_text_search_ranking_snippets_and_sync(clean_db):
+    import busca
+    pool = get_pool()
+    with pool.writer() as conn:
+        conn.executemany("INSERT INTO clients (nome, tipo_pessoa, documento, rua, bairro) VALUES (?,?,?,?,?)", [
+            ("Padaria Pão Quente", "Jurídica", "12.345.678/0001-90", "Rua da Aurora", "Boa Vista"),
+            ("João Câmara", "Física", "066.688.123-45", "Av. Conselheiro Aguiar", "Boa Viagem")])
+        conn.executemany("INSERT INTO orders (cliente_id, status, titulo, checklist, equipamentos) VALUES (?,?,?,?,?)", [
+            (1, "Aberta", "Revisão geral", "Câmera externa sem imagem", ""),
+            (2, "Aberta", "Troca de câmera", "", "DVR-12345X"),
+            (2, "Fechada", "Instalação de alarme", "", "")])
+    hits = busca.search("orders", "camera")
+    assert [oid for oid, _ in hits] == [2, 1]                  # título pesa mais que checklist
+    assert "[câmera]" in hits[0][1]
+    assert [oid for oid, _ in busca.search("orders", "troca dvr-1234")] == [2]
+    assert [oid for oid, _ in busca.search("clients", "06668812345")] == [2]
+    assert [oid for oid, _ in busca.search("clients", "066.688 joao")] == [2]
+    assert sorted(oid for oid, _ in busca.search("clients", "boa vi")) == [1, 2]
+    assert busca.match_query('" * ( -') == "" and busca.search("orders", '" * ( -') == []
+
+    # triggers mantêm o índice em dia
+    with pool.writer() as conn:
+        conn.execute("UPDATE orders SET titulo = 'Troca de sensor' WHERE id = 2")
+        conn.execute("DELETE FROM orders WHERE id = 1")
+    assert busca.search("orders", "camera") == []
+    assert [oid for oid, _ in busca.search("orders", "sensor")] == [2]
+
+    # filtro da listagem: busca combinada com outros filtros do pager
+    pager = KeysetPager(ORDERS_LIST_SQL, key="o.id")
+    pager.set_filters([("o.status = ?", ["Fechada"]), busca.match_filter("orders", "alarm")])
+    assert [row[0] for row in pager.by_keys([2, 3])] == [3]
+    assert busca.search("orders", "troca", filters=[("o.status = ?", ["Fechada"])]) == []
+
+    busca.rebuild()
+    busca.optimize()
+    assert busca.check() == []
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalização de texto para buscas
+
+fold() deixa nomes comparáveis independentemente de acentos, maiúsculas e
+espaços; digits() reduz documentos, telefones e CEPs aos dígitos. Usados
+pelas rotas (bairros, rotas.py), pelo autocompletar (autocompletar.py) e
+pela busca textual (busca.py).
+"""
+
+import re
+import unicodedata
+
+_NON_DIGITS = re.compile(r"[^0-9]")
+
+
+def fold(text):
+    """Minúsculas sem acentos e espaços extras ("São  José" -> "sao jose")."""
+    text = text or ""
+    if not text.isascii():
+        text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def digits(text):
+    """Só os dígitos ("123.456.789-00" -> "12345678900")."""
+    return _NON_DIGITS.sub("", str(text or ""))
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Listagem virtual para ttk.Treeview com paginação por chave (keyset)
+
+Em vez de carregar "as últimas N linhas" e apagar/reinserir tudo a cada
+atualização, a Treeview mantém apenas uma janela de poucas páginas:
+- a primeira página vem de ... ORDER BY id DESC LIMIT n (resposta imediata)
+- ao rolar até o fim, busca WHERE id < ? ORDER BY id DESC LIMIT n
+- ao rolar até o topo, busca WHERE id > ? ORDER BY id ASC LIMIT n
+- páginas que saem da janela são descartadas do lado oposto
+
+Assim todo o histórico é navegável com memória constante. O iid de cada item
+é o id do registro (primeira coluna da consulta).
+"""
+
+import bisect
+
+from db import get_pool
+
+# tkinter.END, sem importar o Tk: KeysetPager também é usado pelo servidor
+END = "end"
+
+PAGE_SIZE = 100
+MAX_PAGES = 3
+# fração da barra de rolagem perto da borda que dispara a próxima página
+EDGE = 0.05
+
+
+class KeysetPager:
+    """Busca páginas de uma consulta ordenada por uma chave inteira única."""
+
+    def __init__(self, select, key="id", page_size=PAGE_SIZE):
+        self.select = select
+        self.key = key
+        self.page_size = page_size
+        self.filters = []
+
+    def set_filters(self, filters):
+        """Filtros extras: lista de (trecho SQL, parâmetros) unidos com AND."""
+        self.filters = list(filters)
+
+    def _query(self, cond, params, order):
+        clauses = [sql for sql, _ in self.filters]
+        args = [p for _, ps in self.filters for p in ps]
+        if cond:
+            clauses.append(cond)
+            args.extend(params)
+        sql = self.select
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {self.key} {order} LIMIT ?"
+        args.append(self.page_size)
+        return get_pool().fetch_all(sql, args)
+
+    def first(self):
+        return self._query(None, (), "DESC")
+
+    def older(self, key_value):
+        """Página seguinte (chaves menores), em ordem decrescente."""
+        return self._query(f"{self.key} < ?", (key_value,), "DESC")
+
+    def newer(self, key_value):
+        """Página anterior (chaves maiores), também em ordem decrescente."""
+        rows = self._query(f"{self.key} > ?", (key_value,), "ASC")
+        rows.reverse()
+        return rows
+
+    def by_keys(self, keys):
+        """Linhas com as chaves dadas que ainda passam pelos filtros."""
+        keys = list(keys)
+        if not keys:
+            return []
+        marks = ",".join("?" * len(keys))
+        clauses = [sql for sql, _ in self.filters] + [f"{self.key} IN ({marks})"]
+        args = [p for _, ps in self.filters for p in ps] + keys
+        sql = f"{self.select} WHERE {' AND '.join(clauses)}"
+        return get_pool().fetch_all(sql, args)
+
+
+class VirtualTree:
+    """Liga um KeysetPager a uma Treeview e sua barra de rolagem."""
+
+    def __init__(self, tree, scrollbar, pager, max_pages=MAX_PAGES):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.pager = pager
+        self.max_rows = max_pages * pager.page_size
+        self.has_older = False
+        self.has_newer = False
+        self._pending = None
+        tree.configure(yscrollcommand=self._on_yscroll)
+
+    def reload(self):
+        """Descarta a janela atual e mostra a primeira página."""
+        self._cancel_pending()
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        rows = self.pager.first()
+        self._insert(rows, END)
+        self.has_newer = False
+        self.has_older = len(rows) == self.pager.page_size
+        self.tree.yview_moveto(0)
+
+    def show(self, rows):
+        """Mostra só estas linhas, nesta ordem, sem paginação (ex.: resultado de busca por relevância)."""
+        self._cancel_pending()
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._insert(rows, END)
+        self.has_newer = self.has_older = False
+        self.tree.yview_moveto(0)
+
+    def apply_changes(self, upserts, deletes):
+        """Atualiza só os itens alterados (por iid), sem recarregar a janela."""
+        for key in deletes:
+            if self.tree.exists(str(key)):
+                self.tree.delete(str(key))
+        if not upserts:
+            return
+        rows = {row[0]: row for row in self.pager.by_keys(upserts)}
+        for key in sorted(upserts, reverse=True):
+            iid = str(key)
+            row = rows.get(key)
+            if row is None:
+                # deixou de atender ao filtro atual
+                if self.tree.exists(iid):
+                    self.tree.delete(iid)
+            elif self.tree.exists(iid):
+                self.tree.item(iid, values=row)
+            elif self._in_window(key):
+                self.tree.insert('', self._position(key), iid=iid, values=row)
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*children[-excess:])
+            self.has_older = True
+
+    # ---------------- Rolagem ----------------
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._pending is not None:
+            return
+        if float(last) >= 1.0 - EDGE and self.has_older:
+            self._pending = self.tree.after_idle(self._load_older)
+        elif float(first) <= EDGE and self.has_newer:
+            self._pending = self.tree.after_idle(self._load_newer)
+
+    def _cancel_pending(self):
+        if self._pending is not None:
+            self.tree.after_cancel(self._pending)
+            self._pending = None
+
+    def _load_older(self):
+        self._pending = None
+        children = self.tree.get_children()
+        if not children:
+            return
+        anchor = self._top_item(children)
+        rows = self.pager.older(int(children[-1]))
+        self.has_older = len(rows) == self.pager.page_size
+        self._insert(rows, END)
+        excess = len(self.tree.get_children()) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*self.tree.get_children()[:excess])
+            self.has_newer = True
+        self._restore(anchor)
+
+    def _load_newer(self):
+        self._pending = None
+        children = self.tree.get_children()
+        if not children:
+            return
+        anchor = self._top_item(children)
+        rows = self.pager.newer(int(children[0]))
+        self.has_newer = len(rows) == self.pager.page_size
+        self._insert(rows, 0)
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*children[-excess:])
+            self.has_older = True
+        self._restore(anchor)
+
+    # ---------------- Auxiliares ----------------
+    def _insert(self, rows, index):
+        for offset, row in enumerate(rows):
+            iid = str(row[0])
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=row)
+                continue
+            pos = END if index == END else index + offset
+            self.tree.insert('', pos, iid=iid, values=row)
+
+    def _in_window(self, key):
+        """A chave cai dentro do intervalo carregado (ou logo acima dele, no topo)?"""
+        children = self.tree.get_children()
+        if not children:
+            return True
+        if key > int(children[0]):
+            return not self.has_newer
+        if key < int(children[-1]):
+            return not self.has_older
+        return True
+
+    def _position(self, key):
+        children = self.tree.get_children()
+        if not children or key > int(children[0]):
+            return 0
+        keys = [-int(iid) for iid in children]
+        return bisect.bisect_left(keys, -key)
+
+    def _top_item(self, children):
+        """Item no topo da área visível (para manter a posição após trocar páginas)."""
+        top = int(float(self.tree.yview()[0]) * len(children))
+        return children[min(top, len(children) - 1)]
+
+    def _restore(self, anchor):
+        children = self.tree.get_children()
+        if children and self.tree.exists(anchor):
+            self.tree.yview_moveto(self.tree.index(anchor) / len(children))